@@ -0,0 +1,72 @@
+"""
+Compares the per-file try_parse file name parsers with their bulk equivalents.
+USAGE:
+python -m benchmarks.bench_bulk_parse [num_paths]
+"""
+
+import sys, time
+from datetime import datetime, timedelta
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.lma_analysis_data_file import LMAAnalysisDataFile
+from lma_data.lmatools_file import LMAToolsFile
+from lma_data.LMA_bulk_parse import (
+    parse_lma_data_paths,
+    parse_lma_analysis_paths,
+    parse_lmatools_paths,
+)
+
+
+def generate_paths(num_paths: int) -> tuple[list[str], list[str], list[str]]:
+    start = datetime(2023, 5, 1)
+    stations = "abcdefghijklmnopq"
+    data_paths = []
+    analysis_paths = []
+    lmatools_paths = []
+    for i in range(num_paths):
+        date = start + timedelta(minutes=10 * (i // len(stations)))
+        station = stations[i % len(stations)]
+        data_paths.append(
+            f"/LMA_DATA/MALMA/data/{date:%Y/%m/%d}/"
+            f"L{station.upper()}_malma_Sta{station}_{date:%y%m%d_%H%M%S}.dat"
+        )
+        analysis_paths.append(f"/LMA_OUT/MALMA_{date:%y%m%d_%H%M%S}_0600.dat.gz")
+        lmatools_paths.append(
+            f"/LMA_OUT/MALMA_{date:%Y%m%d_%H%M%S}_600_10src_4000.0m-dx_source_3d.nc"
+        )
+
+    return data_paths, analysis_paths, lmatools_paths
+
+
+def time_call(name: str, parse, paths: list[str]) -> float:
+    start = time.perf_counter()
+    parse(paths)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s {1e6 * elapsed / len(paths):8.2f}us/path")
+    return elapsed
+
+
+def main():
+    num_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    data_paths, analysis_paths, lmatools_paths = generate_paths(num_paths)
+    print(f"Parsing {num_paths} paths of each kind")
+
+    benchmarks = [
+        ("LMADataFile", LMADataFile.try_parse, parse_lma_data_paths, data_paths),
+        (
+            "LMAAnalysisDataFile",
+            LMAAnalysisDataFile.try_parse,
+            parse_lma_analysis_paths,
+            analysis_paths,
+        ),
+        ("LMAToolsFile", LMAToolsFile.try_parse, parse_lmatools_paths, lmatools_paths),
+    ]
+    for name, try_parse, bulk_parse, paths in benchmarks:
+        per_file = time_call(
+            f"{name}.try_parse", lambda paths: [try_parse(p) for p in paths], paths
+        )
+        bulk = time_call(f"{name} (bulk)", bulk_parse, paths)
+        print(f"{'speedup':<28} {per_file / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
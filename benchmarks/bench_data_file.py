@@ -0,0 +1,49 @@
+"""
+Measures the memory used by LMADataFile records and the time taken to sort them.
+USAGE:
+python -m benchmarks.bench_data_file [num_files]
+"""
+
+import sys, time, random, tracemalloc
+from datetime import datetime, timedelta
+from lma_data.LMA_data_file import LMADataFile
+
+
+def generate_files(num_files: int) -> list[LMADataFile]:
+    start = datetime(2023, 5, 1)
+    stations = "abcdefghijklmnopq"
+    data_files = []
+    for i in range(num_files):
+        date = start + timedelta(minutes=10 * (i // len(stations)))
+        station = stations[i % len(stations)]
+        path = (
+            f"/LMA_DATA/MALMA/data/{date:%Y/%m/%d}/"
+            f"L{station.upper()}_malma_Sta{station}_{date:%y%m%d_%H%M%S}.dat"
+        )
+        data_files.append(LMADataFile.try_parse(path))
+
+    return data_files
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    tracemalloc.start()
+    data_files = generate_files(num_files)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{num_files} records: {memory / 2**20:.1f} MiB")
+
+    random.seed(0)
+    random.shuffle(data_files)
+    start = time.perf_counter()
+    sorted(data_files)
+    print(f"sort(): {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    data_files.sort(key=lambda data_file: data_file.sort_key)
+    print(f"sort(key=sort_key): {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
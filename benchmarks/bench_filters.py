@@ -0,0 +1,103 @@
+"""
+Compares the per-file cost of testing LMA data files against the date, network
+and station filters argument by argument, to running the bound filter chain,
+and to testing chunks of bulk parsed files with the vectorized filters.
+USAGE:
+python -m benchmarks.bench_filters [num_files]
+"""
+
+import sys, time
+from datetime import datetime, timedelta
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_filters import LMAFilters
+from lma_data.LMA_bulk_parse import map_lma_data_paths
+from lma_data.browser.file_browser import FileBrowser
+from lma_data.browser.chunk import FileChunk
+
+CHUNK_SIZE = 4096
+
+
+def generate_files(num_files: int) -> list[tuple[LMADataFile, str]]:
+    start = datetime(2023, 5, 1)
+    stations = "abcdefghijklmnopq"
+    data_files = []
+    for i in range(num_files):
+        date = start + timedelta(minutes=10 * (i // len(stations)))
+        station = stations[i % len(stations)]
+        path = (
+            f"/LMA_DATA/MALMA/data/{date:%Y/%m/%d}/"
+            f"L{station.upper()}_malma_Sta{station}_{date:%y%m%d_%H%M%S}.dat"
+        )
+        data_files.append((LMADataFile.try_parse(path), path))
+
+    return data_files
+
+
+def create_browser() -> FileBrowser[LMADataFile]:
+    browser = FileBrowser(LMADataFile.try_parse)
+    LMAFilters.add_filters_to_browser(
+        browser,
+        LMAFilters[LMADataFile].create_date_filter(
+            lambda _, file: file.datetime, column="datetime"
+        ),
+        LMAFilters[LMADataFile].create_network_filter(
+            lambda _, file: file.network, column="network"
+        ),
+        LMAFilters[LMADataFile].create_station_filter(
+            lambda _, file: file.station_identifier, column="station_identifier"
+        ),
+    )
+
+    return browser
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    data_files = generate_files(num_files)
+    browser = create_browser()
+    args = {
+        "start_date": "2023-05-03T00:00:00",
+        "end_date": "2023-05-20T00:00:00",
+        "network": ["malma,dclma"],
+        "stations": ["a,b,c,d,e,f"],
+    }
+
+    # Testing every filter with the raw arguments, as browsers used to
+    start = time.perf_counter()
+    unbound = [
+        file
+        for file, path in data_files
+        if all(map(lambda filter: filter.test(path, file, args), browser._filters))
+    ]
+    unbound_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    test_file = browser.bind_filters(args)
+    bound = [file for file, path in data_files if test_file(path, file, None)]
+    bound_time = time.perf_counter() - start
+
+    chunks = []
+    for i in range(0, num_files, CHUNK_SIZE):
+        paths = [path for _, path in data_files[i : i + CHUNK_SIZE]]
+        columns, files = map_lma_data_paths(paths)
+        chunks.append(FileChunk(columns.paths, files, [None] * len(files), columns))
+
+    start = time.perf_counter()
+    test_chunk = browser.bind_chunk_filters(args)
+    chunked = [
+        chunk.files[i] for chunk in chunks for i in test_chunk(chunk).nonzero()[0]
+    ]
+    chunked_time = time.perf_counter() - start
+
+    assert unbound == bound == chunked
+    print(f"{num_files} files, {len(bound)} accepted")
+    for name, seconds in [
+        ("unbound", unbound_time),
+        ("bound", bound_time),
+        ("chunked", chunked_time),
+    ]:
+        print(f"{name}: {seconds:.3f}s ({1e9 * seconds / num_files:.0f}ns/file)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+import asyncio, os, queue, resource, shlex, signal, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Event, Thread
+from typing import Awaitable, Callable, Iterable, Optional, Union
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_manifest import OutputManifest, batch_manifest_key
+from lma_data.LMA_schedule import (
+    DEFAULT_SPAN_ARGS,
+    RuntimeHistory,
+    batch_analysis_args,
+    batch_input_bytes,
+)
+from lma_data.LMA_journal import BatchJournal, find_batch_outputs, window_outputs
+from lma_data.LMA_telemetry import BatchTelemetry, TelemetryLog, wait_with_rusage
+from lma_data.LMA_prefetch import BatchPrefetcher
+from lma_data.browser.bundle import local_data_paths
+
+ENGINES = ["threads", "asyncio"]
+
+
+def spawn_error_exit_code(error: OSError) -> int:
+    """
+    The exit code a shell gives a command it couldn't start: 127 when it wasn't
+    found, 126 otherwise (ex: it isn't executable).
+    """
+    return 127 if isinstance(error, FileNotFoundError) else 126
+
+
+def lma_analysis_command(
+    lma_datetime: datetime,
+    data_paths: list[str],
+    out_dir: str,
+    lma_analysis_bin: str,
+    lma_analysis_args: str,
+) -> list[str]:
+    date = lma_datetime.strftime("%Y%m%d")
+    time = lma_datetime.strftime("%H%M%S")
+    data_files = " ".join(data_paths)
+    cmd = f"{lma_analysis_bin} -d {date} -t {time} -o {out_dir} {lma_analysis_args} {data_files}"
+    return shlex.split(cmd)
+
+
+@dataclass
+class BatchRecorder:
+    """
+    Records the attempts and results of batches in an output directory's
+    journal, telemetry log, runtime history and manifest, whichever are set.
+    """
+
+    out_dir: str
+    manifest: Optional[OutputManifest] = None
+    history: Optional[RuntimeHistory] = None
+    journal: Optional[BatchJournal] = None
+    telemetry: Optional[TelemetryLog] = None
+
+    def input_bytes(self, batch: list[LMADataFile]) -> int:
+        if not self.history and not self.telemetry:
+            return 0
+
+        return batch_input_bytes(batch)
+
+    def start(self, batch: list[LMADataFile]):
+        if self.journal:
+            self.journal.start(batch)
+
+    def attempt_finished(
+        self,
+        batch: list[LMADataFile],
+        input_bytes: int,
+        exit_code: Optional[int],
+        seconds: float,
+        rusage: Optional[resource.struct_rusage],
+        attempt: int = 1,
+    ):
+        if self.journal:
+            outputs = find_batch_outputs(self.out_dir, batch) if exit_code == 0 else []
+            self.journal.finish(batch, exit_code, seconds, outputs)
+
+        if self.telemetry and exit_code is not None:
+            self.telemetry.append(
+                self._batch_telemetry(
+                    batch, input_bytes, exit_code, seconds, rusage, attempt
+                )
+            )
+
+    def batch_finished(
+        self,
+        batch: list[LMADataFile],
+        input_bytes: int,
+        exit_code: Optional[int],
+        seconds: float,
+    ):
+        if exit_code != 0:
+            return
+
+        if self.history:
+            self.history.append(
+                batch[0].network, batch[0].datetime, input_bytes, seconds
+            )
+
+        if self.manifest:
+            # Windows without an output are left for the next run
+            outputs = find_batch_outputs(self.out_dir, batch)
+            self.manifest.append(
+                (*batch_manifest_key(window[0].datetime), "")
+                for window, outputs_of_window in window_outputs(batch, outputs)
+                if outputs_of_window
+            )
+
+    def _batch_telemetry(
+        self,
+        batch: list[LMADataFile],
+        input_bytes: int,
+        exit_code: int,
+        seconds: float,
+        rusage: Optional[resource.struct_rusage],
+        attempt: int,
+    ) -> BatchTelemetry:
+        output_bytes = 0
+        for output_path in find_batch_outputs(self.out_dir, batch):
+            try:
+                output_bytes += os.path.getsize(output_path)
+            except OSError:
+                continue
+
+        return BatchTelemetry(
+            batch[0].datetime.isoformat(),
+            batch[0].network,
+            len(batch),
+            input_bytes,
+            output_bytes,
+            exit_code,
+            seconds,
+            rusage.ru_utime if rusage else 0.0,
+            rusage.ru_stime if rusage else 0.0,
+            rusage.ru_maxrss if rusage else 0,
+            attempt,
+        )
+
+
+class RateLimiter:
+    """
+    A token bucket allowing rate events per second, in bursts of up to burst
+    events. A rate of 0 allows every event.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.suppressed = 0
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+
+class BatchFeed:
+    """
+    Feeds batches from a lazy producer (ex: discovery) through a bounded queue
+    of up to max_pending batches. The producer runs on a background thread and
+    blocks while the queue is full, so it stays at most max_pending batches
+    ahead of the workers taking them.
+
+    Setting the stop event (ex: on shutdown) stops both the producer and the
+    workers waiting on the queue.
+    """
+
+    # Seconds between checks of the stop event while blocked on the queue
+    POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        batches: Iterable[list[LMADataFile]],
+        max_pending: int,
+        stop_event: Optional[Event] = None,
+    ):
+        self.produced = 0
+        self.exhausted = False
+        self.error: Optional[BaseException] = None
+        self._batches = batches
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._stop_event = stop_event or Event()
+        self._thread = Thread(target=self._produce, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def get(self) -> Optional[list[LMADataFile]]:
+        """
+        Takes the next batch, blocking until one is produced. Returns None once
+        the producer is exhausted or stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                batch = self._queue.get(timeout=BatchFeed.POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+            if batch is None:
+                # Leave the end of the feed for the other workers
+                self._queue.put(None)
+
+            return batch
+
+        return None
+
+    def close(self):
+        self._stop_event.set()
+
+    def _produce(self):
+        try:
+            for batch in self._batches:
+                if not self._put(batch):
+                    return
+
+                self.produced += 1
+        except BaseException as e:
+            # Reported by the caller once the workers are done
+            self.error = e
+
+        self.exhausted = True
+        self._put(None)
+
+    def _put(self, batch: Optional[list[LMADataFile]]) -> bool:
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(batch, timeout=BatchFeed.POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+
+class AsyncBatchEngine:
+    """
+    Runs lma_analysis on batches from a single asyncio event loop rather than a
+    thread per process, with up to num_workers processes at once.
+
+    Each process' stdout and stderr are drained as they are written, so a
+    chatty process can't fill its pipes and block. The output goes to the
+    batch's log file in log_dir and is echoed to the console at up to
+    echo_rate lines per second.
+
+    SIGINT/SIGTERM terminate the running processes, a second signal kills them.
+    """
+
+    # Bytes read from a pipe at once, which also bounds each pipe's buffer
+    READ_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        out_dir: str,
+        lma_analysis_bin: str,
+        lma_analysis_args: str,
+        num_workers: int,
+        silent_mode: bool = False,
+        recorder: Optional[BatchRecorder] = None,
+        retries: int = 0,
+        retry_backoff: float = 0.0,
+        log_dir: Optional[str] = None,
+        echo_rate: float = 20.0,
+        span_args: str = DEFAULT_SPAN_ARGS,
+        prefetcher: Optional[BatchPrefetcher] = None,
+    ):
+        self.out_dir = out_dir
+        self.lma_analysis_bin = lma_analysis_bin
+        self.lma_analysis_args = lma_analysis_args
+        self.num_workers = num_workers
+        self.silent_mode = silent_mode
+        self.recorder = recorder
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.log_dir = log_dir or os.path.join(out_dir, "logs")
+        self.echo = RateLimiter(echo_rate)
+        self.span_args = span_args
+        self.prefetcher = prefetcher
+        self._processes: set[subprocess.Popen] = set()
+        self._shutdown: Optional[asyncio.Event] = None
+
+    def run(
+        self,
+        batches: Union[list[list[LMADataFile]], BatchFeed],
+        on_done: Optional[Callable[[Optional[int]], None]] = None,
+    ) -> list[Optional[int]]:
+        """
+        Runs the batches, or those of a feed as they are produced, calling
+        on_done with each batch's exit code as it completes. Returns the exit
+        codes (None for batches that didn't run).
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        return asyncio.run(self._run(batches, on_done))
+
+    async def _run(
+        self,
+        batches: Union[list[list[LMADataFile]], BatchFeed],
+        on_done: Optional[Callable[[Optional[int]], None]],
+    ) -> list[Optional[int]]:
+        loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._on_signal)
+
+        slots = asyncio.Semaphore(self.num_workers)
+
+        async def run_batch(batch: list[LMADataFile]) -> Optional[int]:
+            async with slots:
+                exit_code = await self._process_batch(batch)
+
+            if on_done:
+                on_done(exit_code)
+
+            return exit_code
+
+        try:
+            if isinstance(batches, BatchFeed):
+                return await self._run_feed(batches, run_batch)
+
+            return await asyncio.gather(*(run_batch(batch) for batch in batches))
+        finally:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signum)
+
+    async def _run_feed(
+        self,
+        feed: BatchFeed,
+        run_batch: Callable[[list[LMADataFile]], Awaitable[Optional[int]]],
+    ) -> list[Optional[int]]:
+        loop = asyncio.get_running_loop()
+        exit_codes: list[Optional[int]] = []
+
+        async def stop_feed_on_shutdown():
+            await self._shutdown.wait()
+            feed.close()
+
+        # Blocking takes from the feed get a thread of their own, so idle workers
+        # can't hold up the default executor staging batches
+        with ThreadPoolExecutor(max_workers=1) as feed_executor:
+
+            async def worker():
+                while not self._shutdown.is_set():
+                    batch = await loop.run_in_executor(feed_executor, feed.get)
+                    if batch is None:
+                        return
+
+                    exit_codes.append(await run_batch(batch))
+
+            shutdown_task = asyncio.create_task(stop_feed_on_shutdown())
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.num_workers)))
+            finally:
+                shutdown_task.cancel()
+
+        return exit_codes
+
+    def _on_signal(self):
+        did_already_shutdown = self._shutdown.is_set()
+        if not did_already_shutdown:
+            print("Terminating...")
+
+        self._shutdown.set()
+        for process in self._processes:
+            if did_already_shutdown:
+                process.kill()
+            else:
+                process.terminate()
+
+    async def _process_batch(self, batch: list[LMADataFile]) -> Optional[int]:
+        if len(batch) == 0 or self._shutdown.is_set():
+            return None
+
+        recorder = self.recorder
+        input_bytes = recorder.input_bytes(batch) if recorder else 0
+        loop = asyncio.get_running_loop()
+        exit_code = None
+        seconds = 0.0
+
+        if self.prefetcher:
+            batch_staging = self.prefetcher.staged(batch)
+        else:
+            batch_staging = local_data_paths([data_file.path for data_file in batch])
+
+        with ExitStack() as staging:
+            # lma_analysis can't read bundles, so their members are staged (off
+            # the event loop, as that reads them or waits on the prefetcher)
+            data_paths = await loop.run_in_executor(
+                None, staging.enter_context, batch_staging
+            )
+
+            attempt = 0
+            while True:
+                if recorder:
+                    recorder.start(batch)
+
+                start = time.perf_counter()
+                exit_code, rusage = await self._run_lma_analysis(
+                    batch, data_paths, attempt
+                )
+                seconds = time.perf_counter() - start
+
+                if recorder:
+                    recorder.attempt_finished(
+                        batch, input_bytes, exit_code, seconds, rusage, attempt + 1
+                    )
+
+                if exit_code in (0, None) or attempt >= self.retries:
+                    break
+
+                # The wait is cut short on shutdown
+                try:
+                    await asyncio.wait_for(
+                        self._shutdown.wait(), self.retry_backoff * 2**attempt
+                    )
+                    break
+                except asyncio.TimeoutError:
+                    attempt += 1
+
+        if recorder:
+            recorder.batch_finished(batch, input_bytes, exit_code, seconds)
+
+        return exit_code
+
+    async def _run_lma_analysis(
+        self, batch: list[LMADataFile], data_paths: list[str], attempt: int
+    ) -> tuple[Optional[int], Optional[resource.struct_rusage]]:
+        if self._shutdown.is_set():
+            return None, None
+
+        lma_datetime = batch[0].datetime
+        cmd_args = lma_analysis_command(
+            lma_datetime,
+            data_paths,
+            self.out_dir,
+            self.lma_analysis_bin,
+            batch_analysis_args(batch, self.lma_analysis_args, self.span_args),
+        )
+        log_path = os.path.join(self.log_dir, f"{lma_datetime:%Y%m%d_%H%M%S}.log")
+        with open(log_path, "ab") as log_file:
+            header = f"# attempt {attempt + 1}: {shlex.join(cmd_args)}\n"
+            log_file.write(header.encode())
+
+            try:
+                process = subprocess.Popen(
+                    cmd_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                )
+            except OSError as error:
+                # Recorded as a failed attempt, so it's retried like one
+                message = f"Couldn't run {self.lma_analysis_bin}: {error}"
+                log_file.write(f"{message}\n".encode())
+                print(f"[{lma_datetime}] {message}", file=sys.stderr)
+                return spawn_error_exit_code(error), None
+
+            self._processes.add(process)
+            try:
+                prefix = f"[{lma_datetime}] "
+                (exit_code, rusage), _, _ = await asyncio.gather(
+                    self._wait(process),
+                    self._drain(process.stdout, log_file, prefix),
+                    self._drain(process.stderr, log_file, prefix),
+                )
+            finally:
+                self._processes.discard(process)
+
+        return exit_code, rusage
+
+    async def _drain(self, pipe, log_file, prefix: str):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=AsyncBatchEngine.READ_SIZE)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe
+        )
+
+        partial = b""
+        try:
+            while True:
+                chunk = await reader.read(AsyncBatchEngine.READ_SIZE)
+                if not chunk:
+                    break
+
+                log_file.write(chunk)
+                if self.silent_mode:
+                    continue
+
+                lines = (partial + chunk).split(b"\n")
+                # Keep the start of a line longer than a read until it ends
+                partial = lines.pop()[: AsyncBatchEngine.READ_SIZE]
+                for line in lines:
+                    if self.echo.allow():
+                        print(prefix + line.decode("utf-8", "replace"))
+
+            if partial and not self.silent_mode and self.echo.allow():
+                print(prefix + partial.decode("utf-8", "replace"))
+        finally:
+            transport.close()
+
+    async def _wait(
+        self, process: subprocess.Popen
+    ) -> tuple[int, Optional[resource.struct_rusage]]:
+        """
+        Waits for a process to exit without blocking the event loop, by
+        watching its pidfd, then reaps it with its rusage.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            # Without pidfds (ex: not on Linux), wait from a thread
+            return await loop.run_in_executor(None, wait_with_rusage, process)
+
+        try:
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+        finally:
+            os.close(pidfd)
+
+        return wait_with_rusage(process)
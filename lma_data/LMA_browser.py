@@ -1,29 +1,87 @@
-import glob, os
 from lma_data.LMA_data_file import LMADataFile
 from datetime import datetime
-from typing import Optional
-from lma_data.LMA_util import datetime_within
+from operator import attrgetter
+from typing import Callable, Optional
+import fnmatch, os
+from lma_data.LMA_index import LMAIndex
+from lma_data.LMA_bulk_parse import parse_lma_data_paths, to_lma_data_files
+from lma_data.LMA_catalog import LMACatalog
+from lma_data.browser.walker import ScandirWalker
+from lma_data.browser.bundle import (
+    BUNDLE_PATTERNS,
+    bundle_dir_path,
+    is_bundle_name,
+    iter_bundle_members,
+)
 
 
 class LMABrowser:
     """
-    Enables searching for and querying LMA data files
+    Enables searching for and querying LMA data files. When a catalog is given,
+    queries are answered from the catalog instead of walking the filesystem.
+
+    When bundles is set, the station files inside tar/zip bundles (ex: a day of
+    .dat.gz files in the cold archive) are found too, as virtual paths.
     """
 
-    def __init__(self):
-        self.data: dict[str, dict[str, list[LMADataFile]]] = {}
+    # Bundled station files are usually compressed (.dat.gz)
+    BUNDLE_MEMBER_PATTERN = "*.dat*"
 
-    def find(self, data_dir):
+    def __init__(
+        self,
+        catalog: Optional[LMACatalog] = None,
+        walker: Optional[ScandirWalker] = None,
+        bundles: bool = False,
+        file_pattern: str = "*.dat",
+    ):
+        self.data: dict[str, dict[str, list[LMADataFile]]] = {}
+        self.catalog = catalog
+        self.walker = walker if walker else ScandirWalker(stat=False)
+        self.bundles = bundles
+        self.file_pattern = file_pattern
+        self._catalog_roots: list[str] = []
+        self._index: Optional[LMAIndex] = None
+
+    def find(self, data_dir, include_dir: Optional[Callable[[str], bool]] = None):
         """
         Finds all data files recursively within the specified directory and adds them to the browser.
+        Subdirectories rejected by include_dir are skipped entirely.
         """
-
-        data_paths = glob.glob(os.path.join(data_dir, "**/*.dat"), recursive=True)
-        for data_path in data_paths:
-            lma_file = LMADataFile.try_parse(data_path)
-            if not lma_file:
-                continue
-
+        if self.catalog:
+            self.catalog.refresh(data_dir)
+            self._catalog_roots.append(data_dir)
+            return
+
+        if not self.bundles:
+            data_paths = [
+                entry.path
+                for entry in self.walker.walk(data_dir, self.file_pattern, include_dir)
+            ]
+            self.add(to_lma_data_files(parse_lma_data_paths(data_paths)))
+            return
+
+        data_paths = []
+        patterns = (self.file_pattern, *BUNDLE_PATTERNS)
+        for entry in self.walker.walk(data_dir, patterns, include_dir):
+            if not is_bundle_name(entry.name):
+                data_paths.append(entry.path)
+            elif not include_dir or include_dir(bundle_dir_path(entry.path)):
+                data_paths.extend(
+                    path
+                    for path, _ in iter_bundle_members(
+                        entry.path, LMABrowser.BUNDLE_MEMBER_PATTERN
+                    )
+                )
+
+        self.add(to_lma_data_files(parse_lma_data_paths(data_paths)))
+
+    def add(self, data_files: list[LMADataFile]):
+        """
+        Adds data files to the browser, merging them into the index if it was
+        already built.
+        """
+        touched_stations = {}
+        for lma_file in data_files:
             network = self.data.get(lma_file.network)
             if not network:
                 network = self.data[lma_file.network] = {}
@@ -33,10 +91,25 @@ class LMABrowser:
                 station = network[lma_file.station_identifier] = []
 
             station.append(lma_file)
+            touched_stations[id(station)] = station
+
+        for station in touched_stations.values():
+            station.sort(key=attrgetter("sort_key"))
+
+        if self._index is not None and data_files:
+            self._index = self._index.merge(LMAIndex.from_data_files(data_files))
 
+    def remove(self, paths: set[str]):
+        """
+        Removes the data files with the specified paths from the browser.
+        """
         for network in self.data.values():
-            for data_files in network.values():
-                data_files.sort()
+            for station_id, station in network.items():
+                network[station_id] = [
+                    data_file for data_file in station if data_file.path not in paths
+                ]
+
+        self._index = None
 
     def query(
         self,
@@ -44,53 +117,59 @@ class LMABrowser:
         station_ids: list[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
+        file_pattern: Optional[str] = None,
     ) -> list[LMADataFile]:
-        queried_files: list[LMADataFile] = []
-        network_ids = network_ids if network_ids else self.data.keys()
-
-        for network_id in network_ids:
-            network_id = network_id.lower()
-            if not network_id in self.data:
-                continue
-
-            network = self.data[network_id]
-            station_ids = station_ids if station_ids else network.keys()
-            for station_id in station_ids:
-                station_id = station_id.lower()
-                if not station_id in network:
-                    continue
-
-                station_files = network[station_id]
-
-                for data_file in station_files:
-                    if datetime_within(data_file.datetime, start_date, end_date):
-                        queried_files.append(data_file)  
-
-        queried_files.sort()
-
-        return queried_files
+        if self.catalog:
+            return self.catalog.query(
+                network_ids,
+                station_ids,
+                start_date,
+                end_date,
+                self._catalog_roots,
+                file_pattern,
+            )
+
+        data_files = self.index.query(network_ids, station_ids, start_date, end_date)
+        if not file_pattern:
+            return data_files
+
+        return [
+            data_file
+            for data_file in data_files
+            if fnmatch.fnmatch(os.path.basename(data_file.path), file_pattern)
+        ]
 
     def batch(
         self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
     ) -> list[list[LMADataFile]]:
-        batches = {}
-        for network in self.data.values():
-            for station in network.values():
-                for data_file in station:
-                    if datetime_within(data_file.datetime, start_date, end_date):
-                        batch = batches.get(data_file.datetime)
-                        if not data_file.datetime in batches:
-                            batch = batches[data_file.datetime] = []
+        if self.catalog:
+            return self.catalog.batch(start_date, end_date, self._catalog_roots)
 
-                        batch.append(data_file)
+        return self.index.batch(start_date, end_date)
 
-        sorted_batches = [
-            batches[batch_datetime] for batch_datetime in sorted(batches.keys())
-        ]
+    @property
+    def index(self) -> LMAIndex:
+        """
+        A columnar index of the found data files, built on first use.
+        """
+        if self._index is None:
+            self._index = LMAIndex.from_data_files(
+                data_file
+                for network in self.data.values()
+                for station in network.values()
+                for data_file in station
+            )
 
-        return sorted_batches
+        return self._index
 
     def get_station_data_files(self, network_identifier: str, station_identifier: str):
+        if self.catalog:
+            return self.catalog.query(
+                [network_identifier],
+                [station_identifier],
+                root_dirs=self._catalog_roots,
+            )
+
         network = self.data.get(network_identifier)
         if not network:
             return None
@@ -99,3 +178,5 @@ class LMABrowser:
 
     def clear(self):
         self.data = {}
+        self._catalog_roots = []
+        self._index = None
@@ -0,0 +1,386 @@
+import numpy as np
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional, TypeVar
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.bundle import member_file_name
+from lma_data.lma_analysis_data_file import (
+    LMAAnalysisDataFile,
+    LMA_ANALYSIS_DATA_FILE_RE,
+)
+from lma_data.lmatools_file import LMAToolsFile, LMA_TOOLS_FILE_RE
+
+T = TypeVar("T")
+
+_DIGIT_POWERS = {
+    width: 10 ** np.arange(width - 1, -1, -1, dtype=np.int64) for width in range(1, 9)
+}
+
+
+class TokenTable:
+    """
+    Memoizes repeated string tokens (ex: networks, stations) into integer codes.
+    """
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None):
+        self.vocabulary: list[str] = []
+        self._normalize = normalize
+        self._codes: dict[str, int] = {}
+        self._raw_codes: dict[str, int] = {}
+
+    def code(self, raw_token: str) -> int:
+        code = self._raw_codes.get(raw_token)
+        if code is not None:
+            return code
+
+        token = self._normalize(raw_token) if self._normalize else raw_token
+        code = self._codes.get(token)
+        if code is None:
+            code = self._codes[token] = len(self.vocabulary)
+            self.vocabulary.append(token)
+
+        self._raw_codes[raw_token] = code
+        return code
+
+
+@dataclass
+class ParsedColumns:
+    """
+    Parsed file name records in columnar form. String fields are stored as integer
+    codes into a vocabulary, numeric fields as NumPy arrays.
+    """
+
+    paths: list[str]
+    times: np.ndarray
+    codes: dict[str, np.ndarray] = field(default_factory=dict)
+    vocabularies: dict[str, list[str]] = field(default_factory=dict)
+    values: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Gets a column by name, decoding coded string columns.
+        """
+        if name == "datetime":
+            return self.times
+
+        if name in self.codes:
+            vocabulary = np.array(self.vocabularies[name], dtype=object)
+            return vocabulary[self.codes[name]]
+
+        return self.values[name]
+
+    def datetimes(self) -> list[datetime]:
+        return self.times.astype("datetime64[us]").astype(object).tolist()
+
+    def select(self, mask: np.ndarray) -> "ParsedColumns":
+        """
+        Selects the records of a boolean mask, sharing the vocabularies.
+        """
+        indices = np.flatnonzero(mask)
+        return ParsedColumns(
+            [self.paths[i] for i in indices],
+            self.times[mask],
+            {name: codes[mask] for name, codes in self.codes.items()},
+            self.vocabularies,
+            {name: values[mask] for name, values in self.values.items()},
+        )
+
+
+def decode_digits(digit_strings: list[str], widths: tuple[int, ...]) -> np.ndarray:
+    """
+    Decodes fixed-width runs of ASCII digits into integers all at once.
+    Returns an (n, len(widths)) array, every string must be sum(widths) digits.
+    """
+    total_width = sum(widths)
+    buffer = "".join(digit_strings).encode("ascii")
+    digits = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, total_width)
+    digits = digits.astype(np.int64) - ord("0")
+
+    fields = np.empty((len(digit_strings), len(widths)), dtype=np.int64)
+    offset = 0
+    for i, width in enumerate(widths):
+        fields[:, i] = digits[:, offset : offset + width] @ _DIGIT_POWERS[width]
+        offset += width
+
+    return fields
+
+
+def compose_datetimes(fields: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Composes (year, month, day, hour, minute, second) rows into datetime64[s]
+    values. Returns the values and a mask of the rows which were valid dates.
+    """
+    years, months, days, hours, minutes, seconds = fields.T
+    valid = (
+        (months >= 1)
+        & (months <= 12)
+        & (days >= 1)
+        & (days <= 31)
+        & (hours < 24)
+        & (minutes < 60)
+        & (seconds < 60)
+    )
+    months = np.clip(months, 1, 12)
+    days = np.clip(days, 1, 31)
+
+    month_starts = (years - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+    month_starts = month_starts + (months - 1).astype("timedelta64[M]")
+    dates = month_starts.astype("datetime64[D]") + (days - 1).astype("timedelta64[D]")
+    # Reject days past the end of their month (ex: Feb 30th)
+    valid &= dates.astype("datetime64[M]") == month_starts
+
+    times = dates.astype("datetime64[s]") + (
+        hours * 3600 + minutes * 60 + seconds
+    ).astype("timedelta64[s]")
+
+    return times, valid
+
+
+def _parse_times(
+    dates: list[str], times: list[str], year_width: int, pivot_year: int = 100
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Two digit years below the pivot are 20XX, the rest 19XX (strptime's %y uses
+    a pivot of 69).
+    """
+    fields = decode_digits(
+        [date + time for date, time in zip(dates, times)],
+        (year_width, 2, 2, 2, 2, 2),
+    )
+    if year_width == 2:
+        years = fields[:, 0]
+        fields[:, 0] = np.where(years < pivot_year, years + 2000, years + 1900)
+
+    return compose_datetimes(fields)
+
+
+def parse_lma_data_paths(paths: list[str]) -> ParsedColumns:
+    """
+    Parses LMA data file names in bulk, the columnar equivalent of
+    LMADataFile.try_parse. Paths which can't be parsed are dropped.
+    """
+    networks = TokenTable(str.lower)
+    stations = TokenTable(str.lower)
+    station_names = TokenTable()
+
+    matched_paths = []
+    network_codes = []
+    station_codes = []
+    station_name_codes = []
+    dates = []
+    times = []
+    for path in paths:
+        lma_match = LMADataFile.LMA_FILE_NAME_RE.match(member_file_name(path))
+        if not lma_match:
+            continue
+
+        station_identifier, network, station_name, date, time = lma_match.groups()
+        matched_paths.append(path)
+        station_codes.append(stations.code(station_identifier))
+        network_codes.append(networks.code(network))
+        station_name_codes.append(station_names.code(station_name))
+        dates.append(date)
+        times.append(time)
+
+    data_times, valid = _parse_times(dates, times, 2, pivot_year=69)
+    columns = ParsedColumns(
+        matched_paths,
+        data_times,
+        codes={
+            "network": np.array(network_codes, dtype=np.int32),
+            "station_identifier": np.array(station_codes, dtype=np.int32),
+            "station_name": np.array(station_name_codes, dtype=np.int32),
+        },
+        vocabularies={
+            "network": networks.vocabulary,
+            "station_identifier": stations.vocabulary,
+            "station_name": station_names.vocabulary,
+        },
+    )
+
+    return _select(columns, valid)
+
+
+def parse_lma_analysis_paths(paths: list[str]) -> ParsedColumns:
+    """
+    Parses lma_analysis output file names in bulk, the columnar equivalent of
+    LMAAnalysisDataFile.try_parse. Paths which can't be parsed are dropped.
+    """
+    networks = TokenTable()
+
+    matched_paths = []
+    network_codes = []
+    dates = []
+    times = []
+    for path in paths:
+        lma_match = LMA_ANALYSIS_DATA_FILE_RE.match(member_file_name(path))
+        if not lma_match:
+            continue
+
+        network, date, time, _ = lma_match.groups()
+        if len(date) != 6 or len(time) != 6:
+            # Not fixed-width, let strptime decide
+            data_file = _try_parse_irregular(LMAAnalysisDataFile.try_parse, path)
+            if not data_file:
+                continue
+
+            date = data_file.datetime.strftime("%y%m%d")
+            time = data_file.datetime.strftime("%H%M%S")
+
+        matched_paths.append(path)
+        network_codes.append(networks.code(network))
+        dates.append(date)
+        times.append(time)
+
+    data_times, valid = _parse_times(dates, times, 2)
+    columns = ParsedColumns(
+        matched_paths,
+        data_times,
+        codes={"network": np.array(network_codes, dtype=np.int32)},
+        vocabularies={"network": networks.vocabulary},
+    )
+
+    return _select(columns, valid)
+
+
+def parse_lmatools_paths(paths: list[str]) -> ParsedColumns:
+    """
+    Parses lmatools output file names in bulk, the columnar equivalent of
+    LMAToolsFile.try_parse. Paths which can't be parsed are dropped.
+    """
+    prefixes = TokenTable()
+    dx_units = TokenTable()
+    suffixes = TokenTable()
+
+    matched_paths = []
+    prefix_codes = []
+    dx_units_codes = []
+    suffix_codes = []
+    durations = []
+    min_points_per_flash = []
+    dates = []
+    times = []
+    for path in paths:
+        lma_match = LMA_TOOLS_FILE_RE.match(path)
+        if not lma_match:
+            continue
+
+        prefix, date, time, duration, ppf, units, suffix = lma_match.groups()
+        if len(date) != 8 or len(time) != 6:
+            data_file = _try_parse_irregular(LMAToolsFile.try_parse, path)
+            if not data_file:
+                continue
+
+            date = data_file.datetime.strftime("%Y%m%d")
+            time = data_file.datetime.strftime("%H%M%S")
+
+        matched_paths.append(path)
+        prefix_codes.append(prefixes.code(prefix))
+        dx_units_codes.append(dx_units.code(units))
+        suffix_codes.append(suffixes.code(suffix))
+        durations.append(int(duration))
+        min_points_per_flash.append(int(ppf))
+        dates.append(date)
+        times.append(time)
+
+    data_times, valid = _parse_times(dates, times, 4)
+    columns = ParsedColumns(
+        matched_paths,
+        data_times,
+        codes={
+            "prefix": np.array(prefix_codes, dtype=np.int32),
+            "dx_units": np.array(dx_units_codes, dtype=np.int32),
+            "suffix": np.array(suffix_codes, dtype=np.int32),
+        },
+        vocabularies={
+            "prefix": prefixes.vocabulary,
+            "dx_units": dx_units.vocabulary,
+            "suffix": suffixes.vocabulary,
+        },
+        values={
+            "duration": np.array(durations, dtype=np.int64),
+            "min_points_per_flash": np.array(min_points_per_flash, dtype=np.int64),
+        },
+    )
+
+    return _select(columns, valid)
+
+
+def to_lma_data_files(columns: ParsedColumns) -> list[LMADataFile]:
+    networks = columns.column("network")
+    stations = columns.column("station_identifier")
+    station_names = columns.column("station_name")
+
+    return [
+        LMADataFile(path, station, network, station_name, data_datetime)
+        for path, station, network, station_name, data_datetime in zip(
+            columns.paths, stations, networks, station_names, columns.datetimes()
+        )
+    ]
+
+
+def to_lma_analysis_data_files(columns: ParsedColumns) -> list[LMAAnalysisDataFile]:
+    return [
+        LMAAnalysisDataFile(path, network, data_datetime)
+        for path, network, data_datetime in zip(
+            columns.paths, columns.column("network"), columns.datetimes()
+        )
+    ]
+
+
+def to_lmatools_files(columns: ParsedColumns) -> list[LMAToolsFile]:
+    return [
+        LMAToolsFile(path, prefix, data_datetime, int(duration), int(ppf), units, suffix)
+        for path, prefix, data_datetime, duration, ppf, units, suffix in zip(
+            columns.paths,
+            columns.column("prefix"),
+            columns.datetimes(),
+            columns.column("duration"),
+            columns.column("min_points_per_flash"),
+            columns.column("dx_units"),
+            columns.column("suffix"),
+        )
+    ]
+
+
+def map_lma_data_paths(paths: list[str]) -> tuple[ParsedColumns, list[LMADataFile]]:
+    """
+    A FileBrowser bulk mapper for LMA data files.
+    """
+    columns = parse_lma_data_paths(paths)
+    return columns, to_lma_data_files(columns)
+
+
+def map_lma_analysis_paths(
+    paths: list[str],
+) -> tuple[ParsedColumns, list[LMAAnalysisDataFile]]:
+    """
+    A FileBrowser bulk mapper for lma_analysis output files.
+    """
+    columns = parse_lma_analysis_paths(paths)
+    return columns, to_lma_analysis_data_files(columns)
+
+
+def map_lmatools_paths(paths: list[str]) -> tuple[ParsedColumns, list[LMAToolsFile]]:
+    """
+    A FileBrowser bulk mapper for lmatools output files.
+    """
+    columns = parse_lmatools_paths(paths)
+    return columns, to_lmatools_files(columns)
+
+
+def _try_parse_irregular(try_parse: Callable[[str], Optional[T]], path: str):
+    try:
+        return try_parse(path)
+    except ValueError:
+        return None
+
+
+def _select(columns: ParsedColumns, mask: np.ndarray) -> ParsedColumns:
+    if mask.all():
+        return columns
+
+    return columns.select(mask)
@@ -0,0 +1,283 @@
+import os, sqlite3, fnmatch
+from datetime import datetime
+from typing import Optional
+from lma_data.LMA_data_file import LMADataFile
+
+
+class LMACatalog:
+    """
+    A persistent SQLite catalog of parsed LMA data files.
+
+    Each directory is recorded along with its modification time, so a refresh
+    only lists the directories whose contents changed since the last scan.
+    Files rewritten in place do not change their directory's modification time;
+    use `refresh(data_dir, force=True)` to rebuild the catalog in that case.
+
+    Every data file matching file_pattern (by default any name parsing as a
+    station file, ex: .dat and .dat.gz) is cataloged, queries narrow them down.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            directory TEXT NOT NULL,
+            network TEXT NOT NULL,
+            station_identifier TEXT NOT NULL,
+            station_name TEXT NOT NULL,
+            datetime TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+        CREATE INDEX IF NOT EXISTS files_datetime
+            ON files (datetime, network, station_identifier);
+        CREATE INDEX IF NOT EXISTS files_station
+            ON files (network, station_identifier, datetime);
+    """
+
+    def __init__(self, catalog_path: str, file_pattern: str = "*"):
+        self.catalog_path = catalog_path
+        self.file_pattern = file_pattern
+        self._connection = sqlite3.connect(catalog_path)
+        self._connection.executescript(LMACatalog.SCHEMA)
+
+        row = self._connection.execute(
+            "SELECT value FROM settings WHERE name = 'file_pattern'"
+        ).fetchone()
+        if row is None or row[0] != file_pattern:
+            # Unchanged directories wouldn't be rescanned for the files the
+            # previous pattern left out, so the catalog starts over
+            with self._connection:
+                self._connection.execute("DELETE FROM files")
+                self._connection.execute("DELETE FROM directories")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO settings VALUES ('file_pattern', ?)",
+                    (file_pattern,),
+                )
+
+    def refresh(self, data_dir: str, force: bool = False) -> int:
+        """
+        Brings the catalog up to date with the specified directory, rescanning
+        only the directories whose modification time changed. Returns the
+        number of directories that were rescanned.
+        """
+        root_dir = os.path.abspath(data_dir)
+        rescanned = 0
+
+        with self._connection:
+            stack = [(root_dir, None)]
+            while stack:
+                dir_path, parent = stack.pop()
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    self._remove_directory(dir_path)
+                    continue
+
+                row = self._connection.execute(
+                    "SELECT mtime_ns FROM directories WHERE path = ?", (dir_path,)
+                ).fetchone()
+
+                if not force and row and row[0] == mtime_ns:
+                    subdirs = self._connection.execute(
+                        "SELECT path FROM directories WHERE parent = ?", (dir_path,)
+                    ).fetchall()
+                    stack.extend((subdir, dir_path) for (subdir,) in subdirs)
+                    continue
+
+                subdirs = self._scan_directory(dir_path, parent, mtime_ns)
+                stack.extend((subdir, dir_path) for subdir in subdirs)
+                rescanned += 1
+
+        return rescanned
+
+    def query(
+        self,
+        network_ids: Optional[list[str]] = None,
+        station_ids: Optional[list[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        root_dirs: Optional[list[str]] = None,
+        file_pattern: Optional[str] = None,
+    ) -> list[LMADataFile]:
+        """
+        Queries the cataloged data files, sorted by date, network and station.
+        Files whose names don't match file_pattern (ex: the pattern a FileBrowser
+        walks) are left out.
+        """
+        clauses, params = self._where(
+            network_ids, station_ids, start_date, end_date, root_dirs
+        )
+        rows = self._connection.execute(
+            "SELECT path, station_identifier, network, station_name, datetime "
+            f"FROM files {clauses} "
+            "ORDER BY datetime, network, station_identifier",
+            params,
+        )
+
+        return [
+            LMACatalog._row_to_data_file(row)
+            for row in rows
+            if not file_pattern
+            or fnmatch.fnmatch(os.path.basename(row[0]), file_pattern)
+        ]
+
+    def batch(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        root_dirs: Optional[list[str]] = None,
+    ) -> list[list[LMADataFile]]:
+        """
+        Groups the cataloged data files occuring at the same time together.
+        """
+        batches: list[list[LMADataFile]] = []
+        last_datetime = None
+        for data_file in self.query(
+            start_date=start_date, end_date=end_date, root_dirs=root_dirs
+        ):
+            if data_file.datetime != last_datetime:
+                batches.append([])
+                last_datetime = data_file.datetime
+
+            batches[-1].append(data_file)
+
+        return batches
+
+    def close(self):
+        self._connection.close()
+
+    def _scan_directory(
+        self, dir_path: str, parent: Optional[str], mtime_ns: int
+    ) -> list[str]:
+        subdirs = []
+        rows = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                    continue
+
+                if not fnmatch.fnmatch(entry.name, self.file_pattern):
+                    continue
+
+                lma_file = LMADataFile.try_parse(entry.path)
+                if not lma_file:
+                    continue
+
+                stat = entry.stat()
+                rows.append(
+                    (
+                        entry.path,
+                        dir_path,
+                        lma_file.network,
+                        lma_file.station_identifier,
+                        lma_file.station_name,
+                        lma_file.datetime.isoformat(),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+
+        # Forget subdirectories which no longer exist
+        known_subdirs = self._connection.execute(
+            "SELECT path FROM directories WHERE parent = ?", (dir_path,)
+        ).fetchall()
+        for (known_subdir,) in known_subdirs:
+            if known_subdir not in subdirs:
+                self._remove_directory(known_subdir)
+
+        self._connection.execute("DELETE FROM files WHERE directory = ?", (dir_path,))
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+            (dir_path, parent, mtime_ns),
+        )
+
+        return subdirs
+
+    def _remove_directory(self, dir_path: str):
+        low, high = LMACatalog._prefix_range(dir_path)
+        self._connection.execute(
+            "DELETE FROM files WHERE path >= ? AND path < ?", (low, high)
+        )
+        self._connection.execute(
+            "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+            (dir_path, low, high),
+        )
+
+    @staticmethod
+    def _where(
+        network_ids: Optional[list[str]],
+        station_ids: Optional[list[str]],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        root_dirs: Optional[list[str]],
+    ) -> tuple[str, list]:
+        clauses = []
+        params = []
+
+        if network_ids:
+            clauses.append(f"network IN ({','.join('?' * len(network_ids))})")
+            params.extend(network_id.lower() for network_id in network_ids)
+
+        if station_ids:
+            clauses.append(
+                f"station_identifier IN ({','.join('?' * len(station_ids))})"
+            )
+            params.extend(station_id.lower() for station_id in station_ids)
+
+        if start_date:
+            clauses.append("datetime >= ?")
+            params.append(start_date.isoformat())
+
+        if end_date:
+            clauses.append("datetime <= ?")
+            params.append(end_date.isoformat())
+
+        if root_dirs:
+            root_clauses = []
+            for root_dir in root_dirs:
+                root_clauses.append("(path >= ? AND path < ?)")
+                params.extend(LMACatalog._prefix_range(os.path.abspath(root_dir)))
+
+            clauses.append(f"({' OR '.join(root_clauses)})")
+
+        if not clauses:
+            return "", params
+
+        return "WHERE " + " AND ".join(clauses), params
+
+    @staticmethod
+    def _prefix_range(dir_path: str) -> tuple[str, str]:
+        # All paths below a directory sort between "dir/" and "dir0" ('0' follows '/')
+        prefix = os.path.join(dir_path, "")
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    @staticmethod
+    def _row_to_data_file(row: tuple) -> LMADataFile:
+        path, station_identifier, network, station_name, data_datetime = row
+        return LMADataFile(
+            path,
+            station_identifier,
+            network,
+            station_name,
+            datetime.fromisoformat(data_datetime),
+        )
@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import Optional
-import argparse
+from typing import Iterator, Optional
+from lma_data.LMA_util import get_lma_catalog_path, get_lma_catalog_socket
+from lma_data.browser.filters.stats import FilterStats
+import argparse, sys
 
 
 def parse_date_string(date_str: Optional[str]) -> Optional[datetime]:
@@ -66,6 +68,114 @@ def add_filter_args(parser: argparse.ArgumentParser):
     )
 
 
+def add_catalog_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "-c",
+        "--catalog",
+        dest="use_catalog",
+        action="store_true",
+        default=False,
+        help="Discover data files from a persistent catalog, only rescanning directories that changed.",
+    )
+    parser.add_argument(
+        "--catalog-path",
+        dest="catalog_path",
+        default=get_lma_catalog_path(),
+        help="The catalog database used with --catalog. Defaults to $LMA_CATALOG.",
+    )
+
+
+def add_service_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--service-socket",
+        dest="service_socket",
+        default=get_lma_catalog_socket(),
+        help="The socket of a running lma_catalogd to query instead of walking the data directory. Defaults to $LMA_CATALOG_SOCKET.",
+    )
+    parser.add_argument(
+        "--no-service",
+        dest="service_socket",
+        action="store_const",
+        const=None,
+        help="Always walk the data directory, even when lma_catalogd is running.",
+    )
+
+
+def add_bundle_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--bundles",
+        dest="bundles",
+        action="store_true",
+        default=False,
+        help="Also browse the data files inside tar/zip bundles (ex: daily tarballs in the cold archive) without extracting them.",
+    )
+
+
+def add_file_list_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--file-list",
+        dest="file_list",
+        help="Read the data files from a file list (ex: lma_find's output), one path or comma-separated group of paths per line, instead of walking data_dir. '-' reads it from stdin.",
+    )
+    parser.add_argument(
+        "--from-stdin",
+        dest="file_list",
+        action="store_const",
+        const="-",
+        help="Read the file list from stdin, like --file-list -.",
+    )
+
+
+def read_file_list(file_list: str) -> Iterator[str]:
+    """
+    Lazily reads the paths of a file list in lma_find's format, one path or
+    comma-separated group of paths per line, from stdin for "-".
+    """
+    list_file = sys.stdin if file_list == "-" else open(file_list, "r")
+    try:
+        for line in list_file:
+            for path in line.rstrip("\n").split(","):
+                path = path.strip()
+                if path:
+                    yield path
+    finally:
+        if list_file is not sys.stdin:
+            list_file.close()
+
+
+def add_filter_stats_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--filter-stats",
+        dest="filter_stats",
+        action="store_true",
+        default=False,
+        help="Print the calls, rejections and time of each filter to stderr once the search is done.",
+    )
+    parser.add_argument(
+        "--adaptive-filters",
+        dest="adaptive_filters",
+        action="store_true",
+        default=False,
+        help="Reorder the filters by their observed cost and selectivity while searching.",
+    )
+
+
+def print_filter_stats(filter_stats: list[FilterStats]):
+    """
+    Prints the stats of a browser's filters to stderr.
+    """
+    print(
+        f"{'filter':<24} {'calls':>10} {'rejected':>10} {'time (s)':>10} {'bind (s)':>10}",
+        file=sys.stderr,
+    )
+    for stats in filter_stats:
+        print(
+            f"{stats.name:<24} {stats.calls:>10} {stats.rejections:>10} "
+            f"{stats.seconds:>10.3f} {stats.bind_seconds:>10.3f}",
+            file=sys.stderr,
+        )
+
+
 VERBOSE = False
 
 
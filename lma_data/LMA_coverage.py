@@ -0,0 +1,245 @@
+import numpy as np
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_info import info
+
+
+# Data file times are naive UTC
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_seconds(data_datetime: datetime) -> int:
+    return (data_datetime - _EPOCH) // timedelta(seconds=1)
+
+
+def expected_station_count(network: str) -> Optional[int]:
+    """
+    Gets the number of stations a network is known to have in LMA_info, or None
+    for networks it doesn't describe.
+    """
+    try:
+        return len(info(network.upper())[2])
+    except NameError:
+        # info doesn't define the station list for unknown networks
+        return None
+
+
+@dataclass
+class StationGap:
+    network: str
+    station_identifier: str
+    start: datetime
+    end: datetime
+
+    @property
+    def duration(self) -> timedelta:
+        return self.end - self.start
+
+
+@dataclass
+class NetworkCompleteness:
+    network: str
+    stations_seen: int
+    stations_expected: int
+    # Mean fraction of the expected stations reporting per slot
+    completeness: float
+    # Fraction of slots where every expected station reported
+    complete_slots: float
+
+
+class StationCoverage:
+    """
+    A station availability bitmap over fixed time slots (ex: the 10 minute span
+    of each data file). Rows are (network, station) pairs sorted by name, columns
+    are slots starting at start.
+
+    Only the bitmap is kept, one byte per station and slot, so a year of 10
+    minute slots takes about 50KB per station.
+    """
+
+    def __init__(
+        self,
+        stations: list[tuple[str, str]],
+        start: datetime,
+        slot_duration: timedelta,
+        bitmap: np.ndarray,
+    ):
+        self.stations = stations
+        self.start = start
+        self.slot_duration = slot_duration
+        self.bitmap = bitmap
+
+    @staticmethod
+    def from_data_files(
+        data_files: Iterable[LMADataFile],
+        slot_duration: timedelta = timedelta(minutes=10),
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> "StationCoverage":
+        """
+        Builds the coverage of data files in a single pass. Only a station code
+        and timestamp are buffered per file, the records themselves aren't kept.
+        """
+        station_codes: dict[tuple[str, str], int] = {}
+        codes = array("i")
+        timestamps = array("q")
+        for data_file in data_files:
+            station = (data_file.network, data_file.station_identifier)
+            code = station_codes.get(station)
+            if code is None:
+                code = station_codes[station] = len(station_codes)
+
+            codes.append(code)
+            timestamps.append(_to_seconds(data_file.datetime))
+
+        return StationCoverage.from_arrays(
+            list(station_codes.keys()),
+            np.frombuffer(codes, dtype=np.int32),
+            np.frombuffer(timestamps, dtype=np.int64),
+            slot_duration,
+            start,
+            end,
+        )
+
+    @staticmethod
+    def from_arrays(
+        stations: list[tuple[str, str]],
+        codes: np.ndarray,
+        timestamps: np.ndarray,
+        slot_duration: timedelta = timedelta(minutes=10),
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> "StationCoverage":
+        """
+        Builds the coverage from station codes (indexes into stations) and the
+        data files' times, in seconds since the epoch.
+        """
+        slot_seconds = int(slot_duration.total_seconds())
+        if slot_seconds <= 0:
+            raise ValueError("The slot duration must be at least a second")
+
+        # Sort the stations by name, recoding the files to match
+        order = sorted(range(len(stations)), key=lambda code: stations[code])
+        recode = np.empty(len(stations), dtype=np.int32)
+        recode[order] = np.arange(len(stations), dtype=np.int32)
+        stations = [stations[code] for code in order]
+        codes = recode[codes] if len(codes) else codes
+
+        if start is None and len(timestamps):
+            start_timestamp = int(timestamps.min())
+        elif start is not None:
+            start_timestamp = _to_seconds(start)
+        else:
+            start_timestamp = 0
+        start_timestamp -= start_timestamp % slot_seconds
+
+        if end is None and len(timestamps):
+            end_timestamp = int(timestamps.max())
+        elif end is not None:
+            end_timestamp = _to_seconds(end)
+        else:
+            end_timestamp = start_timestamp - 1
+
+        slot_count = max(0, (end_timestamp - start_timestamp) // slot_seconds + 1)
+        slots = (timestamps - start_timestamp) // slot_seconds
+        in_range = (slots >= 0) & (slots < slot_count)
+
+        bitmap = np.zeros((len(stations), slot_count), dtype=bool)
+        bitmap[codes[in_range], slots[in_range]] = True
+
+        return StationCoverage(
+            stations,
+            _EPOCH + timedelta(seconds=start_timestamp),
+            timedelta(seconds=slot_seconds),
+            bitmap,
+        )
+
+    @property
+    def slot_count(self) -> int:
+        return self.bitmap.shape[1]
+
+    def slot_time(self, slot: int) -> datetime:
+        return self.start + slot * self.slot_duration
+
+    def uptime(self) -> np.ndarray:
+        """
+        The fraction of slots each station reported in.
+        """
+        if self.slot_count == 0:
+            return np.zeros(len(self.stations))
+
+        return self.bitmap.mean(axis=1)
+
+    def gaps(self, min_slots: int = 1) -> list[StationGap]:
+        """
+        Finds the runs of at least min_slots slots in which a station didn't
+        report, ordered by station and time.
+        """
+        if self.slot_count == 0:
+            return []
+
+        # Runs of missing slots start/end where the padded bitmap changes
+        missing = np.zeros((len(self.stations), self.slot_count + 2), dtype=np.int8)
+        missing[:, 1:-1] = ~self.bitmap
+        changes = np.diff(missing, axis=1)
+        run_rows, run_starts = np.nonzero(changes == 1)
+        _, run_ends = np.nonzero(changes == -1)
+        long_enough = (run_ends - run_starts) >= min_slots
+
+        gaps = []
+        for row, run_start, run_end in zip(
+            run_rows[long_enough], run_starts[long_enough], run_ends[long_enough]
+        ):
+            network, station_identifier = self.stations[row]
+            gaps.append(
+                StationGap(
+                    network,
+                    station_identifier,
+                    self.slot_time(int(run_start)),
+                    self.slot_time(int(run_end)),
+                )
+            )
+
+        return gaps
+
+    def network_completeness(self) -> list[NetworkCompleteness]:
+        """
+        Compares the number of stations reporting in each slot to the number of
+        stations each network has in LMA_info (or, for networks it doesn't
+        describe, the number of stations seen).
+        """
+        networks = sorted({network for network, _ in self.stations})
+        station_networks = np.array(
+            [network for network, _ in self.stations], dtype=object
+        )
+
+        completeness = []
+        for network in networks:
+            rows = self.bitmap[station_networks == network]
+            stations_seen = rows.shape[0]
+            stations_expected = expected_station_count(network) or stations_seen
+            reporting = rows.sum(axis=0)
+
+            if self.slot_count == 0:
+                mean_completeness = 0.0
+                complete_slots = 0.0
+            else:
+                mean_completeness = float(
+                    np.minimum(reporting / stations_expected, 1.0).mean()
+                )
+                complete_slots = float((reporting >= stations_expected).mean())
+
+            completeness.append(
+                NetworkCompleteness(
+                    network,
+                    stations_seen,
+                    stations_expected,
+                    mean_completeness,
+                    complete_slots,
+                )
+            )
+
+        return completeness
@@ -1,16 +1,34 @@
-import re, os
+import re, os, sys
 from datetime import datetime
 from typing import Optional, Self
 from dataclasses import dataclass
+from lma_data.browser.bundle import member_file_name
 
 
 class LMADataFile:
     """
     Parsing utilities for a LMA data file
+
+    Records are slotted and their network/station strings interned, since whole
+    seasons of them are kept in memory. Their sort key is computed once, so the
+    fields shouldn't be reassigned after construction.
     """
 
+    __slots__ = (
+        "path",
+        "station_identifier",
+        "network",
+        "station_name",
+        "datetime",
+        "sort_key",
+    )
+
     LMA_FILE_NAME_RE = re.compile(r".*L([a-zA-Z]*)_([a-zA-Z]*)_(\w*)_(\d{6})_(\d{6})")
 
+    # Byte widths of the network/station identifiers within the sort key
+    NETWORK_KEY_WIDTH = 16
+    STATION_KEY_WIDTH = 8
+
     def __init__(
         self,
         path: str,
@@ -20,14 +38,49 @@ class LMADataFile:
         datetime: datetime,
     ):
         self.path = path
-        self.station_identifier = station_identifier
-        self.network = network
-        self.station_name = station_name
+        self.station_identifier = sys.intern(station_identifier)
+        self.network = sys.intern(network)
+        self.station_name = sys.intern(station_name)
         self.datetime = datetime
+        self.sort_key = LMADataFile.create_sort_key(
+            datetime, self.network, self.station_identifier
+        )
+
+    @staticmethod
+    def create_sort_key(
+        data_datetime: datetime, network: str, station_identifier: str
+    ) -> int:
+        """
+        Packs (datetime, network, station_identifier) into a single integer with
+        the same ordering. Identifiers are compared on their first
+        NETWORK_KEY_WIDTH/STATION_KEY_WIDTH bytes.
+        """
+        microseconds = (
+            (data_datetime.toordinal() * 86400)
+            + (data_datetime.hour * 3600)
+            + (data_datetime.minute * 60)
+            + data_datetime.second
+        ) * 1_000_000 + data_datetime.microsecond
+
+        network_key = LMADataFile._pack_identifier(
+            network, LMADataFile.NETWORK_KEY_WIDTH
+        )
+        station_key = LMADataFile._pack_identifier(
+            station_identifier, LMADataFile.STATION_KEY_WIDTH
+        )
+
+        sort_key = microseconds << (8 * LMADataFile.NETWORK_KEY_WIDTH)
+        sort_key = (sort_key | network_key) << (8 * LMADataFile.STATION_KEY_WIDTH)
+        return sort_key | station_key
+
+    @staticmethod
+    def _pack_identifier(identifier: str, width: int) -> int:
+        identifier_bytes = identifier.encode("utf-8")[:width].ljust(width, b"\0")
+        return int.from_bytes(identifier_bytes, "big")
 
     @staticmethod
     def try_parse(data_path: str) -> Optional["LMADataFile"]:
-        lma_match = LMADataFile.LMA_FILE_NAME_RE.match(data_path)
+        lma_match = LMADataFile.LMA_FILE_NAME_RE.match(member_file_name(data_path))
         if not lma_match:
             return None
 
@@ -48,11 +101,7 @@ class LMADataFile:
         return f"LMADataFile({str(self)})"
 
     def __lt__(self, other: Self):
-        return (self.datetime, self.network, self.station_identifier) < (
-            other.datetime,
-            other.network,
-            other.station_identifier,
-        )
+        return self.sort_key < other.sort_key
 
     def __eq__(self, other: Self):
         return (
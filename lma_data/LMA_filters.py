@@ -4,6 +4,9 @@ from lma_data.browser.filters.date import DateFilter
 from lma_data.browser.filters.filter import BrowserFilter
 from lma_data.browser.file_browser import FileBrowser
 from lma_data.browser.filters.cache import CacheFilter
+from lma_data.browser.filters.content import ContentFilter
+from lma_data.LMA_probe import ProbeCache
+from lma_data.LMA_manifest import OutputManifest, ManifestKey
 from datetime import datetime
 from argparse import ArgumentParser
 
@@ -15,18 +18,32 @@ C = TypeVar("C")
 
 class LMAFilters(Generic[T]):
     @staticmethod
-    def create_network_filter(get_property: Callable[[str, T], str]):
-        network_filter = OptionsFilter[T]("network", get_property)
+    def create_network_filter(
+        get_property: Callable[[str, T], str],
+        get_dir_property: Optional[Callable[[str], Optional[str]]] = None,
+        column: Optional[str] = None,
+    ):
+        network_filter = OptionsFilter[T](
+            "network", get_property, get_dir_property, column
+        )
         return network_filter
 
     @staticmethod
-    def create_station_filter(get_property: Callable[[str, T], str]):
-        station_filter = OptionsFilter[T]("stations", get_property)
+    def create_station_filter(
+        get_property: Callable[[str, T], str], column: Optional[str] = None
+    ):
+        station_filter = OptionsFilter[T]("stations", get_property, column=column)
         return station_filter
 
     @staticmethod
-    def create_date_filter(get_property: Callable[[str, T], Optional[datetime]]):
-        date_filter = DateFilter[T](get_property)
+    def create_date_filter(
+        get_property: Callable[[str, T], Optional[datetime]],
+        get_dir_span: Optional[
+            Callable[[str], Optional[tuple[datetime, datetime]]]
+        ] = None,
+        column: Optional[str] = None,
+    ):
+        date_filter = DateFilter[T](get_property, get_dir_span, column)
         return date_filter
 
     @staticmethod
@@ -46,6 +63,39 @@ class LMAFilters(Generic[T]):
         cache_filter = CacheFilter(get_file_cache_property, get_cache)
         return cache_filter
 
+    @staticmethod
+    def create_cache_filter_from_manifest(
+        stage: str,
+        get_file_cache_property: Callable[[str, T], ManifestKey],
+        get_root_dir: Callable[[dict[str, Any]], str],
+    ) -> CacheFilter[T]:
+        """
+        Creates a cache filter reading the keys of a stage's outputs from its
+        manifest in the output directory (see OutputManifest).
+        """
+
+        def get_cache(args):
+            return OutputManifest(get_root_dir(args), stage).load_keys()
+
+        cache_filter = CacheFilter(get_file_cache_property, get_cache)
+        return cache_filter
+
+    @staticmethod
+    def create_valid_data_filter(
+        probe_cache: Optional[ProbeCache] = None, min_events: int = 1
+    ) -> ContentFilter[T]:
+        """
+        Creates a filter probing the header of lma_analysis outputs, rejecting
+        those which are corrupt or have less than min_events sources.
+        """
+        if probe_cache is None:
+            probe_cache = ProbeCache()
+
+        valid_data_filter = ContentFilter[T](
+            lambda path, stat: probe_cache.probe(path, stat).has_data(min_events)
+        )
+        return valid_data_filter
+
     @staticmethod
     def apply_filters_to_argparser(parser: ArgumentParser, *filters: BrowserFilter[T]):
         for filter in filters:
@@ -0,0 +1,180 @@
+import numpy as np
+from datetime import datetime
+from typing import Iterable, Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_bulk_parse import ParsedColumns, to_lma_data_files
+
+
+class LMAIndex:
+    """
+    A columnar index of LMA data files sorted by date, network and station.
+
+    Dates are stored as NumPy datetime64 values and networks/stations as integer
+    codes into sorted vocabularies, so date ranges are resolved with a binary
+    search and network/station filters with boolean masks.
+    """
+
+    def __init__(
+        self,
+        files: np.ndarray,
+        times: np.ndarray,
+        network_codes: np.ndarray,
+        station_codes: np.ndarray,
+        networks: list[str],
+        stations: list[str],
+    ):
+        order = np.lexsort((station_codes, network_codes, times))
+        self.files = files[order]
+        self.times = times[order]
+        self.network_codes = network_codes[order]
+        self.station_codes = station_codes[order]
+        self.networks = networks
+        self.stations = stations
+
+    @staticmethod
+    def from_data_files(data_files: Iterable[LMADataFile]) -> "LMAIndex":
+        data_files = list(data_files)
+        networks = sorted({data_file.network for data_file in data_files})
+        stations = sorted({data_file.station_identifier for data_file in data_files})
+        network_lookup = {network: code for code, network in enumerate(networks)}
+        station_lookup = {station: code for code, station in enumerate(stations)}
+
+        files = np.empty(len(data_files), dtype=object)
+        files[:] = data_files
+        times = np.array(
+            [data_file.datetime for data_file in data_files], dtype="datetime64[s]"
+        )
+        network_codes = np.fromiter(
+            (network_lookup[data_file.network] for data_file in data_files),
+            dtype=np.int32,
+            count=len(data_files),
+        )
+        station_codes = np.fromiter(
+            (station_lookup[data_file.station_identifier] for data_file in data_files),
+            dtype=np.int32,
+            count=len(data_files),
+        )
+
+        return LMAIndex(files, times, network_codes, station_codes, networks, stations)
+
+    @staticmethod
+    def from_columns(columns: ParsedColumns) -> "LMAIndex":
+        """
+        Builds an index from bulk parsed LMA data file names.
+        """
+        files = np.empty(len(columns), dtype=object)
+        files[:] = to_lma_data_files(columns)
+
+        # Recode against sorted vocabularies so codes follow string order
+        networks = sorted(columns.vocabularies["network"])
+        stations = sorted(columns.vocabularies["station_identifier"])
+        network_codes = LMAIndex._recode(
+            columns.codes["network"], columns.vocabularies["network"], networks
+        )
+        station_codes = LMAIndex._recode(
+            columns.codes["station_identifier"],
+            columns.vocabularies["station_identifier"],
+            stations,
+        )
+
+        return LMAIndex(
+            files, columns.times, network_codes, station_codes, networks, stations
+        )
+
+    def merge(self, other: "LMAIndex") -> "LMAIndex":
+        """
+        Merges two indexes into a new one, recoding their networks/stations.
+        """
+        networks = sorted(set(self.networks) | set(other.networks))
+        stations = sorted(set(self.stations) | set(other.stations))
+
+        return LMAIndex(
+            np.concatenate((self.files, other.files)),
+            np.concatenate((self.times, other.times)),
+            np.concatenate(
+                (
+                    LMAIndex._recode(self.network_codes, self.networks, networks),
+                    LMAIndex._recode(other.network_codes, other.networks, networks),
+                )
+            ),
+            np.concatenate(
+                (
+                    LMAIndex._recode(self.station_codes, self.stations, stations),
+                    LMAIndex._recode(other.station_codes, other.stations, stations),
+                )
+            ),
+            networks,
+            stations,
+        )
+
+    def __len__(self):
+        return len(self.files)
+
+    def query(
+        self,
+        network_ids: Optional[list[str]] = None,
+        station_ids: Optional[list[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> list[LMADataFile]:
+        time_range = self._time_range(start_date, end_date)
+        mask = np.ones(time_range.stop - time_range.start, dtype=bool)
+
+        if network_ids:
+            codes = LMAIndex._codes(self.networks, network_ids)
+            mask &= np.isin(self.network_codes[time_range], codes)
+
+        if station_ids:
+            codes = LMAIndex._codes(self.stations, station_ids)
+            mask &= np.isin(self.station_codes[time_range], codes)
+
+        return self.files[time_range][mask].tolist()
+
+    def batch(
+        self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
+    ) -> list[list[LMADataFile]]:
+        """
+        Groups the indexed data files occuring at the same time together.
+        """
+        time_range = self._time_range(start_date, end_date)
+        times = self.times[time_range]
+        if len(times) == 0:
+            return []
+
+        boundaries = np.flatnonzero(times[1:] != times[:-1]) + 1
+        return [
+            files.tolist() for files in np.split(self.files[time_range], boundaries)
+        ]
+
+    def _time_range(
+        self, start_date: Optional[datetime], end_date: Optional[datetime]
+    ) -> slice:
+        start = 0
+        stop = len(self.times)
+        if start_date:
+            start = np.searchsorted(
+                self.times, np.datetime64(start_date, "s"), side="left"
+            )
+
+        if end_date:
+            stop = np.searchsorted(self.times, np.datetime64(end_date, "s"), side="right")
+
+        return slice(int(start), int(max(start, stop)))
+
+    @staticmethod
+    def _recode(
+        codes: np.ndarray, vocabulary: list[str], sorted_vocabulary: list[str]
+    ) -> np.ndarray:
+        sorted_lookup = {value: code for code, value in enumerate(sorted_vocabulary)}
+        mapping = np.array(
+            [sorted_lookup[value] for value in vocabulary], dtype=np.int32
+        )
+        return mapping[codes] if len(codes) else codes
+
+    @staticmethod
+    def _codes(vocabulary: list[str], values: list[str]) -> np.ndarray:
+        lookup = set(value.lower() for value in values)
+        return np.array(
+            [code for code, value in enumerate(vocabulary) if value in lookup],
+            dtype=np.int32,
+        )
@@ -0,0 +1,206 @@
+import fnmatch, glob, os, sqlite3
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_schedule import batch_windows
+
+BATCH_STATES = ["pending", "running", "succeeded", "failed"]
+
+
+def _output_pattern(window_datetime: datetime) -> str:
+    return f"*_{window_datetime:%y%m%d}_{window_datetime:%H%M%S}_*"
+
+
+def find_batch_outputs(out_dir: str, batch: list[LMADataFile]) -> list[str]:
+    """
+    Lists the lma_analysis outputs of a batch's windows, named
+    {network}_{yymmdd}_{HHMMSS}_{seconds}.dat.gz after each window's start.
+    """
+    outputs = []
+    for window in batch_windows(batch):
+        pattern = _output_pattern(window[0].datetime)
+        outputs.extend(glob.glob(os.path.join(glob.escape(out_dir), pattern)))
+
+    return sorted(outputs)
+
+
+def window_outputs(
+    batch: list[LMADataFile], outputs: list[str]
+) -> list[tuple[list[LMADataFile], list[str]]]:
+    """
+    Pairs each window of a batch with its outputs, which are named after the
+    window they start in.
+    """
+    pairs = []
+    for window in batch_windows(batch):
+        pattern = _output_pattern(window[0].datetime)
+        pairs.append(
+            (
+                window,
+                [
+                    output
+                    for output in outputs
+                    if fnmatch.fnmatch(os.path.basename(output), pattern)
+                ],
+            )
+        )
+
+    return pairs
+
+
+class BatchJournal:
+    """
+    A durable SQLite journal of the batches lma_batch runs in an output
+    directory: their input paths, state, exit code, attempts, duration and
+    output paths. Batches spanning several windows are journaled per window.
+
+    Windows that were pending, running or failed when a run was interrupted can
+    be resumed from the journal without discovering them again.
+    """
+
+    FILE_NAME = ".lma_batch_journal.sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS batches (
+            key TEXT PRIMARY KEY,
+            paths TEXT NOT NULL,
+            state TEXT NOT NULL,
+            exit_code INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            seconds REAL,
+            outputs TEXT NOT NULL DEFAULT '',
+            updated TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS batches_state ON batches (state);
+    """
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, BatchJournal.FILE_NAME)
+        # Batches are journaled from the executor's threads
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(BatchJournal.SCHEMA)
+        self._lock = Lock()
+
+    @staticmethod
+    def window_key(window: list[LMADataFile]) -> str:
+        # Windows group the station files of a start time
+        return window[0].datetime.isoformat()
+
+    def add(self, batches: list[list[LMADataFile]]):
+        """
+        Records batches as pending, resetting those journaled by earlier runs.
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                BatchJournal.window_key(window),
+                "\n".join(data_file.path for data_file in window),
+                now,
+            )
+            for batch in batches
+            for window in batch_windows(batch)
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT OR REPLACE INTO batches (key, paths, state, updated)
+                VALUES (?, ?, 'pending', ?)
+                """,
+                rows,
+            )
+
+    def start(self, batch: list[LMADataFile]):
+        self._update(
+            batch, "state = 'running', attempts = attempts + 1, exit_code = NULL", ()
+        )
+
+    def finish(
+        self,
+        batch: list[LMADataFile],
+        exit_code: Optional[int],
+        seconds: float,
+        outputs: list[str],
+    ):
+        """
+        Records an attempt's result. Batches that weren't run (ex: on shutdown)
+        are left pending, as are the windows of a successful run which have no
+        output (ex: skipped by lma_analysis over a coalesced batch).
+        """
+        if exit_code is None:
+            self._update(batch, "state = 'pending', attempts = attempts - 1", ())
+            return
+
+        now = datetime.now().isoformat()
+        rows = []
+        for window, outputs_of_window in window_outputs(batch, outputs):
+            if exit_code != 0:
+                state = "failed"
+            elif outputs_of_window:
+                state = "succeeded"
+            else:
+                state = "pending"
+
+            rows.append(
+                (
+                    state,
+                    exit_code,
+                    seconds,
+                    "\n".join(outputs_of_window),
+                    now,
+                    BatchJournal.window_key(window),
+                )
+            )
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                UPDATE batches
+                SET state = ?, exit_code = ?, seconds = ?, outputs = ?, updated = ?
+                WHERE key = ?
+                """,
+                rows,
+            )
+
+    def unfinished(self) -> list[list[LMADataFile]]:
+        """
+        The windows which were pending, still running when interrupted, or
+        failed, in time order.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT paths FROM batches WHERE state != 'succeeded' ORDER BY key"
+            ).fetchall()
+
+        batches = []
+        for (paths,) in rows:
+            data_files = [LMADataFile.try_parse(path) for path in paths.split("\n")]
+            batch = [data_file for data_file in data_files if data_file]
+            if batch:
+                batches.append(batch)
+
+        return batches
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM batches GROUP BY state"
+            ).fetchall()
+
+        counts = {state: 0 for state in BATCH_STATES}
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        self._connection.close()
+
+    def _update(self, batch: list[LMADataFile], assignments: str, params: tuple):
+        now = datetime.now().isoformat()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"UPDATE batches SET {assignments}, updated = ? WHERE key = ?",
+                [
+                    (*params, now, BatchJournal.window_key(window))
+                    for window in batch_windows(batch)
+                ],
+            )
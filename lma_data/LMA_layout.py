@@ -0,0 +1,146 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+# Directory layout created by lma_download: {network}/data/{year}/{month}/{day}/
+ARCHIVE_DATA_DIR = "data"
+
+
+def _archive_parts(dir_path: str) -> Optional[tuple[str, list[str]]]:
+    """
+    Splits a directory path, relative to the root being searched, into its
+    network and year/month/day parts, when it matches the archive layout.
+    """
+    parts = os.path.normpath(dir_path).split(os.sep)
+    for i in range(len(parts) - 1, 0, -1):
+        if parts[i] != ARCHIVE_DATA_DIR:
+            continue
+
+        # Only {network}/data/{year}/{month}/{day} trees are the archive's
+        date_parts = parts[i + 1 :]
+        if len(date_parts) > 3 or not all(part.isdigit() for part in date_parts):
+            return None
+
+        return parts[i - 1], date_parts
+
+    return None
+
+
+def archive_dir_network(dir_path: str) -> Optional[str]:
+    """
+    Gets the (lowercased) network of a directory within the LMA archive layout,
+    relative to the root being searched, or None when the directory isn't part
+    of a network's tree.
+    """
+    archive_parts = _archive_parts(dir_path)
+    if not archive_parts:
+        return None
+
+    network, _ = archive_parts
+    return network.lower()
+
+
+def archive_dir_sorted(dir_path: str) -> bool:
+    """
+    Determines whether the subdirectories of a directory, relative to the root
+    being searched, sort like the times of their data files: a network's data
+    directory and its year/month directories (also when the search starts below
+    the data directory).
+    """
+    archive_parts = _archive_parts(dir_path)
+    if archive_parts:
+        _, date_parts = archive_parts
+        return len(date_parts) < 3
+
+    parts = os.path.normpath(dir_path).split(os.sep)
+    return len(parts) < 3 and all(part.isdigit() for part in parts)
+
+
+def archive_dir_span(dir_path: str) -> Optional[tuple[datetime, datetime]]:
+    """
+    Gets the [start, end) time span covered by a year/month/day directory of the
+    LMA archive layout, or None when the directory's span is unknown.
+    """
+    archive_parts = _archive_parts(dir_path)
+    if not archive_parts:
+        return None
+
+    _, date_parts = archive_parts
+    if not date_parts or not all(part.isdigit() for part in date_parts):
+        return None
+
+    # Years may be written as YYYY or YY, months and days may carry a prefix
+    # (ex: 2305 for May 2023), so only their last two digits are used.
+    year = int(date_parts[0])
+    year = year + 2000 if year < 100 else year
+    try:
+        if len(date_parts) == 1:
+            return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+        month = int(date_parts[1][-2:])
+        start = datetime(year, month, 1)
+        if len(date_parts) == 2:
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+            return start, end
+
+        day = int(date_parts[2][-2:])
+        start = datetime(year, month, day)
+        return start, datetime.fromordinal(start.toordinal() + 1)
+    except ValueError:
+        return None
+
+
+def archive_dir_within(
+    dir_path: str,
+    network_ids: Optional[list[str]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> bool:
+    """
+    Determines whether a directory of the LMA archive layout may contain data
+    files of the specified networks between the start/end date. Directories
+    outside of the layout are always walked.
+    """
+    if network_ids and not archive_name_within(
+        archive_dir_network(dir_path), network_ids
+    ):
+        return False
+
+    return archive_span_within(archive_dir_span(dir_path), start_date, end_date)
+
+
+def archive_name_within(name: Optional[str], options: list[str]) -> bool:
+    """
+    Determines whether a directory name may hold one of the options. Names are
+    prefix matched so pruning stays conservative (ex: 'wff' keeps 'WFFLMA').
+    """
+    if not name:
+        return True
+
+    name = name.lower()
+    return any(
+        name.startswith(option.lower()) or option.lower().startswith(name)
+        for option in options
+    )
+
+
+def archive_span_within(
+    span: Optional[tuple[datetime, datetime]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+) -> bool:
+    """
+    Determines whether a [start, end) span overlaps a start/end date, if they are
+    specified.
+    """
+    if not span:
+        return True
+
+    span_start, span_end = span
+    if start_date and span_end <= start_date:
+        return False
+
+    if end_date and span_start > end_date:
+        return False
+
+    return True
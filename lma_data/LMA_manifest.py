@@ -0,0 +1,131 @@
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Iterable, Iterator, Optional
+from lma_data.browser.file_browser import FileBrowser
+from lma_data.lma_analysis_data_file import LMAAnalysisDataFile
+from lma_data.lmatools_file import LMAToolsFile
+import os
+
+# Outputs are keyed by (lowercased network, datetime)
+ManifestKey = tuple[str, datetime]
+
+# How each stage's outputs are parsed back into keys when rebuilding a manifest
+MANIFEST_STAGES: dict[
+    str, tuple[Callable[[str], Optional[Any]], Callable[[Any], tuple[str, datetime]]]
+] = {
+    "lma_batch": (LMAAnalysisDataFile.try_parse, lambda file: ("", file.datetime)),
+    "lma_flash": (LMAToolsFile.try_parse, lambda file: (file.prefix, file.datetime)),
+    "lma_plot": (LMAToolsFile.try_parse, lambda file: (file.prefix, file.datetime)),
+}
+
+
+def manifest_key(network: str, data_datetime: datetime) -> ManifestKey:
+    return network.lower(), data_datetime
+
+
+def batch_manifest_key(data_datetime: datetime) -> ManifestKey:
+    """
+    lma_analysis names its outputs LYLOUT_{yymmdd}_{HHMMSS}_* whatever the
+    network of its input station files, so lma_batch outputs are keyed on their
+    datetime alone.
+    """
+    return manifest_key("", data_datetime)
+
+
+class OutputManifest:
+    """
+    An append-only manifest of the outputs a stage (ex: lma_batch) wrote to an
+    output directory. Each line is "{network}\\t{datetime}\\t{path}", the path
+    being empty when the stage doesn't know its exact output files.
+
+    Stages append to the manifest as outputs complete, so the cache filters can
+    load it in a single sequential read instead of walking the output tree.
+    """
+
+    FILE_NAME_PREFIX = ".lma_manifest."
+
+    def __init__(self, out_dir: str, stage: str):
+        if stage not in MANIFEST_STAGES:
+            raise ValueError(f"Unknown manifest stage: {stage}")
+
+        self.out_dir = out_dir
+        self.stage = stage
+        self.path = os.path.join(out_dir, f"{OutputManifest.FILE_NAME_PREFIX}{stage}")
+        self._lock = Lock()
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def append(self, entries: Iterable[tuple[str, datetime, str]]):
+        """
+        Appends (network, datetime, path) entries in a single write.
+        """
+        lines = "".join(
+            f"{network.lower()}\t{data_datetime.isoformat()}\t{path}\n"
+            for network, data_datetime, path in entries
+        )
+        if not lines:
+            return
+
+        with self._lock:
+            with open(self.path, "a") as manifest_file:
+                manifest_file.write(lines)
+
+    def read(self) -> Iterator[tuple[str, datetime, str]]:
+        try:
+            manifest_file = open(self.path, "r")
+        except FileNotFoundError:
+            return
+
+        with manifest_file:
+            for line in manifest_file:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 3:
+                    # A line cut short by a crash mid-write
+                    continue
+
+                network, date_str, path = fields
+                try:
+                    yield network, datetime.fromisoformat(date_str), path
+                except ValueError:
+                    continue
+
+    def keys(self) -> set[ManifestKey]:
+        return {(network, data_datetime) for network, data_datetime, _ in self.read()}
+
+    def rebuild(self) -> int:
+        """
+        Rewrites the manifest from the outputs present in the output directory,
+        fixing any drift (ex: outputs deleted by hand). Returns the number of
+        outputs found.
+        """
+        mapper, get_key = MANIFEST_STAGES[self.stage]
+        browser = FileBrowser(mapper)
+        entries = []
+        for file, path in browser.ifind2(self.out_dir):
+            network, data_datetime = get_key(file)
+            entries.append((network, data_datetime, path))
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(temp_path, "w") as manifest_file:
+                manifest_file.writelines(
+                    f"{network.lower()}\t{data_datetime.isoformat()}\t{path}\n"
+                    for network, data_datetime, path in entries
+                )
+            os.replace(temp_path, self.path)
+
+        return len(entries)
+
+    def load_keys(self) -> set[ManifestKey]:
+        """
+        Loads the keys of the outputs, building the manifest from the output
+        directory the first time.
+        """
+        if not os.path.isdir(self.out_dir):
+            return set()
+
+        if not self.exists():
+            self.rebuild()
+
+        return self.keys()
@@ -0,0 +1,207 @@
+import os, shutil, tempfile
+from contextlib import contextmanager
+from threading import Condition, Thread
+from typing import Iterator, Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.bundle import gzip_data_size, local_data_paths, stat_data_path
+
+
+def _stage_input_bytes(batch: list[LMADataFile], decompress: bool) -> int:
+    input_bytes = 0
+    for data_file in batch:
+        try:
+            if decompress and data_file.path.endswith(".gz"):
+                input_bytes += gzip_data_size(data_file.path)
+            else:
+                input_bytes += stat_data_path(data_file.path).st_size
+        except OSError:
+            continue
+
+    return input_bytes
+
+
+def _staged_bytes(paths: list[str]) -> int:
+    staged_bytes = 0
+    for path in paths:
+        try:
+            staged_bytes += os.path.getsize(path)
+        except OSError:
+            continue
+
+    return staged_bytes
+
+
+class BatchPrefetcher:
+    """
+    Stages the data files of upcoming batches into a local scratch directory
+    (ex: a tmpfs like /dev/shm) from a background thread while earlier batches
+    run, so lma_analysis reads them from local storage rather than waiting on a
+    slow network mount. With decompress, gzipped files are staged decompressed.
+
+    Batches are staged in dispatch order, up to lookahead batches ahead of
+    those started, and while the staged files fit in budget_bytes (a batch is
+    staged regardless when nothing else is), gzipped files counting their
+    decompressed size when they're staged decompressed. Each batch's files are
+    removed as soon as it finishes. A batch started before it was staged is run
+    from its original paths.
+    """
+
+    def __init__(
+        self,
+        batches: list[list[LMADataFile]],
+        scratch_dir: Optional[str] = None,
+        lookahead: int = 2,
+        budget_bytes: Optional[int] = None,
+        decompress: bool = False,
+    ):
+        self.lookahead = max(1, lookahead)
+        self.budget_bytes = budget_bytes
+        self.decompress = decompress
+        self.staged_count = 0
+        self.missed_count = 0
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+
+        self._scratch_dir = tempfile.mkdtemp(prefix="lma_prefetch_", dir=scratch_dir)
+        self._batches = batches
+        self._indexes = {id(batch): i for i, batch in enumerate(batches)}
+        self._condition = Condition()
+        self._next = 0
+        self._started: set[int] = set()
+        self._staging: dict[int, int] = {}
+        # The staging context, local paths and size of each staged batch
+        self._staged: dict[int, tuple[object, list[str], int]] = {}
+        self._used_bytes = 0
+        self._closed = False
+        self._thread = Thread(target=self._stage_batches, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    @contextmanager
+    def staged(self, batch: list[LMADataFile]) -> Iterator[list[str]]:
+        """
+        Provides the local data paths of a batch for the block, staging it
+        first if it wasn't prefetched, and removing them afterwards.
+        """
+        paths = [data_file.path for data_file in batch]
+        i = self._indexes.get(id(batch))
+        if i is None:
+            with local_data_paths(paths) as data_paths:
+                yield data_paths
+            return
+
+        with self._condition:
+            self._started.add(i)
+            self._condition.notify_all()
+            # A batch being staged is waited for, its copy is mostly done
+            while i in self._staging:
+                self._condition.wait()
+
+            staged = self._staged.get(i)
+
+        if staged is None:
+            self.missed_count += 1
+            # Bundle members still have to be staged for lma_analysis
+            with local_data_paths(paths) as data_paths:
+                yield data_paths
+            return
+
+        staging, data_paths, staged_bytes = staged
+        try:
+            yield data_paths
+        finally:
+            try:
+                staging.__exit__(None, None, None)
+            finally:
+                with self._condition:
+                    del self._staged[i]
+                    self._used_bytes -= staged_bytes
+                    self._condition.notify_all()
+
+    def close(self):
+        """
+        Stops staging and removes the scratch directory, with any batches which
+        were staged but didn't run.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+        for staging, _, _ in self._staged.values():
+            staging.__exit__(None, None, None)
+
+        self._staged.clear()
+        shutil.rmtree(self._scratch_dir, ignore_errors=True)
+
+    def _can_stage(self, input_bytes: int) -> bool:
+        ahead = len(self._staging) + sum(
+            1 for i in self._staged if i not in self._started
+        )
+        if ahead >= self.lookahead:
+            return False
+
+        if self.budget_bytes is None or ahead == 0:
+            return True
+
+        staging_bytes = sum(self._staging.values())
+        return self._used_bytes + staging_bytes + input_bytes <= self.budget_bytes
+
+    def _stage_batches(self):
+        while True:
+            with self._condition:
+                while self._next < len(self._batches) and self._next in self._started:
+                    self._next += 1
+
+                if self._closed or self._next >= len(self._batches):
+                    return
+
+            i = self._next
+            # Sized outside the lock, stat may be slow on a network mount
+            input_bytes = _stage_input_bytes(self._batches[i], self.decompress)
+
+            with self._condition:
+                while not self._closed and i not in self._started:
+                    if self._can_stage(input_bytes):
+                        break
+                    self._condition.wait()
+
+                if self._closed:
+                    return
+
+                self._next += 1
+                if i in self._started:
+                    continue
+
+                self._staging[i] = input_bytes
+
+            staged = self._stage(self._batches[i])
+
+            with self._condition:
+                del self._staging[i]
+                if staged is not None:
+                    self._staged[i] = staged
+                    self._used_bytes += staged[2]
+                    self.staged_count += 1
+
+                self._condition.notify_all()
+
+    def _stage(
+        self, batch: list[LMADataFile]
+    ) -> Optional[tuple[object, list[str], int]]:
+        staging = local_data_paths(
+            [data_file.path for data_file in batch],
+            self._scratch_dir,
+            copy_files=True,
+            decompress=self.decompress,
+        )
+        try:
+            data_paths = staging.__enter__()
+        except OSError:
+            # The batch is run from its original paths instead
+            return None
+
+        return staging, data_paths, _staged_bytes(data_paths)
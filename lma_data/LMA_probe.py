@@ -0,0 +1,184 @@
+import gzip, io, os, sqlite3, zlib
+from dataclasses import dataclass
+from typing import Optional
+from lma_data.browser.bundle import open_data_path, stat_data_path
+from lma_data.LMA_util import get_lma_cache_dir
+
+# Line separating an lma_analysis output's header from its sources
+DATA_MARKER = "*** data ***"
+
+# Decompressed bytes read looking for the data marker before giving up
+HEADER_LIMIT = 256 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class DataFileProbe:
+    """
+    What the header of an lma_analysis output says about its sources. error is
+    set when the file is corrupt or has no complete header.
+    """
+
+    # The "Number of events" of the header, None when it doesn't have one
+    event_count: Optional[int]
+    # Station identifiers of the header's Sta_info lines
+    stations: tuple[str, ...]
+    # Whether a source line follows the data marker
+    has_sources: bool
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+    def has_data(self, min_events: int = 1) -> bool:
+        if not self.valid or not self.has_sources:
+            return False
+
+        return self.event_count is None or self.event_count >= min_events
+
+
+def probe_data_file(path: str, header_limit: int = HEADER_LIMIT) -> DataFileProbe:
+    """
+    Reads the header of an lma_analysis output (gzipped or not, or a bundle
+    member), only decompressing it up to the first source line.
+    """
+    event_count = None
+    stations = []
+    try:
+        with open_data_path(path) as raw_file:
+            data_file = io.BufferedReader(raw_file)
+            if data_file.peek(2)[:2] == _GZIP_MAGIC:
+                data_file = gzip.GzipFile(fileobj=data_file)
+
+            read = 0
+            while read < header_limit:
+                line_bytes = data_file.readline()
+                if not line_bytes:
+                    return DataFileProbe(
+                        event_count, tuple(stations), False, "No data marker"
+                    )
+
+                read += len(line_bytes)
+                line = line_bytes.decode("latin-1").strip()
+                if line == DATA_MARKER:
+                    has_sources = bool(data_file.readline().strip())
+                    return DataFileProbe(event_count, tuple(stations), has_sources)
+
+                field, _, value = line.partition(":")
+                if field == "Number of events":
+                    event_count = int(value)
+                elif field == "Sta_info" and value.split():
+                    stations.append(value.split()[0])
+    except (OSError, EOFError, ValueError, zlib.error) as error:
+        return DataFileProbe(event_count, tuple(stations), False, str(error))
+
+    return DataFileProbe(event_count, tuple(stations), False, "Header too long")
+
+
+class ProbeCache:
+    """
+    A persistent SQLite cache of data file probes, keyed by the files' path,
+    size and mtime so files rewritten in place are probed again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS probes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            event_count INTEGER,
+            stations TEXT NOT NULL,
+            has_sources INTEGER NOT NULL,
+            error TEXT
+        );
+    """
+
+    # Probes are written in batches, a commit per file would dominate the probes
+    FLUSH_INTERVAL = 256
+
+    def __init__(self, cache_path: Optional[str] = None):
+        if cache_path is None:
+            cache_path = os.path.join(get_lma_cache_dir(), "probes.sqlite")
+
+        self.cache_path = cache_path
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._connection = sqlite3.connect(cache_path)
+            self._connection.executescript(ProbeCache.SCHEMA)
+        except (OSError, sqlite3.Error):
+            # The cache is only an optimization, fall back to one in memory
+            self._connection = sqlite3.connect(":memory:")
+            self._connection.executescript(ProbeCache.SCHEMA)
+
+        self._pending: list[tuple] = []
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[DataFileProbe]:
+        row = self._connection.execute(
+            """
+            SELECT event_count, stations, has_sources, error FROM probes
+            WHERE path = ? AND size = ? AND mtime_ns = ?
+            """,
+            (path, stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        if row is None:
+            return None
+
+        event_count, stations, has_sources, error = row
+        return DataFileProbe(
+            event_count, tuple(stations.split()), bool(has_sources), error
+        )
+
+    def put(self, path: str, stat: os.stat_result, probe: DataFileProbe):
+        self._pending.append(
+            (
+                path,
+                stat.st_size,
+                stat.st_mtime_ns,
+                probe.event_count,
+                " ".join(probe.stations),
+                int(probe.has_sources),
+                probe.error,
+            )
+        )
+        if len(self._pending) >= ProbeCache.FLUSH_INTERVAL:
+            self.flush()
+
+    def probe(
+        self, path: str, stat: Optional[os.stat_result] = None
+    ) -> DataFileProbe:
+        """
+        Probes a file, reusing the cached probe if the file didn't change.
+        """
+        try:
+            if stat is None:
+                stat = stat_data_path(path)
+        except OSError as error:
+            return DataFileProbe(None, (), False, str(error))
+
+        probe = self.get(path, stat)
+        if probe is None:
+            probe = probe_data_file(path)
+            self.put(path, stat, probe)
+
+        return probe
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._pending,
+                )
+        except sqlite3.Error:
+            pass
+
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
@@ -0,0 +1,279 @@
+import os, socket, sqlite3, time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from typing import Iterator, Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_schedule import DEFAULT_SPAN_ARGS
+
+QUEUE_STATES = ["pending", "leased", "succeeded", "failed"]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class QueueSettings:
+    """
+    The lma_analysis settings the coordinator queued batches with, shared by
+    every worker.
+    """
+
+    out_dir: str
+    lma_analysis_bin: str
+    lma_analysis_args: str
+    retries: int = 0
+    retry_backoff: float = 0.0
+    span_args: str = DEFAULT_SPAN_ARGS
+
+
+@dataclass
+class LeasedBatch:
+    key: str
+    batch: list[LMADataFile]
+    attempt: int
+
+
+class WorkQueue:
+    """
+    A queue of lma_batch batches in a SQLite database on storage shared by
+    several hosts. Workers lease batches for lease_seconds, renewing the lease
+    with heartbeats while lma_analysis runs. Batches whose lease expired (ex:
+    their worker's host went down) are leased again by the next worker.
+
+    Every operation is a short transaction, so workers only hold the database
+    lock while leasing or reporting a batch.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS batches (
+            key TEXT PRIMARY KEY,
+            priority INTEGER NOT NULL,
+            paths TEXT NOT NULL,
+            state TEXT NOT NULL,
+            worker TEXT,
+            lease_expires REAL,
+            available_at REAL NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            exit_code INTEGER,
+            seconds REAL,
+            outputs TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS batches_state ON batches (state, priority);
+    """
+
+    def __init__(self, queue_path: str, timeout: float = 60.0):
+        self.queue_path = queue_path
+        # Workers lease and heartbeat from several threads
+        self._connection = sqlite3.connect(
+            queue_path, timeout=timeout, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(WorkQueue.SCHEMA)
+        self._lock = Lock()
+
+    def enqueue(self, batches: list[list[LMADataFile]], settings: QueueSettings):
+        """
+        Queues batches in dispatch order, replacing those queued before with the
+        same start time. Data paths are queued absolute, as workers may run from
+        other directories.
+        """
+        rows = [
+            (
+                batch[0].datetime.isoformat(),
+                priority,
+                "\n".join(os.path.abspath(data_file.path) for data_file in batch),
+            )
+            for priority, batch in enumerate(batches)
+            if batch
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                [
+                    ("out_dir", settings.out_dir),
+                    ("lma_analysis_bin", settings.lma_analysis_bin),
+                    ("lma_analysis_args", settings.lma_analysis_args),
+                    ("retries", str(settings.retries)),
+                    ("retry_backoff", str(settings.retry_backoff)),
+                    ("span_args", settings.span_args),
+                ],
+            )
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO batches (key, priority, paths, state)
+                VALUES (?, ?, ?, 'pending')
+                """,
+                rows,
+            )
+
+    def settings(self) -> QueueSettings:
+        with self._lock:
+            values = dict(
+                self._connection.execute("SELECT name, value FROM settings")
+            )
+
+        if "out_dir" not in values:
+            raise ValueError(f"No batches were queued in {self.queue_path}")
+
+        return QueueSettings(
+            values["out_dir"],
+            values["lma_analysis_bin"],
+            values["lma_analysis_args"],
+            int(values["retries"]),
+            float(values["retry_backoff"]),
+            values.get("span_args", DEFAULT_SPAN_ARGS),
+        )
+
+    def lease(self, worker: str, lease_seconds: float) -> Optional[LeasedBatch]:
+        """
+        Leases the next batch, pending or whose lease expired. Returns None
+        when no batch is available right now.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                """
+                SELECT key, paths, attempts FROM batches
+                WHERE (state = 'pending' AND available_at <= ?)
+                    OR (state = 'leased' AND lease_expires < ?)
+                ORDER BY priority LIMIT 1
+                """,
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            key, paths, attempts = row
+            connection.execute(
+                """
+                UPDATE batches
+                SET state = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1
+                WHERE key = ?
+                """,
+                (worker, now + lease_seconds, key),
+            )
+
+        data_files = [LMADataFile.try_parse(path) for path in paths.split("\n")]
+        batch = [data_file for data_file in data_files if data_file]
+        return LeasedBatch(key, batch, attempts + 1)
+
+    def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        """
+        Renews a lease. Returns False if the worker lost the lease (ex: it
+        expired and another worker leased the batch).
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                """
+                UPDATE batches SET lease_expires = ?
+                WHERE key = ? AND worker = ? AND state = 'leased'
+                """,
+                (time.time() + lease_seconds, key, worker),
+            )
+            return cursor.rowcount > 0
+
+    @contextmanager
+    def keep_leased(
+        self, key: str, worker: str, lease_seconds: float
+    ) -> Iterator[None]:
+        """
+        Heartbeats a lease from a background thread while the block runs.
+        """
+        stopped = Event()
+
+        def beat():
+            while not stopped.wait(lease_seconds / 3):
+                try:
+                    self.heartbeat(key, worker, lease_seconds)
+                except sqlite3.Error:
+                    # The next heartbeat may get through before the lease expires
+                    continue
+
+        heartbeat_thread = Thread(target=beat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            heartbeat_thread.join()
+
+    def complete(
+        self,
+        leased: LeasedBatch,
+        worker: str,
+        exit_code: Optional[int],
+        seconds: float,
+        outputs: list[str],
+    ):
+        """
+        Reports a leased batch's result. Failed batches are requeued, after the
+        retry backoff, until they ran out of retries. Batches that weren't run
+        (ex: on shutdown) are released for other workers.
+        """
+        settings = self.settings()
+        if exit_code is None:
+            assignments = "state = 'pending', attempts = attempts - 1"
+            params: tuple = ()
+        elif exit_code == 0:
+            assignments = "state = 'succeeded', exit_code = ?, seconds = ?, outputs = ?"
+            params = (exit_code, seconds, "\n".join(outputs))
+        elif leased.attempt <= settings.retries:
+            backoff = settings.retry_backoff * 2 ** (leased.attempt - 1)
+            assignments = (
+                "state = 'pending', exit_code = ?, seconds = ?, available_at = ?"
+            )
+            params = (exit_code, seconds, time.time() + backoff)
+        else:
+            assignments = "state = 'failed', exit_code = ?, seconds = ?"
+            params = (exit_code, seconds)
+
+        with self._transaction() as connection:
+            # A worker which lost its lease doesn't overwrite the new lessee's state
+            connection.execute(
+                f"""
+                UPDATE batches SET {assignments}, worker = NULL, lease_expires = NULL
+                WHERE key = ? AND worker = ? AND state = 'leased'
+                """,
+                (*params, leased.key, worker),
+            )
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM batches GROUP BY state"
+            ).fetchall()
+
+        counts = {state: 0 for state in QUEUE_STATES}
+        counts.update(rows)
+        return counts
+
+    def is_drained(self) -> bool:
+        """
+        Determines whether every batch succeeded or failed for good.
+        """
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    def close(self):
+        self._connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't
+        # select the same batch before either updates it
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+            self._connection.execute("COMMIT")
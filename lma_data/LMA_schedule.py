@@ -0,0 +1,253 @@
+import heapq, os
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Iterator, Optional
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.bundle import stat_data_path
+
+SCHEDULES = ["time", "lpt"]
+
+# The span of each station data file, and so of the windows batches group
+WINDOW_SECONDS = 600
+
+# The lma_analysis arguments setting how long a batch spanning several windows is
+DEFAULT_SPAN_ARGS = "-s {seconds}"
+
+
+def batch_input_bytes(batch: list[LMADataFile]) -> int:
+    """
+    The total size of a batch's data files, which lma_analysis' runtime grows
+    with (storm hours have much larger station files).
+    """
+    input_bytes = 0
+    for data_file in batch:
+        try:
+            input_bytes += stat_data_path(data_file.path).st_size
+        except OSError:
+            continue
+
+    return input_bytes
+
+
+def batch_windows(batch: list[LMADataFile]) -> list[list[LMADataFile]]:
+    """
+    Splits a batch into its windows, the data files starting at the same time,
+    in time order.
+    """
+    windows: dict[datetime, list[LMADataFile]] = {}
+    for data_file in batch:
+        windows.setdefault(data_file.datetime, []).append(data_file)
+
+    return [windows[window_datetime] for window_datetime in sorted(windows)]
+
+
+def batch_span_seconds(batch: list[LMADataFile]) -> int:
+    start = min(data_file.datetime for data_file in batch)
+    end = max(data_file.datetime for data_file in batch)
+    return int((end - start).total_seconds()) + WINDOW_SECONDS
+
+
+def batch_analysis_args(
+    batch: list[LMADataFile], lma_analysis_args: str, span_args: str
+) -> str:
+    """
+    The lma_analysis arguments of a batch, with span_args (formatted with the
+    batch's duration in seconds) for batches spanning several windows.
+    """
+    if len(batch_windows(batch)) <= 1:
+        return lma_analysis_args
+
+    span = span_args.format(seconds=batch_span_seconds(batch))
+    return f"{span} {lma_analysis_args}".strip()
+
+
+def coalesce_batches(
+    batches: list[list[LMADataFile]],
+    max_seconds: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> list[list[LMADataFile]]:
+    """
+    Merges consecutive windows with the same set of stations into batches of up
+    to max_seconds and max_bytes, so lma_analysis' startup and header parsing
+    are paid once per batch rather than once per window. A window over the
+    budgets on its own stays a batch of its own.
+    """
+    windows = sorted(
+        (window for batch in batches for window in batch_windows(batch)),
+        key=lambda window: window[0].datetime,
+    )
+
+    coalesced: list[list[LMADataFile]] = []
+    # The open batch of each station set, with its end and size
+    open_batches: dict[frozenset, tuple[list[LMADataFile], datetime, int]] = {}
+    window_duration = timedelta(seconds=WINDOW_SECONDS)
+    for window in windows:
+        stations = frozenset(
+            (data_file.network, data_file.station_identifier) for data_file in window
+        )
+        window_start = window[0].datetime
+        window_bytes = batch_input_bytes(window) if max_bytes is not None else 0
+
+        open_batch = open_batches.get(stations)
+        if open_batch is not None:
+            batch, batch_end, batch_bytes = open_batch
+            span = window_start + window_duration - batch[0].datetime
+            fits = (
+                batch_end == window_start
+                and (max_seconds is None or span.total_seconds() <= max_seconds)
+                and (max_bytes is None or batch_bytes + window_bytes <= max_bytes)
+            )
+            if fits:
+                batch.extend(window)
+                open_batches[stations] = (
+                    batch,
+                    window_start + window_duration,
+                    batch_bytes + window_bytes,
+                )
+                continue
+
+        batch = list(window)
+        coalesced.append(batch)
+        open_batches[stations] = (batch, window_start + window_duration, window_bytes)
+
+    return coalesced
+
+
+class RuntimeHistory:
+    """
+    An append-only record of how long lma_analysis took on past batches of an
+    output directory. Each line is "{network}\\t{datetime}\\t{bytes}\\t{seconds}".
+    """
+
+    FILE_NAME = ".lma_batch_runtimes"
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, RuntimeHistory.FILE_NAME)
+        self._lock = Lock()
+
+    def append(
+        self, network: str, data_datetime: datetime, input_bytes: int, seconds: float
+    ):
+        line = (
+            f"{network.lower()}\t{data_datetime.isoformat()}\t"
+            f"{input_bytes}\t{seconds:.3f}\n"
+        )
+        with self._lock:
+            with open(self.path, "a") as history_file:
+                history_file.write(line)
+
+    def read(self) -> Iterator[tuple[str, datetime, int, float]]:
+        try:
+            history_file = open(self.path, "r")
+        except FileNotFoundError:
+            return
+
+        with history_file:
+            for line in history_file:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 4:
+                    # A line cut short by a crash mid-write
+                    continue
+
+                network, date_str, input_bytes, seconds = fields
+                try:
+                    yield (
+                        network,
+                        datetime.fromisoformat(date_str),
+                        int(input_bytes),
+                        float(seconds),
+                    )
+                except ValueError:
+                    continue
+
+
+class RuntimeModel:
+    """
+    Estimates lma_analysis' runtime on a batch from the runtime history: the
+    last runtime of the same batch (start and input bytes) if it ran before,
+    else its input bytes at the network's (or, for networks without history,
+    every network's) mean throughput.
+    """
+
+    def __init__(self, records: Iterator[tuple[str, datetime, int, float]]):
+        self._runtimes: dict[tuple[str, datetime, int], float] = {}
+        network_totals: dict[str, list[float]] = {}
+        total_bytes = 0
+        total_seconds = 0.0
+        for network, data_datetime, input_bytes, seconds in records:
+            self._runtimes[(network, data_datetime, input_bytes)] = seconds
+            totals = network_totals.setdefault(network, [0, 0.0])
+            totals[0] += input_bytes
+            totals[1] += seconds
+            total_bytes += input_bytes
+            total_seconds += seconds
+
+        self._seconds_per_byte = {
+            network: seconds / input_bytes
+            for network, (input_bytes, seconds) in network_totals.items()
+            if input_bytes > 0
+        }
+        self._default_seconds_per_byte = (
+            total_seconds / total_bytes if total_bytes > 0 else None
+        )
+
+    @property
+    def has_history(self) -> bool:
+        return self._default_seconds_per_byte is not None
+
+    def estimate(
+        self, network: str, data_datetime: datetime, input_bytes: int
+    ) -> Optional[float]:
+        network = network.lower()
+        runtime = self._runtimes.get((network, data_datetime, input_bytes))
+        if runtime is not None:
+            return runtime
+
+        seconds_per_byte = self._seconds_per_byte.get(
+            network, self._default_seconds_per_byte
+        )
+        if seconds_per_byte is None:
+            return None
+
+        return input_bytes * seconds_per_byte
+
+
+def estimate_batch_costs(
+    batches: list[list[LMADataFile]], model: Optional[RuntimeModel] = None
+) -> list[float]:
+    """
+    Estimates each batch's cost, in seconds when there is a runtime history and
+    otherwise in input bytes.
+    """
+    costs = []
+    for data_batch in batches:
+        input_bytes = batch_input_bytes(data_batch)
+        cost = None
+        if model and model.has_history and data_batch:
+            cost = model.estimate(
+                data_batch[0].network, data_batch[0].datetime, input_bytes
+            )
+
+        costs.append(float(input_bytes) if cost is None else cost)
+
+    return costs
+
+
+def lpt_order(costs: list[float]) -> list[int]:
+    """
+    Orders batch indexes longest processing time first, which keeps a few large
+    batches started last from dominating the makespan.
+    """
+    return sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+
+
+def predict_makespan(costs: list[float], num_workers: int) -> float:
+    """
+    Simulates dispatching batches in order to whichever of num_workers workers
+    frees up first, returning when the last batch completes.
+    """
+    workers = [0.0] * max(1, num_workers)
+    for cost in costs:
+        heapq.heapreplace(workers, workers[0] + cost)
+
+    return max(workers)
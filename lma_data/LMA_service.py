@@ -0,0 +1,455 @@
+import ctypes, ctypes.util, fnmatch, json, os, select, socket, socketserver
+import struct, time
+from datetime import datetime
+from threading import Event, Lock, Thread
+from typing import Any, Iterable, Optional
+from lma_data.LMA_browser import LMABrowser
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_bulk_parse import parse_lma_data_paths, to_lma_data_files
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+INOTIFY_WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class FileChanges:
+    """
+    Paths added to/removed from a watched tree. A rescan is requested when the
+    watcher lost track of events.
+    """
+
+    def __init__(self):
+        self.added: list[str] = []
+        self.removed: list[str] = []
+        self.removed_dirs: list[str] = []
+        self.rescan = False
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.removed_dirs or self.rescan)
+
+
+class InotifyWatcher:
+    """
+    Watches a directory tree for added/removed files with Linux inotify.
+    """
+
+    def __init__(self, root_dir: str, pattern: str = "*.dat"):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.root_dir = root_dir
+        self.pattern = pattern
+        self._watches: dict[int, str] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            return False
+
+        return hasattr(ctypes.CDLL(libc_name), "inotify_init1")
+
+    def start(self) -> list[str]:
+        """
+        Watches every directory of the tree, returning the files already present.
+        """
+        return self._watch_tree(self.root_dir)
+
+    def poll(self, timeout: float) -> FileChanges:
+        changes = FileChanges()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changes
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            name = buffer[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            self._handle_event(changes, wd, mask, os.fsdecode(name))
+
+        return changes
+
+    def close(self):
+        os.close(self._fd)
+
+    def _handle_event(self, changes: FileChanges, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            changes.rescan = True
+            return
+
+        dir_path = self._watches.get(wd)
+        if dir_path is None:
+            return
+
+        if mask & IN_DELETE_SELF:
+            self._watches.pop(wd, None)
+            return
+
+        if name.startswith("."):
+            return
+
+        path = os.path.join(dir_path, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may have landed before the watch was added
+                changes.added.extend(self._watch_tree(path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.removed_dirs.append(path)
+            return
+
+        if not fnmatch.fnmatch(name, self.pattern):
+            return
+
+        if mask & (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO):
+            changes.added.append(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            changes.removed.append(path)
+
+    def _watch_tree(self, root_dir: str) -> list[str]:
+        paths = []
+        for dir_path, dir_names, file_names in os.walk(root_dir):
+            dir_names[:] = [name for name in dir_names if not name.startswith(".")]
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dir_path), INOTIFY_WATCH_MASK
+            )
+            if wd < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, f"inotify_add_watch failed for {dir_path}")
+
+            self._watches[wd] = dir_path
+            paths.extend(
+                os.path.join(dir_path, name)
+                for name in file_names
+                if not name.startswith(".") and fnmatch.fnmatch(name, self.pattern)
+            )
+
+        return paths
+
+
+class PollingWatcher:
+    """
+    Watches a directory tree for added/removed files by periodically comparing
+    directory modification times, only listing the directories which changed.
+    """
+
+    def __init__(self, root_dir: str, pattern: str = "*.dat", interval: float = 30.0):
+        self.root_dir = root_dir
+        self.pattern = pattern
+        self.interval = interval
+        # Directory path -> (mtime, subdirectories, files)
+        self._dirs: dict[str, tuple[int, list[str], set[str]]] = {}
+        self._last_scan = 0.0
+
+    def start(self) -> list[str]:
+        return self._scan().added
+
+    def poll(self, timeout: float) -> FileChanges:
+        next_scan = self._last_scan + self.interval
+        time.sleep(max(0.0, min(timeout, next_scan - time.monotonic())))
+        if time.monotonic() < next_scan:
+            return FileChanges()
+
+        return self._scan()
+
+    def close(self):
+        pass
+
+    def _scan(self) -> FileChanges:
+        self._last_scan = time.monotonic()
+        changes = FileChanges()
+        stack = [self.root_dir]
+        seen_dirs = set()
+        while stack:
+            dir_path = stack.pop()
+            seen_dirs.add(dir_path)
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+
+            known = self._dirs.get(dir_path)
+            if known and known[0] == mtime_ns:
+                stack.extend(known[1])
+                continue
+
+            subdirs, files = self._list_dir(dir_path)
+            known_files = known[2] if known else set()
+            changes.added.extend(sorted(files - known_files))
+            changes.removed.extend(sorted(known_files - files))
+            self._dirs[dir_path] = (mtime_ns, subdirs, files)
+            stack.extend(subdirs)
+
+        for dir_path in list(self._dirs.keys()):
+            if dir_path not in seen_dirs:
+                changes.removed.extend(self._dirs.pop(dir_path)[2])
+
+        return changes
+
+    def _list_dir(self, dir_path: str) -> tuple[list[str], set[str]]:
+        subdirs = []
+        files = set()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                    elif fnmatch.fnmatch(entry.name, self.pattern):
+                        files.add(entry.path)
+        except OSError:
+            pass
+
+        return subdirs, files
+
+
+class LMACatalogService:
+    """
+    Keeps an LMABrowser of a data directory up to date from filesystem events
+    and answers queries for it over a local Unix socket.
+
+    Every data file matching file_pattern (by default any name parsing as a
+    station file, ex: .dat and .dat.gz) is indexed, queries give the pattern
+    of the files they want.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        socket_path: str,
+        use_inotify: bool = True,
+        poll_interval: float = 30.0,
+        file_pattern: str = "*",
+    ):
+        self.data_dir = os.path.abspath(data_dir)
+        self.socket_path = socket_path
+        self.file_pattern = file_pattern
+        self.poll_interval = poll_interval
+        self.browser = LMABrowser(file_pattern=file_pattern)
+        self._paths: set[str] = set()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+        self.watcher = None
+        if use_inotify and InotifyWatcher.is_available():
+            try:
+                self.watcher = InotifyWatcher(self.data_dir, file_pattern)
+            except OSError:
+                self.watcher = None
+
+        if not self.watcher:
+            self.watcher = PollingWatcher(self.data_dir, file_pattern, poll_interval)
+
+    def serve_forever(self):
+        try:
+            initial_paths = self.watcher.start()
+        except OSError:
+            # Typically out of inotify watches, fall back to polling
+            self.watcher.close()
+            self.watcher = PollingWatcher(
+                self.data_dir, self.file_pattern, self.poll_interval
+            )
+            initial_paths = self.watcher.start()
+
+        self._add_paths(initial_paths)
+
+        watch_thread = Thread(target=self._watch, daemon=True)
+        watch_thread.start()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        service = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                request = json.loads(self.rfile.readline())
+                response = service.handle_request(request)
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        with socketserver.ThreadingUnixStreamServer(
+            self.socket_path, RequestHandler
+        ) as server:
+            self._server = server
+            try:
+                server.serve_forever()
+            finally:
+                self._stop_event.set()
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        root_dir = os.path.abspath(request.get("root_dir") or self.data_dir)
+        if os.path.commonpath([root_dir, self.data_dir]) != self.data_dir:
+            return {"ok": False, "error": f"{root_dir} is not served"}
+
+        file_pattern = request.get("file_pattern")
+        with self._lock:
+            data_files = self.browser.query(
+                network_ids=request.get("network_ids"),
+                station_ids=request.get("station_ids"),
+                start_date=_parse_iso(request.get("start_date")),
+                end_date=_parse_iso(request.get("end_date")),
+                file_pattern=file_pattern,
+            )
+
+        if root_dir != self.data_dir:
+            prefix = os.path.join(root_dir, "")
+            data_files = [
+                data_file
+                for data_file in data_files
+                if data_file.path.startswith(prefix)
+            ]
+
+        return {
+            "ok": True,
+            "file_pattern": file_pattern,
+            "files": [encode_data_file(f) for f in data_files],
+        }
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            changes = self.watcher.poll(timeout=1.0)
+            if not changes:
+                continue
+
+            if changes.rescan:
+                self._rescan()
+                continue
+
+            removed = set(changes.removed)
+            for dir_path in changes.removed_dirs:
+                prefix = os.path.join(dir_path, "")
+                removed.update(path for path in self._paths if path.startswith(prefix))
+
+            self._remove_paths(removed)
+            self._add_paths(changes.added)
+
+    def _rescan(self):
+        with self._lock:
+            self.browser.clear()
+            self._paths = set()
+            self.browser.find(self.data_dir)
+            self._paths = {
+                data_file.path
+                for network in self.browser.data.values()
+                for station in network.values()
+                for data_file in station
+            }
+
+    def _add_paths(self, paths: Iterable[str]):
+        new_paths = [path for path in paths if path not in self._paths]
+        data_files = to_lma_data_files(parse_lma_data_paths(new_paths))
+        if not data_files:
+            return
+
+        with self._lock:
+            self._paths.update(data_file.path for data_file in data_files)
+            self.browser.add(data_files)
+
+    def _remove_paths(self, paths: set[str]):
+        paths = paths & self._paths
+        if not paths:
+            return
+
+        with self._lock:
+            self._paths -= paths
+            self.browser.remove(paths)
+
+
+def encode_data_file(data_file: LMADataFile) -> list[str]:
+    return [
+        data_file.path,
+        data_file.station_identifier,
+        data_file.network,
+        data_file.station_name,
+        data_file.datetime.isoformat(),
+    ]
+
+
+def decode_data_file(encoded: list[str]) -> LMADataFile:
+    path, station_identifier, network, station_name, data_datetime = encoded
+    return LMADataFile(
+        path,
+        station_identifier,
+        network,
+        station_name,
+        datetime.fromisoformat(data_datetime),
+    )
+
+
+def _parse_iso(date_str: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(date_str) if date_str else None
+
+
+def query_service(
+    socket_path: str,
+    root_dir: str,
+    network_ids: Optional[list[str]] = None,
+    station_ids: Optional[list[str]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    file_pattern: Optional[str] = None,
+) -> Optional[list[LMADataFile]]:
+    """
+    Queries a running catalog service for the data files whose names match
+    file_pattern (ex: the pattern the caller would walk). Returns None when no
+    service is running, it doesn't serve the root directory or it can't match
+    the pattern, so callers can fall back to walking.
+    """
+    request = {
+        "root_dir": os.path.abspath(root_dir),
+        "network_ids": network_ids,
+        "station_ids": station_ids,
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+        "file_pattern": file_pattern,
+    }
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with client.makefile("rb") as response_file:
+                response = json.loads(response_file.readline())
+    except (OSError, ValueError):
+        return None
+
+    # Services predating file patterns only index .dat files
+    if not response.get("ok") or response.get("file_pattern") != file_pattern:
+        return None
+
+    return [decode_data_file(encoded) for encoded in response["files"]]
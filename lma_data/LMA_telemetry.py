@@ -0,0 +1,127 @@
+import json, os, resource, subprocess
+from dataclasses import asdict, dataclass
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class BatchTelemetry:
+    """
+    The resources an lma_analysis invocation (one attempt at a batch) used.
+    CPU times and the peak RSS
+    come from the process' rusage, so they only cover lma_analysis itself (the
+    peak RSS is at least that of the forked Python process before its exec).
+    """
+
+    batch: str
+    network: str
+    files: int
+    input_bytes: int
+    output_bytes: int
+    exit_code: Optional[int]
+    wall_seconds: float
+    user_seconds: float
+    sys_seconds: float
+    max_rss_kb: int
+    attempt: int = 1
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.user_seconds + self.sys_seconds
+
+
+def wait_with_rusage(
+    process: subprocess.Popen,
+) -> tuple[int, Optional[resource.struct_rusage]]:
+    """
+    Waits for a process with os.wait4, returning its exit code and rusage.
+    """
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped (ex: by Popen.poll on another thread)
+        return process.wait(), None
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    # Let Popen know the process was reaped, so it isn't signaled or waited on
+    process.returncode = exit_code
+    return exit_code, rusage
+
+
+class TelemetryLog:
+    """
+    Appends each batch's telemetry to a JSONL file, keeping this run's records
+    for the end of run summary.
+    """
+
+    FILE_NAME = ".lma_batch_telemetry.jsonl"
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, TelemetryLog.FILE_NAME)
+        self.records: list[BatchTelemetry] = []
+        self._lock = Lock()
+
+    def append(self, telemetry: BatchTelemetry):
+        line = json.dumps(asdict(telemetry)) + "\n"
+        with self._lock:
+            self.records.append(telemetry)
+            with open(self.path, "a") as telemetry_file:
+                telemetry_file.write(line)
+
+
+def print_telemetry_summary(
+    records: list[BatchTelemetry], run_seconds: float, slowest: int = 5
+):
+    """
+    Prints the throughput of a run, the distribution of batch times and the
+    slowest batches, each batch counting once with its final attempt. A CPU
+    utilization well below 1 means lma_analysis waits on I/O, so more workers
+    than cores may help.
+    """
+    if not records:
+        return
+
+    final_records: dict[tuple[str, str], BatchTelemetry] = {}
+    for record in records:
+        key = (record.network, record.batch)
+        if key not in final_records or record.attempt >= final_records[key].attempt:
+            final_records[key] = record
+
+    batches = list(final_records.values())
+    wall_seconds = np.array([record.wall_seconds for record in batches])
+    # Failed attempts used the CPU too
+    cpu_seconds = sum(record.cpu_seconds for record in records)
+    attempt_seconds = sum(record.wall_seconds for record in records)
+    files = sum(record.files for record in batches)
+    input_mb = sum(record.input_bytes for record in batches) / 1e6
+    output_mb = sum(record.output_bytes for record in batches) / 1e6
+    failed = sum(1 for record in batches if record.exit_code != 0)
+    retries = len(records) - len(batches)
+    run_seconds = max(run_seconds, 1e-9)
+
+    print(
+        f"{len(batches)} batches ({failed} failed, {retries} retries) in "
+        f"{run_seconds:.1f}s: {files / run_seconds:.2f} files/s, "
+        f"{input_mb / run_seconds:.2f}MB/s in, {output_mb / run_seconds:.2f}MB/s out"
+    )
+    print(
+        f"Batch time: p50 {np.percentile(wall_seconds, 50):.1f}s, "
+        f"p95 {np.percentile(wall_seconds, 95):.1f}s, "
+        f"max {wall_seconds.max():.1f}s"
+    )
+    print(
+        f"CPU utilization: {cpu_seconds / max(attempt_seconds, 1e-9):.2f}, "
+        f"peak RSS {max(record.max_rss_kb for record in records) / 1024:.0f}MB"
+    )
+
+    print("Slowest batches:")
+    for record in sorted(batches, key=lambda record: -record.wall_seconds)[
+        :slowest
+    ]:
+        print(
+            f"  {record.batch} {record.network}: {record.wall_seconds:.1f}s, "
+            f"{record.cpu_seconds:.1f}s CPU, {record.max_rss_kb / 1024:.0f}MB, "
+            f"{record.input_bytes / 1e6:.1f}MB in"
+        )
@@ -1,4 +1,4 @@
-import os, datetime
+import os, datetime, tempfile
 from typing import Optional
 from typing import TypeVar, Callable, Any
 
@@ -42,6 +42,52 @@ def get_lma_shapes_dir():
     return abs_path
 
 
+def get_lma_cache_dir():
+    """_summary_
+    Get's the directory where cached indexes and probes are stored.
+
+    Returns:
+        str: The absolute path of the cache directory.
+    """
+    cache_directory = os.environ.get(
+        "LMA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "lma_data")
+    )
+    abs_path = os.path.abspath(cache_directory)
+
+    return abs_path
+
+
+def get_lma_catalog_path():
+    """_summary_
+    Get's the path of the persistent LMA data file catalog.
+
+    Returns:
+        str: The absolute path of the catalog database.
+    """
+    catalog_path = os.environ.get(
+        "LMA_CATALOG", os.path.join(get_lma_data_dir(), ".lma_catalog.sqlite")
+    )
+    abs_path = os.path.abspath(catalog_path)
+
+    return abs_path
+
+
+def get_lma_catalog_socket():
+    """_summary_
+    Get's the path of the Unix socket the LMA catalog service listens on.
+
+    Returns:
+        str: The absolute path of the socket.
+    """
+    default_path = os.path.join(
+        tempfile.gettempdir(), f"lma_catalogd-{os.getuid()}.sock"
+    )
+    socket_path = os.environ.get("LMA_CATALOG_SOCKET", default_path)
+    abs_path = os.path.abspath(socket_path)
+
+    return abs_path
+
+
 def datetime_within(
     datetime: datetime.datetime,
     start_date: Optional[datetime.datetime],
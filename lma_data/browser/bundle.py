@@ -0,0 +1,411 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+from lma_data.LMA_util import get_lma_cache_dir
+import fnmatch, gzip, hashlib, io, json, os, shutil, stat, tarfile, tempfile, zipfile
+
+# Files inside a bundle are addressed by virtual paths: {bundle_path}::{member}
+BUNDLE_MEMBER_SEPARATOR = "::"
+BUNDLE_PATTERNS = ("*.tar", "*.tar.gz", "*.tgz", "*.zip")
+BUNDLE_EXTENSIONS = (".tar.gz", ".tgz", ".tar", ".zip")
+
+
+def is_bundle_name(name: str) -> bool:
+    """
+    Determines whether a file name is a tar/zip bundle.
+    """
+    return any(fnmatch.fnmatch(name, pattern) for pattern in BUNDLE_PATTERNS)
+
+
+def split_member_path(path: str) -> tuple[str, Optional[str]]:
+    """
+    Splits a virtual path into its bundle path and member name. The member is
+    None for regular paths.
+    """
+    bundle_path, separator, member = path.partition(BUNDLE_MEMBER_SEPARATOR)
+    if not separator:
+        return path, None
+
+    return bundle_path, member
+
+
+def join_member_path(bundle_path: str, member: str) -> str:
+    return f"{bundle_path}{BUNDLE_MEMBER_SEPARATOR}{member}"
+
+
+def member_file_name(path: str) -> str:
+    """
+    Gets the part of a path which should be parsed as a file name, the member
+    name for virtual paths, so bundle names can't be mistaken for data files.
+    """
+    _, member = split_member_path(path)
+    return member if member is not None else path
+
+
+def bundle_dir_path(bundle_path: str) -> str:
+    """
+    Gets the directory a bundle stands in for (ex: LA/data/2023/05/12.tar is the
+    LA/data/2023/05/12 day directory), so directory filters can prune bundles.
+    """
+    for extension in BUNDLE_EXTENSIONS:
+        if bundle_path.endswith(extension):
+            return bundle_path[: -len(extension)]
+
+    return bundle_path
+
+
+@dataclass
+class BundleMember:
+    name: str
+    size: int
+    # Offset of the member's data within an uncompressed tar, -1 otherwise
+    offset: int = -1
+
+
+class BundleIndex:
+    """
+    An index of the members of a tar/zip bundle. Uncompressed tars record each
+    member's data offset, so members can be read with a single seek instead of
+    scanning the tar headers again.
+
+    Indexes are cached in memory and on disk (keyed by the bundle's path, size
+    and mtime), so each bundle is only scanned once.
+    """
+
+    _loaded: dict[str, "BundleIndex"] = {}
+
+    def __init__(
+        self, bundle_path: str, members: list[BundleMember], size: int, mtime_ns: int
+    ):
+        self.bundle_path = bundle_path
+        self.members = members
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._members_by_name = {member.name: member for member in members}
+
+    @staticmethod
+    def load(
+        bundle_path: str,
+        bundle_stat: Optional[os.stat_result] = None,
+        cache_dir: Optional[str] = None,
+    ) -> "BundleIndex":
+        """
+        Loads the index of a bundle from the caches, scanning the bundle if it
+        changed since it was cached.
+        """
+        bundle_path = os.path.abspath(bundle_path)
+        if bundle_stat is None:
+            bundle_stat = os.stat(bundle_path)
+
+        bundle_index = BundleIndex._loaded.get(bundle_path)
+        if bundle_index and bundle_index._matches(bundle_stat):
+            return bundle_index
+
+        index_path = BundleIndex._get_index_path(bundle_path, cache_dir)
+        bundle_index = BundleIndex._read(bundle_path, index_path)
+        if not bundle_index or not bundle_index._matches(bundle_stat):
+            bundle_index = BundleIndex.build(bundle_path, bundle_stat)
+            bundle_index._write(index_path)
+
+        BundleIndex._loaded[bundle_path] = bundle_index
+        return bundle_index
+
+    @staticmethod
+    def build(
+        bundle_path: str, bundle_stat: Optional[os.stat_result] = None
+    ) -> "BundleIndex":
+        """
+        Scans a bundle's members.
+        """
+        if bundle_stat is None:
+            bundle_stat = os.stat(bundle_path)
+
+        members = []
+        if zipfile.is_zipfile(bundle_path):
+            with zipfile.ZipFile(bundle_path) as bundle:
+                for info in bundle.infolist():
+                    if not info.is_dir():
+                        members.append(BundleMember(info.filename, info.file_size))
+        else:
+            with tarfile.open(bundle_path, "r:*") as bundle:
+                # Only plain tars are read straight from the file
+                seekable = isinstance(bundle.fileobj, io.BufferedReader)
+                for info in bundle:
+                    if info.isfile():
+                        offset = info.offset_data if seekable else -1
+                        members.append(BundleMember(info.name, info.size, offset))
+
+        return BundleIndex(
+            bundle_path, members, bundle_stat.st_size, bundle_stat.st_mtime_ns
+        )
+
+    def get(self, member: str) -> Optional[BundleMember]:
+        return self._members_by_name.get(member)
+
+    def member_stat(self, member: BundleMember) -> os.stat_result:
+        """
+        Creates a stat for a member, with the bundle's modification time.
+        """
+        mtime = self.mtime_ns / 1e9
+        return os.stat_result(
+            (stat.S_IFREG | 0o444, 0, 0, 1, 0, 0, member.size, mtime, mtime, mtime)
+        )
+
+    def open(self, member: str) -> BinaryIO:
+        """
+        Opens a member for reading without extracting the bundle.
+        """
+        bundle_member = self.get(member)
+        if not bundle_member:
+            raise FileNotFoundError(
+                f"No member {member} in bundle {self.bundle_path}"
+            )
+
+        if bundle_member.offset >= 0:
+            bundle_file = open(self.bundle_path, "rb")
+            return io.BufferedReader(
+                _MemberReader(bundle_file, bundle_member.offset, bundle_member.size)
+            )
+
+        if zipfile.is_zipfile(self.bundle_path):
+            # The member stream keeps the zip's file open after the zip is closed
+            with zipfile.ZipFile(self.bundle_path) as bundle:
+                return bundle.open(member)
+
+        # Compressed tars can only be read sequentially
+        bundle = tarfile.open(self.bundle_path, "r:*")
+        member_file = bundle.extractfile(member)
+        if not member_file:
+            bundle.close()
+            raise FileNotFoundError(
+                f"No member {member} in bundle {self.bundle_path}"
+            )
+
+        return io.BufferedReader(
+            _MemberReader(member_file, 0, bundle_member.size, bundle)
+        )
+
+    def _matches(self, bundle_stat: os.stat_result) -> bool:
+        return (
+            self.size == bundle_stat.st_size
+            and self.mtime_ns == bundle_stat.st_mtime_ns
+        )
+
+    @staticmethod
+    def _get_index_path(bundle_path: str, cache_dir: Optional[str]) -> str:
+        if cache_dir is None:
+            cache_dir = get_lma_cache_dir()
+
+        digest = hashlib.sha1(bundle_path.encode("utf-8")).hexdigest()
+        return os.path.join(cache_dir, "bundles", f"{digest}.json")
+
+    @staticmethod
+    def _read(bundle_path: str, index_path: str) -> Optional["BundleIndex"]:
+        try:
+            with open(index_path, "r") as index_file:
+                cached = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+
+        if cached.get("path") != bundle_path:
+            return None
+
+        members = [BundleMember(*member) for member in cached["members"]]
+        return BundleIndex(bundle_path, members, cached["size"], cached["mtime_ns"])
+
+    def _write(self, index_path: str):
+        cached = {
+            "path": self.bundle_path,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "members": [
+                [member.name, member.size, member.offset] for member in self.members
+            ],
+        }
+
+        # The cache is only an optimization, so failing to write it is fine
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as index_file:
+                json.dump(cached, index_file)
+            os.replace(temp_path, index_path)
+        except OSError:
+            pass
+
+
+class _MemberReader(io.RawIOBase):
+    """
+    Reads a range of bytes from an underlying file, closing the file (and its
+    owner, such as a tar) when closed.
+    """
+
+    def __init__(self, file: BinaryIO, offset: int, size: int, owner=None):
+        self._file = file
+        self._offset = offset
+        self._size = size
+        self._position = 0
+        self._owner = owner
+        file.seek(offset)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        # Members of compressed tars would be decompressed up to the position
+        return self._owner is None
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if not self.seekable():
+            raise io.UnsupportedOperation("seek")
+
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self._size}
+        self._position = min(max(0, base[whence] + offset), self._size)
+        self._file.seek(self._offset + self._position)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._size - self._position)
+        if size <= 0:
+            return 0
+
+        data = self._file.read(size)
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            if self._owner:
+                self._owner.close()
+
+        super().close()
+
+
+def open_data_path(path: str) -> BinaryIO:
+    """
+    Opens a file for reading, whether it is a regular path or a bundle member.
+    """
+    bundle_path, member = split_member_path(path)
+    if member is None:
+        return open(path, "rb")
+
+    return BundleIndex.load(bundle_path).open(member)
+
+
+def stat_data_path(path: str) -> os.stat_result:
+    """
+    Stats a file, whether it is a regular path or a bundle member.
+    """
+    bundle_path, member = split_member_path(path)
+    if member is None:
+        return os.stat(path)
+
+    bundle_index = BundleIndex.load(bundle_path)
+    bundle_member = bundle_index.get(member)
+    if not bundle_member:
+        raise FileNotFoundError(f"No member {member} in bundle {bundle_path}")
+
+    return bundle_index.member_stat(bundle_member)
+
+
+def gzip_data_size(path: str) -> int:
+    """
+    Estimates the decompressed size of a gzipped file, whether it is a regular
+    path or a bundle member, from the size gzip records in its trailer (modulo
+    4 GiB, so never less than the compressed size is returned).
+    """
+    compressed_size = stat_data_path(path).st_size
+    try:
+        with open_data_path(path) as data_file:
+            if not data_file.seekable():
+                return compressed_size
+
+            data_file.seek(-4, os.SEEK_END)
+            trailer = data_file.read(4)
+    except (OSError, ValueError):
+        return compressed_size
+
+    if len(trailer) < 4:
+        return compressed_size
+
+    return max(int.from_bytes(trailer, "little"), compressed_size)
+
+
+def iter_bundle_members(
+    bundle_path: str,
+    pattern: str = "*",
+    bundle_stat: Optional[os.stat_result] = None,
+) -> Iterator[tuple[str, os.stat_result]]:
+    """
+    Yields the virtual paths and stats of a bundle's members whose file names
+    match the pattern.
+    """
+    try:
+        bundle_index = BundleIndex.load(bundle_path, bundle_stat)
+    except (OSError, tarfile.TarError, zipfile.BadZipFile):
+        # Like unreadable directories, unreadable bundles are skipped
+        return
+
+    for member in sorted(bundle_index.members, key=lambda member: member.name):
+        if fnmatch.fnmatch(os.path.basename(member.name), pattern):
+            yield join_member_path(
+                bundle_path, member.name
+            ), bundle_index.member_stat(member)
+
+
+@contextmanager
+def local_data_paths(
+    paths: list[str],
+    scratch_dir: Optional[str] = None,
+    copy_files: bool = False,
+    decompress: bool = False,
+) -> Iterator[list[str]]:
+    """
+    Provides local file paths for external tools which can't read bundles.
+    Bundle members are staged into a temporary directory, which is removed
+    afterwards; regular paths are passed through, unless copy_files is set (ex:
+    to read them from a local scratch disk rather than a slow mount).
+    With decompress, gzipped files are staged decompressed.
+    """
+
+    def needs_staging(path: str) -> bool:
+        return (
+            copy_files
+            or split_member_path(path)[1] is not None
+            or (decompress and path.endswith(".gz"))
+        )
+
+    if not any(needs_staging(path) for path in paths):
+        yield paths
+        return
+
+    with tempfile.TemporaryDirectory(prefix="lma_stage_", dir=scratch_dir) as stage_dir:
+        local_paths = []
+        for path in paths:
+            if not needs_staging(path):
+                local_paths.append(path)
+                continue
+
+            file_name = os.path.basename(member_file_name(path))
+            gzipped = decompress and file_name.endswith(".gz")
+            if gzipped:
+                file_name = file_name[: -len(".gz")]
+
+            local_path = os.path.join(stage_dir, file_name)
+            if os.path.exists(local_path):
+                # Members of different bundles may share a file name
+                local_path = os.path.join(tempfile.mkdtemp(dir=stage_dir), file_name)
+
+            with open_data_path(path) as data_file:
+                source = gzip.GzipFile(fileobj=data_file) if gzipped else data_file
+                with source, open(local_path, "wb") as local_file:
+                    shutil.copyfileobj(source, local_file, 1 << 20)
+
+            local_paths.append(local_path)
+
+        yield local_paths
@@ -0,0 +1,63 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Generic, Optional, TypeVar
+from lma_data.LMA_bulk_parse import ParsedColumns
+import os
+
+T = TypeVar("T")
+
+# A filter bound to its arguments, returning the mask of the chunk's files passing
+BoundChunkPredicate = Callable[["FileChunk"], np.ndarray]
+
+# Maps paths in bulk, returning the parsed columns and files of the paths kept
+BulkMapper = Callable[[list[str]], tuple[ParsedColumns, list[T]]]
+
+
+@dataclass
+class FileChunk(Generic[T]):
+    """
+    A chunk of candidate files handed to filters at once. When the browser maps
+    paths in bulk, their parsed fields are available in columnar form.
+    """
+
+    paths: list[str]
+    files: list[T]
+    stats: list[Optional[os.stat_result]]
+    columns: Optional[ParsedColumns] = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def has_column(self, name: Optional[str]) -> bool:
+        if name is None or self.columns is None:
+            return False
+
+        return (
+            name == "datetime"
+            or name in self.columns.codes
+            or name in self.columns.values
+        )
+
+    def sizes(self) -> np.ndarray:
+        """
+        The size of each file, reusing the stats fetched while walking.
+        """
+        return np.fromiter(
+            (
+                (stat if stat is not None else os.stat(path)).st_size
+                for path, stat in zip(self.paths, self.stats)
+            ),
+            dtype=np.int64,
+            count=len(self.paths),
+        )
+
+    def select(self, mask: np.ndarray) -> "FileChunk[T]":
+        indices = np.flatnonzero(mask)
+        columns = self.columns.select(mask) if self.columns is not None else None
+
+        return FileChunk(
+            [self.paths[i] for i in indices],
+            [self.files[i] for i in indices],
+            [self.stats[i] for i in indices],
+            columns,
+        )
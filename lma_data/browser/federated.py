@@ -0,0 +1,50 @@
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+from lma_data.browser.file_browser import FileBrowser
+import heapq
+
+T = TypeVar("T")
+
+
+def imerge_sorted(
+    streams: list[Iterable[tuple[T, str]]],
+    key: Callable[[T], Any],
+    identity: Optional[Callable[[T], Any]] = None,
+) -> Iterator[tuple[T, str]]:
+    """
+    Lazily merges key-sorted streams of (file, path), listed from the highest to
+    the lowest priority. When the same file (per identity, which defaults to the
+    key) appears in several streams, only the highest priority one is kept.
+    """
+    identity = identity if identity else key
+    last_key = None
+    seen_identities = set()
+
+    # heapq.merge keeps items with equal keys in stream order
+    for file, path in heapq.merge(*streams, key=lambda item: key(item[0])):
+        file_key = key(file)
+        if file_key != last_key:
+            last_key = file_key
+            seen_identities = set()
+
+        file_identity = identity(file)
+        if file_identity in seen_identities:
+            continue
+
+        seen_identities.add(file_identity)
+        yield file, path
+
+
+def imerge_roots(
+    browser: FileBrowser[T],
+    root_dirs: list[str],
+    key: Callable[[T], Any],
+    identity: Optional[Callable[[T], Any]] = None,
+    **kwargs,
+) -> Iterator[tuple[T, str]]:
+    """
+    Lazily finds files across several root directories in key order. Roots are
+    listed from the highest to the lowest priority (ex: local SSD before the
+    archive mount); a file present in several roots is taken from the first.
+    """
+    streams = [browser.ifind_sorted(root_dir, key, **kwargs) for root_dir in root_dirs]
+    return imerge_sorted(streams, key, identity)
@@ -1,52 +1,507 @@
-from typing import Iterator, TypeVar, Generic, Callable, Optional
-from lma_data.browser.filters.filter import BrowserFilter
-import glob, os
+from typing import Any, Iterable, Iterator, TypeVar, Generic, Callable, Optional
+from lma_data.browser.filters.filter import (
+    BrowserFilter,
+    BoundPredicate,
+    compile_predicates,
+)
+from lma_data.browser.filters.stats import (
+    FilterStats,
+    compile_adaptive,
+    instrument_chunk_predicate,
+    instrument_predicate,
+)
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate, BulkMapper
+from lma_data.browser.walker import ScandirWalker
+from lma_data.browser.bundle import (
+    BUNDLE_PATTERNS,
+    bundle_dir_path,
+    is_bundle_name,
+    iter_bundle_members,
+    split_member_path,
+)
+from itertools import islice
+import numpy as np
+import fnmatch, glob, heapq, os, time
 
 T = TypeVar("T")
 
+# A chunk size amortizing the vectorized filters' overhead, see bench_filters
+DEFAULT_CHUNK_SIZE = 4096
+
 
 def default_mapper(path: str) -> str:
     return path
 
 
+def _accept_file(path: str, file: Any, stat: Optional[os.stat_result]) -> bool:
+    return True
+
+
+class UnsortedFilesError(ValueError):
+    """
+    Raised by ifind_sorted when a root's directories don't sort like the keys of
+    their files, so its files can't be found in key order lazily.
+    """
+
+
 class FileBrowser(Generic[T]):
     def __init__(
         self,
         mapper: Callable[[str], Optional[T]] = default_mapper,
         glob_pathname="**/*.*",
+        walker: Optional[ScandirWalker] = None,
+        bundles: bool = False,
+        member_pattern: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        bulk_mapper: Optional[BulkMapper] = None,
     ):
+        """
+        When bundles is set, tar/zip bundles found while walking are browsed too,
+        yielding their members as {bundle_path}::{member} virtual paths. Members
+        are matched against member_pattern, which defaults to the glob's file
+        pattern.
+
+        When chunk_size is set, files are mapped and filtered chunk_size at a
+        time through the filters' vectorized bind_chunk. A bulk_mapper (ex:
+        parsing the file names into columns) then replaces the mapper, giving
+        filters the files' parsed fields in columnar form.
+        """
         self._filters: list[BrowserFilter[T]] = []
+        self._filter_stats: list[FilterStats] = []
+        self.collect_filter_stats = False
+        self.adaptive_filters = False
         self._mapper = mapper
         self.glob_pathname = glob_pathname
+        self.walker = walker if walker else ScandirWalker()
+        self.bundles = bundles
+        self.member_pattern = member_pattern
+        self.chunk_size = chunk_size
+        self._bulk_mapper = bulk_mapper
+
+    @property
+    def name_pattern(self) -> str:
+        """
+        The pattern the names of the found files match (the glob's last part).
+        """
+        return os.path.basename(self.glob_pathname)
 
     def add_filter(self, browser_filter: BrowserFilter):
         self._filters.append(browser_filter)
+        self._filter_stats.append(FilterStats(browser_filter.name))
+
+    def enable_filter_stats(self, adaptive: bool = False):
+        """
+        Counts the calls, rejections and time of each filter. When adaptive is
+        set, the filters are also reordered by their observed cost and
+        selectivity, so cheap selective filters run first.
+        """
+        self.collect_filter_stats = True
+        self.adaptive_filters = adaptive
+
+    def filter_stats(self) -> list[FilterStats]:
+        """
+        The stats of each filter, in registration order.
+        """
+        return list(self._filter_stats)
 
     def ifind(self, root_dir: str, **kwargs) -> Iterator[T]:
         for file, _ in self.ifind2(root_dir, **kwargs):
             yield file
 
     def ifind2(self, root_dir: str, **kwargs) -> Iterator[tuple[T, str]]:
-        pathname = self._get_glob_pathname(root_dir)
-        for path in glob.iglob(pathname, recursive=True):
-            file = self._mapper(path)
-            if file and self._test_file(path, file, **kwargs):
+        for file, path, _ in self.ifind3(root_dir, **kwargs):
+            yield file, path
+
+    def ifind3(
+        self, root_dir: str, **kwargs
+    ) -> Iterator[tuple[T, str, Optional[os.stat_result]]]:
+        """
+        Finds files along with their stat, when the walker already fetched it.
+        """
+        yield from self._itest(self._iwalk(root_dir, kwargs), kwargs)
+
+    def ifind_sorted(
+        self,
+        root_dir: str,
+        key: Callable[[T], Any],
+        sorted_dir: Optional[Callable[[str], bool]] = None,
+        **kwargs,
+    ) -> Iterator[tuple[T, str]]:
+        """
+        Lazily finds files in key order. Each subdirectory of the root is walked in
+        name order, sorting one directory of files at a time, then the
+        subdirectories' streams are merged. This needs directory names to sort
+        like the keys of their files: sorted_dir tells which directories
+        (relative to the root) have subdirectories that do (ex: the year/month
+        directories of the {network}/data/{year}/{month}/{day} archive layout).
+
+        The root's other directories are checked before anything is found, and
+        when one of them branches (ex: {network}/{station} directories), the
+        root's files are sorted as a whole instead. An UnsortedFilesError is
+        raised if a file still turns up out of order.
+        """
+        if self._get_file_pattern() is None or not self._sorts_lazily(
+            root_dir, sorted_dir, kwargs
+        ):
+            yield from sorted(self.ifind2(root_dir, **kwargs), key=lambda f: key(f[0]))
+            return
+
+        walker = self.walker
+        if not walker.ordered:
+            walker = ScandirWalker(walker.max_workers, True, walker.stat)
+
+        streams = [
+            self._ifind_dir_sorted(walker, root_dir, root_dir, key, kwargs, False)
+        ]
+        for subdir in self._list_subdirs(root_dir, kwargs):
+            streams.append(
+                self._ifind_dir_sorted(walker, root_dir, subdir, key, kwargs, True)
+            )
+
+        last_key = None
+        for file, path in heapq.merge(*streams, key=lambda item: key(item[0])):
+            file_key = key(file)
+            if last_key is not None and file_key < last_key:
+                raise UnsortedFilesError(
+                    f"{path} is out of order: the directories of {root_dir} "
+                    f"don't sort like their files"
+                )
+
+            last_key = file_key
+            yield file, path
+
+    def ifilter(
+        self, files: Iterable[tuple[T, str]], **kwargs
+    ) -> Iterator[tuple[T, str]]:
+        """
+        Applies the browser's filters to already discovered files, such as those
+        read from a catalog.
+        """
+        if self.chunk_size:
+            chunks = (
+                FileChunk(
+                    [path for _, path in chunk],
+                    [file for file, _ in chunk],
+                    [None] * len(chunk),
+                )
+                for chunk in _ichunked(files, self.chunk_size)
+            )
+            for file, path, _ in self._itest_chunks(chunks, kwargs):
                 yield file, path
 
+            return
+
+        test_file = self.bind_filters(kwargs)
+        for file, path in files:
+            if test_file(path, file, None):
+                yield file, path
+
+    def ifind_paths(self, paths: Iterable[str], **kwargs) -> Iterator[T]:
+        """
+        Maps and filters listed paths (ex: a file list from lma_find) like walked
+        ones, without walking any directory. Paths whose file name doesn't match
+        the browser's glob pattern (or, for bundle members, the member pattern)
+        are skipped, as the walk would have.
+        """
+        file_pattern = self.name_pattern
+        member_pattern = self.member_pattern or file_pattern
+
+        def matches(path: str) -> bool:
+            _, member = split_member_path(path)
+            if member is not None:
+                return fnmatch.fnmatch(os.path.basename(member), member_pattern)
+
+            return fnmatch.fnmatch(os.path.basename(path), file_pattern)
+
+        listed = ((path, None) for path in paths if matches(path))
+        for file, _, _ in self._itest(listed, kwargs):
+            yield file
+
     def find(self, root_dir: str, **kwargs) -> list[T]:
-        pathname = self._get_glob_pathname(root_dir)
-        files = []
+        return list(self.ifind(root_dir, **kwargs))
 
-        for path in glob.glob(pathname, recursive=True):
+    def _ifind_dir_sorted(
+        self,
+        walker: ScandirWalker,
+        root_dir: str,
+        dir_path: str,
+        key: Callable[[T], Any],
+        args: dict,
+        recursive: bool,
+    ) -> Iterator[tuple[T, str]]:
+        group: list[tuple[T, str]] = []
+        group_dir = None
+        walked = self._iwalk(dir_path, args, walker, recursive, root_dir)
+        for file, path, _ in self._itest(walked, args):
+            parent_dir = os.path.dirname(path)
+            if parent_dir != group_dir:
+                group.sort(key=lambda item: key(item[0]))
+                yield from group
+                group = []
+                group_dir = parent_dir
+
+            group.append((file, path))
+
+        group.sort(key=lambda item: key(item[0]))
+        yield from group
+
+    def _itest(
+        self, walked: Iterable[tuple[str, Optional[os.stat_result]]], args: dict
+    ) -> Iterator[tuple[T, str, Optional[os.stat_result]]]:
+        """
+        Maps and filters walked paths, one by one or in chunks.
+        """
+        if self.chunk_size:
+            chunks = map(self._map_chunk, _ichunked(walked, self.chunk_size))
+            yield from self._itest_chunks(chunks, args)
+            return
+
+        test_file = self.bind_filters(args)
+        mapper = self._mapper
+        for path, stat in walked:
+            file = mapper(path)
+            if file and test_file(path, file, stat):
+                yield file, path, stat
+
+    def _itest_chunks(
+        self, chunks: Iterable[FileChunk[T]], args: dict
+    ) -> Iterator[tuple[T, str, Optional[os.stat_result]]]:
+        test_chunk = self.bind_chunk_filters(args)
+        for chunk in chunks:
+            for i in np.flatnonzero(test_chunk(chunk)):
+                yield chunk.files[i], chunk.paths[i], chunk.stats[i]
+
+    def _map_chunk(
+        self, walked: list[tuple[str, Optional[os.stat_result]]]
+    ) -> FileChunk[T]:
+        if self._bulk_mapper:
+            columns, files = self._bulk_mapper([path for path, _ in walked])
+            stats = dict(walked)
+            return FileChunk(
+                columns.paths, files, [stats[path] for path in columns.paths], columns
+            )
+
+        paths = []
+        files = []
+        stats = []
+        for path, stat in walked:
             file = self._mapper(path)
-            if file and self._test_file(path, file, **kwargs):
+            if file:
+                paths.append(path)
                 files.append(file)
+                stats.append(stat)
 
-        return files
+        return FileChunk(paths, files, stats)
 
-    def _test_file(self, path: str, file: T, **kwargs):
-        return all(map(lambda filter: filter.test(path, file, kwargs), self._filters))
+    def _sorts_lazily(
+        self,
+        root_dir: str,
+        sorted_dir: Optional[Callable[[str], bool]],
+        args: dict,
+    ) -> bool:
+        """
+        Checks that the root's directories, below those merged by ifind_sorted,
+        don't branch, apart from those sorted_dir vouches for (which aren't
+        listed). A directory holding files as well as a subdirectory branches
+        too, its files being walked before the subdirectory's.
+        """
+        patterns = [self._get_file_pattern()]
+        if self.bundles:
+            patterns.extend(BUNDLE_PATTERNS)
+
+        stack = self._list_subdirs(root_dir, args)
+        while stack:
+            dir_path = stack.pop()
+            if sorted_dir and sorted_dir(os.path.relpath(dir_path, root_dir)):
+                continue
+
+            subdirs = []
+            has_files = False
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+
+                        if entry.is_dir():
+                            if self._test_dir(root_dir, entry.path, args):
+                                subdirs.append(entry.path)
+                        elif any(fnmatch.fnmatch(entry.name, p) for p in patterns):
+                            has_files = True
+            except OSError:
+                continue
+
+            if len(subdirs) > 1 or (subdirs and has_files):
+                return False
+
+            stack.extend(subdirs)
+
+        return True
+
+    def _list_subdirs(self, root_dir: str, args: dict) -> list[str]:
+        subdirs = []
+        try:
+            with os.scandir(root_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or not entry.is_dir():
+                        continue
+
+                    if self._test_dir(root_dir, entry.path, args):
+                        subdirs.append(entry.path)
+        except OSError:
+            # Like the walker, missing or unreadable roots are silently skipped
+            return []
+
+        return sorted(subdirs)
+
+    def bind_chunk_filters(
+        self, args: dict[str, Any]
+    ) -> Callable[[FileChunk[T]], np.ndarray]:
+        """
+        Binds the browser's filters to the search's arguments once, compiling
+        them into a predicate returning the mask of a chunk's files passing.
+        Each filter only tests the files which passed the previous ones.
+        """
+        entries: list[tuple[FilterStats, BoundChunkPredicate]] = []
+        for browser_filter, stats in zip(self._filters, self._filter_stats):
+            start = time.perf_counter()
+            predicate = browser_filter.bind_chunk(args)
+            stats.bind_seconds += time.perf_counter() - start
+            if predicate and self.collect_filter_stats:
+                predicate = instrument_chunk_predicate(predicate, stats)
+            if predicate:
+                entries.append((stats, predicate))
+
+        adaptive = self.collect_filter_stats and self.adaptive_filters
+
+        def test_chunk(chunk: FileChunk[T]) -> np.ndarray:
+            order = entries
+            if adaptive:
+                order = sorted(entries, key=lambda entry: entry[0].rank)
+
+            indices = np.arange(len(chunk))
+            candidates = chunk
+            for _, predicate in order:
+                if len(candidates) == 0:
+                    break
+
+                passed = predicate(candidates)
+                if not passed.all():
+                    indices = indices[passed]
+                    candidates = candidates.select(passed)
+
+            mask = np.zeros(len(chunk), dtype=bool)
+            mask[indices] = True
+            return mask
+
+        return test_chunk
+
+    def _iwalk(
+        self,
+        root_dir: str,
+        args: dict,
+        walker: Optional[ScandirWalker] = None,
+        recursive: bool = True,
+        search_root: Optional[str] = None,
+    ) -> Iterator[tuple[str, Optional[os.stat_result]]]:
+        """
+        Walks root_dir, which is part of the search of search_root (root_dir
+        itself by default).
+        """
+        walker = walker if walker else self.walker
+        search_root = search_root if search_root else root_dir
+        file_pattern = self._get_file_pattern()
+        if file_pattern is None:
+            pathname = self._get_glob_pathname(root_dir)
+            for path in glob.iglob(pathname, recursive=True):
+                yield path, None
+
+            return
+
+        def test_dir(dir_path: str) -> bool:
+            return self._test_dir(search_root, dir_path, args)
+
+        def include_dir(dir_path: str) -> bool:
+            return recursive and test_dir(dir_path)
+
+        if not self.bundles:
+            for entry in walker.walk(root_dir, file_pattern, include_dir):
+                stat = entry.stat() if walker.stat else None
+                yield entry.path, stat
+
+            return
+
+        member_pattern = self.member_pattern if self.member_pattern else file_pattern
+        patterns = (file_pattern, *BUNDLE_PATTERNS)
+        for entry in walker.walk(root_dir, patterns, include_dir):
+            if not is_bundle_name(entry.name):
+                yield entry.path, entry.stat() if walker.stat else None
+            elif test_dir(bundle_dir_path(entry.path)):
+                # Bundles stand in for directories, so they are pruned like them
+                yield from iter_bundle_members(
+                    entry.path, member_pattern, entry.stat()
+                )
+
+    def _test_dir(self, search_root: str, dir_path: str, args: dict) -> bool:
+        # Filters test directories relative to the search's root, so the
+        # directories above it can't be mistaken for the archive layout
+        relative_path = os.path.relpath(dir_path, search_root)
+        return all(
+            map(lambda filter: filter.test_dir(relative_path, args), self._filters)
+        )
+
+    def bind_filters(self, args: dict[str, Any]) -> BoundPredicate:
+        """
+        Binds the browser's filters to the search's arguments once, compiling
+        them into a single predicate called for each file.
+        """
+        if not self.collect_filter_stats:
+            test_file = compile_predicates(
+                [filter.bind(args) for filter in self._filters]
+            )
+            return test_file if test_file else _accept_file
+
+        entries = []
+        for browser_filter, stats in zip(self._filters, self._filter_stats):
+            start = time.perf_counter()
+            predicate = browser_filter.bind(args)
+            stats.bind_seconds += time.perf_counter() - start
+            if predicate:
+                entries.append((stats, instrument_predicate(predicate, stats)))
+
+        if not entries:
+            return _accept_file
+
+        if self.adaptive_filters:
+            return compile_adaptive(entries)
+
+        return compile_predicates([predicate for _, predicate in entries])
+
+    def _get_file_pattern(self) -> Optional[str]:
+        """
+        Recursive glob pathnames (ex: **/*.dat) are walked with the scandir walker,
+        anything else falls back to glob.
+        """
+        prefix = "**/"
+        if not self.glob_pathname.startswith(prefix):
+            return None
+
+        file_pattern = self.glob_pathname[len(prefix) :]
+        if "/" in file_pattern or "**" in file_pattern:
+            return None
+
+        return file_pattern
 
     def _get_glob_pathname(self, root_dir: str) -> str:
         pathname = os.path.join(root_dir, self.glob_pathname)
         return pathname
+
+
+def _ichunked(items: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+
+        yield chunk
@@ -1,4 +1,4 @@
-from lma_data.browser.filters.filter import BrowserFilter
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
 from lma_data.browser.file_browser import FileBrowser
 from datetime import datetime
 from typing import Any, Callable, Iterable, TypeVar, Optional
@@ -25,7 +25,7 @@ class CacheFilter(BrowserFilter[T]):
         if no_cache:
             return True
 
-        if not self._cache:
+        if self._cache is None:
             self._load_cache(args)
 
         key_val = self._get_file_cache_property(path, file)
@@ -33,6 +33,17 @@ class CacheFilter(BrowserFilter[T]):
 
         return not_in_cache
 
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        if args.get(self.no_cache_arg):
+            return None
+
+        if self._cache is None:
+            self._load_cache(args)
+
+        cache = self._cache
+        get_file_cache_property = self._get_file_cache_property
+        return lambda path, file, stat: get_file_cache_property(path, file) not in cache
+
     def apply_to_argparser(self, parser: argparse.ArgumentParser):
         parser.add_argument(f"--no-cache", action="store_true")
 
@@ -1,6 +1,13 @@
-from lma_data.browser.filters.filter import BrowserFilter
+from lma_data.browser.filters.filter import (
+    BrowserFilter,
+    BoundPredicate,
+    compile_predicates,
+)
 from datetime import datetime
-from typing import Any, TypeVar
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
+from typing import Any, TypeVar, Optional
+import numpy as np
+import os
 
 T = TypeVar("T")
 
@@ -10,5 +17,39 @@ class CompoundFilter(BrowserFilter[T]):
         self._filters = filters
         super().__init__(self._predicate)
 
+    def test(
+        self,
+        path: str,
+        file: T,
+        args: dict[str, Any],
+        stat: Optional[os.stat_result] = None,
+    ) -> bool:
+        return all(
+            map(lambda filter: filter.test(path, file, args, stat), self._filters)
+        )
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        return compile_predicates(
+            [filter.bind(args) for filter in self._filters]
+        )
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        predicates = [filter.bind_chunk(args) for filter in self._filters]
+        predicates = [predicate for predicate in predicates if predicate]
+        if not predicates:
+            return None
+
+        def chunk_predicate(chunk: FileChunk[T]) -> np.ndarray:
+            mask = np.ones(len(chunk), dtype=bool)
+            for predicate in predicates:
+                mask &= predicate(chunk)
+
+            return mask
+
+        return chunk_predicate
+
+    def test_dir(self, dir_path: str, args: dict[str, Any]) -> bool:
+        return all(map(lambda filter: filter.test_dir(dir_path, args), self._filters))
+
     def _predicate(self, path: str, file: T, args: dict[str, Any]):
-        return all(map(lambda filter: filter.test(path, args), self._filters))
+        return self.test(path, file, args)
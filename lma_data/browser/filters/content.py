@@ -0,0 +1,35 @@
+from typing import Callable, Any, TypeVar, Optional
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
+import os
+
+T = TypeVar("T")
+
+
+class ContentFilter(BrowserFilter[T]):
+    """
+    Tests files by their content (ex: probing their header) rather than their
+    name. Reading files is much more expensive than the other filters, so this
+    filter should come last in the browser's chain.
+    """
+
+    def __init__(
+        self, test_content: Callable[[str, Optional[os.stat_result]], bool]
+    ):
+        self._test_content = test_content
+        super().__init__(self._predicate)
+
+    def test(
+        self,
+        path: str,
+        file: T,
+        args: dict[str, Any],
+        stat: Optional[os.stat_result] = None,
+    ) -> bool:
+        return self._test_content(path, stat)
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        test_content = self._test_content
+        return lambda path, file, stat: test_content(path, stat)
+
+    def _predicate(self, path: str, file: T, args: dict[str, Any]):
+        return self._test_content(path, None)
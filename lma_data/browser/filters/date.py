@@ -1,19 +1,36 @@
-from lma_data.browser.filters.filter import BrowserFilter
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
 from datetime import datetime
 from typing import Any, Callable, Optional, TypeVar
 from lma_data.LMA_cli import parse_date_string
 from lma_data.LMA_util import datetime_within
+from lma_data.LMA_layout import archive_span_within
+import numpy as np
 import argparse
 
 T = TypeVar("T")
 
 
 class DateFilter(BrowserFilter[T]):
-    def __init__(self, date_parser: Callable[[str, T], Optional[datetime]]):
+    def __init__(
+        self,
+        date_parser: Callable[[str, T], Optional[datetime]],
+        dir_span_parser: Optional[
+            Callable[[str], Optional[tuple[datetime, datetime]]]
+        ] = None,
+        column: Optional[str] = None,
+    ):
+        """
+        column names the parsed field holding the date, when files are mapped in
+        bulk (ex: datetime), so chunks of files are tested without parsing them
+        one by one.
+        """
         self.start_date_arg_name = "start_date"
         self.end_date_arg_name = "end_date"
         self.date_parser = date_parser
+        self.dir_span_parser = dir_span_parser
         self.missing_date_accepted = False
+        self.column = column
         super().__init__(self._predicate)
 
     def _predicate(self, path: str, file: T, args: dict[str, Any]):
@@ -28,6 +45,77 @@ class DateFilter(BrowserFilter[T]):
 
         return datetime_within(path_datetime, start_date, end_date)
 
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        start_date = parse_date_string(args.get(self.start_date_arg_name))
+        end_date = parse_date_string(args.get(self.end_date_arg_name))
+        date_parser = self.date_parser
+        missing_date_accepted = self.missing_date_accepted
+
+        if not start_date and not end_date:
+            if missing_date_accepted:
+                return None
+
+            return lambda path, file, stat: bool(date_parser(path, file))
+
+        def predicate(path: str, file: T, stat) -> bool:
+            path_datetime = date_parser(path, file)
+            if not path_datetime:
+                return missing_date_accepted
+
+            if start_date and path_datetime < start_date:
+                return False
+
+            return not (end_date and path_datetime > end_date)
+
+        return predicate
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        start_date = parse_date_string(args.get(self.start_date_arg_name))
+        end_date = parse_date_string(args.get(self.end_date_arg_name))
+        if not start_date and not end_date and self.missing_date_accepted:
+            return None
+
+        predicate = self.bind(args)
+        missing_date_accepted = self.missing_date_accepted
+        column = self.column
+        start = np.datetime64(start_date, "us") if start_date else None
+        end = np.datetime64(end_date, "us") if end_date else None
+
+        def chunk_predicate(chunk: FileChunk[T]) -> np.ndarray:
+            if not chunk.has_column(column):
+                # Converting each date to NumPy would cost more than testing it
+                return np.fromiter(
+                    map(predicate, chunk.paths, chunk.files, chunk.stats),
+                    dtype=bool,
+                    count=len(chunk),
+                )
+
+            times = chunk.columns.column(column)
+            within = ~np.isnat(times)
+            if start is not None:
+                within &= times >= start
+            if end is not None:
+                within &= times <= end
+
+            if missing_date_accepted:
+                within |= np.isnat(times)
+
+            return within
+
+        return chunk_predicate
+
+    def test_dir(self, dir_path: str, args: dict[str, Any]) -> bool:
+        if not self.dir_span_parser:
+            return True
+
+        start_date = parse_date_string(args.get(self.start_date_arg_name))
+        end_date = parse_date_string(args.get(self.end_date_arg_name))
+        if not start_date and not end_date:
+            return True
+
+        dir_span = self.dir_span_parser(dir_path)
+        return archive_span_within(dir_span, start_date, end_date)
+
     def apply_to_argparser(self, parser: argparse.ArgumentParser):
         parser.add_argument("--start-date", dest=self.start_date_arg_name, type=str)
         parser.add_argument("--end-date", dest=self.end_date_arg_name, type=str)
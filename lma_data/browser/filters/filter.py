@@ -1,15 +1,91 @@
-from typing import Callable, Any, TypeVar, Generic
+from typing import Callable, Any, TypeVar, Generic, Optional
 from argparse import ArgumentParser
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
+import numpy as np
+import os
 
 T = TypeVar("T")
 
+# A filter bound to its arguments, called with (path, file, stat)
+BoundPredicate = Callable[[str, T, Optional[os.stat_result]], bool]
+
+
+def compile_predicates(
+    predicates: list[Optional[BoundPredicate]],
+) -> Optional[BoundPredicate]:
+    """
+    Chains bound predicates into a single one, leaving out those which accept
+    every file. Returns None when no predicate is left.
+    """
+    predicates = [predicate for predicate in predicates if predicate is not None]
+    if not predicates:
+        return None
+
+    if len(predicates) == 1:
+        return predicates[0]
+
+    def chain(path: str, file: T, stat: Optional[os.stat_result]) -> bool:
+        for predicate in predicates:
+            if not predicate(path, file, stat):
+                return False
+
+        return True
+
+    return chain
+
 
 class BrowserFilter(Generic[T]):
     def __init__(self, predicate: Callable[[str, T, dict[str, Any]], bool]):
         self.predicate = predicate
 
-    def test(self, path: str, file: T, args: dict[str, Any]) -> bool:
+    def test(
+        self,
+        path: str,
+        file: T,
+        args: dict[str, Any],
+        stat: Optional[os.stat_result] = None,
+    ) -> bool:
         return self.predicate(path, file, args)
 
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        """
+        Resolves the filter's arguments once (ex: parsing dates) into a predicate
+        testing files. Returns None when every file passes with these arguments,
+        so the filter can be left out of the browser's filter chain.
+        """
+        test = self.test
+        return lambda path, file, stat: test(path, file, args, stat)
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        """
+        Like bind, but the predicate tests a whole chunk of files at once and
+        returns the mask of those passing. Filters without a vectorized
+        implementation test the chunk's files one by one.
+        """
+        predicate = self.bind(args)
+        if predicate is None:
+            return None
+
+        def chunk_predicate(chunk: FileChunk[T]) -> np.ndarray:
+            return np.fromiter(
+                map(predicate, chunk.paths, chunk.files, chunk.stats),
+                dtype=bool,
+                count=len(chunk),
+            )
+
+        return chunk_predicate
+
+    def test_dir(self, dir_path: str, args: dict[str, Any]) -> bool:
+        """
+        Determines whether a directory, relative to the root being searched, may
+        contain files passing this filter. Returning False lets the browser skip
+        the directory's whole subtree.
+        """
+        return True
+
     def apply_to_argparser(self, parser: ArgumentParser):
         pass
@@ -1,7 +1,7 @@
-from typing import Callable, Any, TypeVar
+from typing import Callable, Any, TypeVar, Optional
 from argparse import ArgumentParser
-from lma_data.browser.filters.filter import BrowserFilter
-from lma_data.LMA_cli import flatten_arg_values
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
+from lma_data.browser.chunk import BoundChunkPredicate
 import os
 
 T = TypeVar("T")
@@ -12,5 +12,33 @@ class NonEmptyFileFilter(BrowserFilter[T]):
         self.st_size = st_size
         super().__init__(self._predicate)
 
+    def test(
+        self,
+        path: str,
+        file: T,
+        args: dict[str, Any],
+        stat: Optional[os.stat_result] = None,
+    ) -> bool:
+        # Reuse the stat fetched while walking, if there is one
+        if stat is None:
+            return self._predicate(path, file, args)
+
+        return stat.st_size >= self.st_size
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        st_size = self.st_size
+
+        def predicate(path: str, file: T, stat: Optional[os.stat_result]) -> bool:
+            if stat is None:
+                stat = os.stat(path)
+
+            return stat.st_size >= st_size
+
+        return predicate
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        st_size = self.st_size
+        return lambda chunk: chunk.sizes() >= st_size
+
     def _predicate(self, path: str, file: T, args: dict[str, Any]):
         return os.stat(path).st_size >= self.st_size
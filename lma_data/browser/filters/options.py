@@ -1,16 +1,32 @@
-from typing import Callable, Any, TypeVar
+from typing import Callable, Any, TypeVar, Optional
 from argparse import ArgumentParser
-from lma_data.browser.filters.filter import BrowserFilter
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
+import numpy as np
 from lma_data.LMA_cli import flatten_arg_values
+from lma_data.LMA_layout import archive_name_within
 
 T = TypeVar("T")
 
 
 class OptionsFilter(BrowserFilter[T]):
-    def __init__(self, options_arg_name: str, get_property: Callable[[str, T], str]):
+    def __init__(
+        self,
+        options_arg_name: str,
+        get_property: Callable[[str, T], str],
+        get_dir_property: Optional[Callable[[str], Optional[str]]] = None,
+        column: Optional[str] = None,
+    ):
+        """
+        column names the parsed field holding the property, when files are
+        mapped in bulk (ex: network), so chunks of files are tested on their
+        coded values.
+        """
         self.options_arg_name = options_arg_name
         self.get_property = get_property
+        self.get_dir_property = get_dir_property
         self.case_insensitive = True
+        self.column = column
         super().__init__(self._predicate)
 
     def _predicate(self, path: str, file: T, args: dict[str, Any]):
@@ -27,6 +43,66 @@ class OptionsFilter(BrowserFilter[T]):
 
         return val in options
 
+    @property
+    def name(self) -> str:
+        return f"{type(self).__name__}({self.options_arg_name})"
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        options = args.get(self.options_arg_name)
+        if not options:
+            return None
+
+        get_property = self.get_property
+        if not self.case_insensitive:
+            options = frozenset(flatten_arg_values(options))
+            return lambda path, file, stat: get_property(path, file) in options
+
+        options = frozenset(option.lower() for option in flatten_arg_values(options))
+        return lambda path, file, stat: get_property(path, file).lower() in options
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        options = args.get(self.options_arg_name)
+        if not options:
+            return None
+
+        case_insensitive = self.case_insensitive
+        options = frozenset(
+            option.lower() if case_insensitive else option
+            for option in flatten_arg_values(options)
+        )
+        predicate = self.bind(args)
+        column = self.column
+
+        def accepts(value: str) -> bool:
+            return (value.lower() if case_insensitive else value) in options
+
+        def chunk_predicate(chunk: FileChunk[T]) -> np.ndarray:
+            if chunk.columns is None or column not in chunk.columns.codes:
+                return np.fromiter(
+                    map(predicate, chunk.paths, chunk.files, chunk.stats),
+                    dtype=bool,
+                    count=len(chunk),
+                )
+
+            # Only the distinct values are tested, then looked up by code
+            vocabulary = chunk.columns.vocabularies[column]
+            accepted = np.fromiter(
+                map(accepts, vocabulary), dtype=bool, count=len(vocabulary)
+            )
+            return accepted[chunk.columns.codes[column]]
+
+        return chunk_predicate
+
+    def test_dir(self, dir_path: str, args: dict[str, Any]) -> bool:
+        options = args.get(self.options_arg_name)
+        if not options or not self.get_dir_property:
+            return True
+
+        # Directory names are prefix matched, only prune what surely can't match
+        return archive_name_within(
+            self.get_dir_property(dir_path), flatten_arg_values(options)
+        )
+
     def apply_to_argparser(self, parser: ArgumentParser, aliases: list[str] = []):
         parser.add_argument(
             f"--{self.options_arg_name}",
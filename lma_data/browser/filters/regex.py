@@ -1,5 +1,7 @@
-from lma_data.browser.filters.filter import BrowserFilter
-from typing import Any, TypeVar
+from lma_data.browser.filters.filter import BrowserFilter, BoundPredicate
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
+from typing import Any, Optional, TypeVar
+import numpy as np
 import re
 
 T = TypeVar("T")
@@ -12,3 +14,17 @@ class PathRegexFilter(BrowserFilter[T]):
 
     def _predicate(self, path: str, file: T, args: dict[str, Any]):
         return self.pattern.match(path) is not None
+
+    def bind(self, args: dict[str, Any]) -> Optional[BoundPredicate]:
+        match = self.pattern.match
+        return lambda path, file, stat: match(path) is not None
+
+    def bind_chunk(self, args: dict[str, Any]) -> Optional[BoundChunkPredicate]:
+        match = self.pattern.match
+
+        def chunk_predicate(chunk: FileChunk[T]) -> np.ndarray:
+            # Matches are run by map in C, without a Python call per path
+            matches = np.array(list(map(match, chunk.paths)), dtype=object)
+            return matches != None
+
+        return chunk_predicate
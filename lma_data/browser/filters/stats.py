@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import Optional
+from lma_data.browser.filters.filter import BoundPredicate
+from lma_data.browser.chunk import FileChunk, BoundChunkPredicate
+import numpy as np
+import os, time
+
+
+@dataclass
+class FilterStats:
+    """
+    Counters for a filter of a browser. bind_seconds is the time spent binding
+    the filter (ex: loading a cache), seconds the time spent testing files.
+    """
+
+    name: str
+    calls: int = 0
+    rejections: int = 0
+    seconds: float = 0.0
+    bind_seconds: float = 0.0
+
+    @property
+    def rank(self) -> float:
+        """
+        The filter's cost per rejected file. Running filters by increasing rank
+        minimizes the expected cost of the chain, so cheap selective filters go
+        first. Filters which haven't been called yet rank first, to measure them.
+        """
+        if self.calls == 0:
+            return 0.0
+
+        cost = self.seconds / self.calls
+        rejection_rate = self.rejections / self.calls
+        return cost / max(rejection_rate, 1e-6)
+
+
+def instrument_predicate(
+    predicate: BoundPredicate, stats: FilterStats
+) -> BoundPredicate:
+    """
+    Wraps a bound predicate to count its calls, rejections and time in stats.
+    """
+    perf_counter = time.perf_counter
+
+    def instrumented(path: str, file, stat: Optional[os.stat_result]) -> bool:
+        start = perf_counter()
+        passed = predicate(path, file, stat)
+        stats.seconds += perf_counter() - start
+        stats.calls += 1
+        if not passed:
+            stats.rejections += 1
+
+        return passed
+
+    return instrumented
+
+
+def instrument_chunk_predicate(
+    predicate: BoundChunkPredicate, stats: FilterStats
+) -> BoundChunkPredicate:
+    """
+    Wraps a bound chunk predicate, counting each file of the chunks as a call.
+    """
+    perf_counter = time.perf_counter
+
+    def instrumented(chunk: FileChunk) -> np.ndarray:
+        start = perf_counter()
+        passed = predicate(chunk)
+        stats.seconds += perf_counter() - start
+        stats.calls += len(chunk)
+        stats.rejections += len(chunk) - int(np.count_nonzero(passed))
+
+        return passed
+
+    return instrumented
+
+
+def compile_adaptive(
+    entries: list[tuple[FilterStats, BoundPredicate]], reorder_interval: int = 1024
+) -> BoundPredicate:
+    """
+    Chains instrumented predicates, reordering them by rank every
+    reorder_interval files as their costs and selectivities are observed.
+    """
+    order = list(entries)
+    tested = 0
+
+    def chain(path: str, file, stat: Optional[os.stat_result]) -> bool:
+        nonlocal order, tested
+        tested += 1
+        if tested % reorder_interval == 0:
+            order = sorted(order, key=lambda entry: entry[0].rank)
+
+        for _, predicate in order:
+            if not predicate(path, file, stat):
+                return False
+
+        return True
+
+    return chain
@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, Optional, Union
+import fnmatch, os
+
+
+class ScandirWalker:
+    """
+    Recursively walks a directory tree with os.scandir, listing subdirectories
+    concurrently on a thread pool. Files are yielded as DirEntry objects whose
+    stat has already been fetched by the pool, so it can be reused by filters.
+
+    An include_dir predicate can be given to skip whole subtrees; it is called
+    with each subdirectory's path before the subdirectory is listed.
+
+    In ordered mode, files are yielded depth first with directory entries sorted
+    by name (subdirectories are still listed ahead of time on the pool). In
+    unordered mode, files are yielded as soon as their directory is listed.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, ordered: bool = True, stat=True
+    ):
+        if not max_workers:
+            max_workers = min(32, 4 * (os.cpu_count() or 1))
+
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.stat = stat
+
+    def walk(
+        self,
+        root_dir: str,
+        pattern: Union[str, tuple[str, ...]] = "*",
+        include_dir: Optional[Callable[[str], bool]] = None,
+    ) -> Iterator[os.DirEntry]:
+        """
+        Yields all files matching the name pattern (or any of several patterns)
+        within the root directory. Like glob, hidden files and directories are
+        skipped.
+        """
+        pattern = (pattern,) if isinstance(pattern, str) else pattern
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            if self.ordered:
+                yield from self._walk_ordered(executor, root_dir, pattern, include_dir)
+            else:
+                yield from self._walk_unordered(
+                    executor, root_dir, pattern, include_dir
+                )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _walk_ordered(
+        self,
+        executor: ThreadPoolExecutor,
+        root_dir: str,
+        pattern: tuple[str, ...],
+        include_dir: Optional[Callable[[str], bool]],
+    ) -> Iterator[os.DirEntry]:
+        stack = [executor.submit(self._list_dir, root_dir, pattern, include_dir)]
+        while stack:
+            files, subdirs = stack.pop().result()
+            futures = [
+                executor.submit(self._list_dir, subdir, pattern, include_dir)
+                for subdir in subdirs
+            ]
+            stack.extend(reversed(futures))
+            yield from files
+
+    def _walk_unordered(
+        self,
+        executor: ThreadPoolExecutor,
+        root_dir: str,
+        pattern: tuple[str, ...],
+        include_dir: Optional[Callable[[str], bool]],
+    ) -> Iterator[os.DirEntry]:
+        pending: set[Future] = {
+            executor.submit(self._list_dir, root_dir, pattern, include_dir)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending.add(
+                        executor.submit(self._list_dir, subdir, pattern, include_dir)
+                    )
+
+                yield from files
+
+    def _list_dir(
+        self,
+        dir_path: str,
+        pattern: tuple[str, ...],
+        include_dir: Optional[Callable[[str], bool]],
+    ) -> tuple[list[os.DirEntry], list[str]]:
+        files: list[os.DirEntry] = []
+        subdirs: list[str] = []
+
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+
+                    try:
+                        if entry.is_dir():
+                            if not include_dir or include_dir(entry.path):
+                                subdirs.append(entry.path)
+                        elif any(
+                            fnmatch.fnmatch(entry.name, name_pattern)
+                            for name_pattern in pattern
+                        ):
+                            if self.stat:
+                                # Fetch (and cache) the stat on the pool thread
+                                entry.stat()
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            # Like glob, unreadable directories are silently skipped
+            return files, subdirs
+
+        if self.ordered:
+            files.sort(key=lambda entry: entry.name)
+            subdirs.sort()
+
+        return files, subdirs
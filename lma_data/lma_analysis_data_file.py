@@ -2,6 +2,7 @@ import re, os
 from datetime import datetime
 from typing import Optional, Self
 from dataclasses import dataclass
+from lma_data.browser.bundle import member_file_name
 
 LMA_ANALYSIS_DATA_FILE_RE = re.compile(r".*?\/?([a-zA-Z0-9]+)_(\d+)_(\d+)_(\d+)")
 
@@ -14,7 +15,8 @@ class LMAAnalysisDataFile:
 
     @staticmethod
     def try_parse(path: str) -> Optional["LMAAnalysisDataFile"]:
-        lma_match = LMA_ANALYSIS_DATA_FILE_RE.match(path)
+        # Bundle members are parsed on their member name
+        lma_match = LMA_ANALYSIS_DATA_FILE_RE.match(member_file_name(path))
         if not lma_match:
             return None
 
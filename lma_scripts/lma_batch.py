@@ -1,12 +1,66 @@
-import argparse, subprocess, os, signal, shlex
+import argparse, itertools, subprocess, os, signal, sys, time, resource
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Union
+from operator import attrgetter
 from lma_data.LMA_data_file import LMADataFile
 from lma_data.LMA_browser import LMABrowser
-from lma_data.browser.file_browser import FileBrowser
+from lma_data.LMA_catalog import LMACatalog
+from lma_data.LMA_cli import (
+    parse_date_string,
+    flatten_arg_values,
+    add_catalog_args,
+    add_service_args,
+    add_bundle_args,
+    add_filter_stats_args,
+    add_file_list_args,
+    print_filter_stats,
+    read_file_list,
+)
+from lma_data.LMA_service import query_service
+from lma_data.browser.file_browser import (
+    FileBrowser,
+    DEFAULT_CHUNK_SIZE,
+    UnsortedFilesError,
+)
+from lma_data.LMA_bulk_parse import map_lma_data_paths
+from lma_data.browser.federated import imerge_sorted
+from lma_data.browser.bundle import local_data_paths
 from lma_data.LMA_filters import LMAFilters
 from lma_data.LMA_util import batch
-from lma_data.lma_analysis_data_file import LMAAnalysisDataFile
+from lma_data.LMA_layout import (
+    archive_dir_network,
+    archive_dir_sorted,
+    archive_dir_span,
+)
+from lma_data.LMA_manifest import OutputManifest, batch_manifest_key
+from lma_data.LMA_journal import BatchJournal
+from lma_data.LMA_queue import WorkQueue, QueueSettings
+from lma_data.LMA_prefetch import BatchPrefetcher
+from lma_data.LMA_telemetry import (
+    TelemetryLog,
+    print_telemetry_summary,
+    wait_with_rusage,
+)
+from lma_data.LMA_batch_engine import (
+    ENGINES,
+    AsyncBatchEngine,
+    BatchFeed,
+    BatchRecorder,
+    lma_analysis_command,
+    spawn_error_exit_code,
+)
+from lma_data.LMA_schedule import (
+    SCHEDULES,
+    RuntimeHistory,
+    RuntimeModel,
+    DEFAULT_SPAN_ARGS,
+    batch_analysis_args,
+    coalesce_batches,
+    estimate_batch_costs,
+    lpt_order,
+    predict_makespan,
+)
 from rich.progress import Progress
 from threading import Event, Lock
 
@@ -21,36 +75,129 @@ def process_batch(
     lma_analysis_bin: str,
     lma_analysis_args: str,
     silent_mode: bool,
-):
+    recorder: Optional[BatchRecorder] = None,
+    retries: int = 0,
+    retry_backoff: float = 0.0,
+    span_args: str = DEFAULT_SPAN_ARGS,
+    prefetcher: Optional[BatchPrefetcher] = None,
+    first_attempt: int = 1,
+) -> Optional[int]:
+    """
+    Runs lma_analysis on a batch, returning its exit code (None if it didn't
+    run). Failed attempts are retried up to retries times, waiting
+    retry_backoff seconds and doubling the wait after each attempt (attempts
+    are numbered from first_attempt, ex: for batches requeued before). Batches
+    spanning several windows pass span_args to lma_analysis. With a
+    prefetcher, lma_analysis reads the copies it staged on scratch storage.
+
+    Each attempt, and the batch's result, are recorded by the recorder (in the
+    journal, telemetry log, runtime history and output manifest).
+    """
     if len(batch) == 0:
-        return
+        return None
+
+    input_bytes = recorder.input_bytes(batch) if recorder else 0
+    batch_args = batch_analysis_args(batch, lma_analysis_args, span_args)
+
+    # lma_analysis can't read bundles, so their members are staged for the batch
+    if prefetcher:
+        staging = prefetcher.staged(batch)
+    else:
+        staging = local_data_paths([data_file.path for data_file in batch])
+
+    with staging as data_paths:
+        attempt = 0
+        while True:
+            if recorder:
+                recorder.start(batch)
+
+            start = time.perf_counter()
+            exit_code, rusage = run_lma_analysis(
+                batch[0].datetime,
+                data_paths,
+                out_dir,
+                lma_analysis_bin,
+                batch_args,
+                silent_mode,
+            )
+            seconds = time.perf_counter() - start
+
+            if recorder:
+                recorder.attempt_finished(
+                    batch,
+                    input_bytes,
+                    exit_code,
+                    seconds,
+                    rusage,
+                    first_attempt + attempt,
+                )
+
+            if exit_code in (0, None) or attempt >= retries:
+                break
+
+            # The wait is cut short on shutdown
+            if lma_shutdown_event.wait(retry_backoff * 2**attempt):
+                break
+
+            attempt += 1
+
+    if recorder:
+        recorder.batch_finished(batch, input_bytes, exit_code, seconds)
+
+    return exit_code
 
-    lma_datetime = batch[0].datetime
-    date = lma_datetime.strftime("%Y%m%d")
-    time = lma_datetime.strftime("%H%M%S")
-    data_files = " ".join([data_file.path for data_file in batch])
-    cmd = f"{lma_analysis_bin} -d {date} -t {time} -o {out_dir} {lma_analysis_args} {data_files}"
-    cmd_args = shlex.split(cmd)
+
+def run_lma_analysis(
+    lma_datetime: datetime,
+    data_paths: list[str],
+    out_dir: str,
+    lma_analysis_bin: str,
+    lma_analysis_args: str,
+    silent_mode: bool,
+) -> tuple[Optional[int], Optional[resource.struct_rusage]]:
+    """
+    Runs lma_analysis, returning its exit code and resource usage (None if it
+    didn't run).
+    """
+    cmd_args = lma_analysis_command(
+        lma_datetime, data_paths, out_dir, lma_analysis_bin, lma_analysis_args
+    )
 
     # Attempt to create the process
     with lma_process_lock:
         if lma_shutdown_event.is_set():
-            return
+            return None, None
+
+        # stderr goes to stdout, which is drained below or discarded, so the
+        # process can't block on a full pipe
+        try:
+            lma_analysis_process = subprocess.Popen(
+                cmd_args,
+                stdout=subprocess.DEVNULL if silent_mode else subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+        except OSError as error:
+            # Recorded as a failed attempt, so it's retried like one
+            print(
+                f"[{lma_datetime}] Couldn't run {lma_analysis_bin}: {error}",
+                file=sys.stderr,
+            )
+            return spawn_error_exit_code(error), None
 
-        lma_analysis_process = subprocess.Popen(
-            cmd_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
         lma_processes.append(lma_analysis_process)
 
     if not silent_mode:
         for line in lma_analysis_process.stdout:
             print(f"[{lma_datetime}] {line}", end="")
 
-    lma_analysis_process.wait()
+    exit_code, rusage = wait_with_rusage(lma_analysis_process)
 
     with lma_process_lock:
         lma_processes.remove(lma_analysis_process)
 
+    return exit_code, rusage
+
 
 def setup_signal_catcher():
     def on_exit(signum, frame):
@@ -71,37 +218,242 @@ def setup_signal_catcher():
     signal.signal(signal.SIGTERM, on_exit)
 
 
+def update_progress(
+    lma_progress: Progress,
+    task,
+    done: int,
+    batches: Union[list[list[LMADataFile]], BatchFeed],
+):
+    if isinstance(batches, BatchFeed):
+        # The total is only known once discovery is done
+        total = batches.produced if batches.exhausted else None
+        lma_progress.update(task, completed=done, total=total)
+    else:
+        lma_progress.update(task, completed=(100 * float(done) / len(batches)))
+
+
 def process_batches(
-    batches: list[list[LMADataFile]],
+    batches: Union[list[list[LMADataFile]], BatchFeed],
     out_dir: str,
     lma_analysis_bin: str,
     lma_analysis_args: str,
     silent_mode: bool = False,
     num_workers: Optional[int] = None,
+    journal: Optional[BatchJournal] = None,
+    retries: int = 0,
+    retry_backoff: float = 0.0,
+    engine: str = "threads",
+    log_dir: Optional[str] = None,
+    echo_rate: float = 20.0,
+    span_args: str = DEFAULT_SPAN_ARGS,
+    prefetch: int = 0,
+    scratch_dir: Optional[str] = None,
+    scratch_bytes: Optional[int] = None,
+    decompress: bool = False,
 ):
+    """
+    Runs lma_analysis on the batches with num_workers processes at once, from a
+    thread per process or (with the asyncio engine) a single event loop, which
+    also writes each batch's output to a log file in log_dir. The batches of a
+    feed are run as they are discovered.
+
+    With prefetch, the data files of the next prefetch batches are staged into
+    scratch_dir (up to scratch_bytes) while earlier batches run.
+    """
     if not num_workers:
         num_workers = os.cpu_count()
 
+    prefetcher = None
+    if prefetch > 0 and not isinstance(batches, BatchFeed):
+        prefetcher = BatchPrefetcher(
+            batches, scratch_dir, prefetch, scratch_bytes, decompress
+        )
+        prefetcher.start()
+
+    try:
+        _process_batches(
+            batches,
+            out_dir,
+            lma_analysis_bin,
+            lma_analysis_args,
+            silent_mode,
+            num_workers,
+            journal,
+            retries,
+            retry_backoff,
+            engine,
+            log_dir,
+            echo_rate,
+            span_args,
+            prefetcher,
+        )
+    finally:
+        if prefetcher:
+            prefetcher.close()
+
+    if prefetcher and not silent_mode:
+        print(
+            f"Prefetched {prefetcher.staged_count} batches, "
+            f"{prefetcher.missed_count} started before they were staged"
+        )
+
+
+def _process_batches(
+    batches: Union[list[list[LMADataFile]], BatchFeed],
+    out_dir: str,
+    lma_analysis_bin: str,
+    lma_analysis_args: str,
+    silent_mode: bool,
+    num_workers: int,
+    journal: Optional[BatchJournal],
+    retries: int,
+    retry_backoff: float,
+    engine: str,
+    log_dir: Optional[str],
+    echo_rate: float,
+    span_args: str,
+    prefetcher: Optional[BatchPrefetcher],
+):
+
+    os.makedirs(out_dir, exist_ok=True)
+    telemetry = TelemetryLog(out_dir)
+    recorder = BatchRecorder(
+        out_dir,
+        OutputManifest(out_dir, "lma_batch"),
+        RuntimeHistory(out_dir),
+        journal,
+        telemetry,
+    )
+    start = time.perf_counter()
+
+    if engine == "asyncio":
+        async_engine = AsyncBatchEngine(
+            out_dir,
+            lma_analysis_bin,
+            lma_analysis_args,
+            num_workers,
+            silent_mode,
+            recorder,
+            retries,
+            retry_backoff,
+            log_dir,
+            echo_rate,
+            span_args,
+            prefetcher,
+        )
+        with Progress() as lma_progress:
+            done = 0
+            task = lma_progress.add_task("Processing LMA Data...")
+
+            def on_done(exit_code: Optional[int]):
+                nonlocal done
+                done += 1
+                update_progress(lma_progress, task, done, batches)
+
+            async_engine.run(batches, on_done)
+
+        if async_engine.echo.suppressed:
+            print(
+                f"{async_engine.echo.suppressed} lines weren't echoed, "
+                f"see the batch logs in {async_engine.log_dir}"
+            )
+
+        print_telemetry_summary(telemetry.records, time.perf_counter() - start)
+        return
+
+    run_batch = lambda batch: process_batch(
+        batch,
+        out_dir,
+        lma_analysis_bin,
+        lma_analysis_args,
+        silent_mode,
+        recorder,
+        retries,
+        retry_backoff,
+        span_args,
+        prefetcher,
+    )
+
     with Progress() as lma_progress:
         with ThreadPoolExecutor(max_workers=num_workers) as executor:
             setup_signal_catcher()
 
-            futures = [
-                executor.submit(
-                    lambda batch: process_batch(
-                        batch, out_dir, lma_analysis_bin, lma_analysis_args, silent_mode
-                    ),
-                    batch,
-                )
-                for batch in batches
-            ]
-
-            # Wait for process to complete and update progress bar
             done = 0
             task = lma_progress.add_task("Processing LMA Data...")
-            for _ in as_completed(futures):
-                done += 1
-                lma_progress.update(task, completed=(100 * float(done) / len(futures)))
+            if isinstance(batches, BatchFeed):
+                done_lock = Lock()
+
+                # Each worker takes the next batch from the feed as it frees up
+                def run_feed_batches():
+                    nonlocal done
+                    while (data_batch := batches.get()) is not None:
+                        run_batch(data_batch)
+                        with done_lock:
+                            done += 1
+                            update_progress(lma_progress, task, done, batches)
+
+                futures = [
+                    executor.submit(run_feed_batches) for _ in range(num_workers)
+                ]
+                for future in futures:
+                    future.result()
+            else:
+                futures = [executor.submit(run_batch, batch) for batch in batches]
+
+                # Wait for process to complete and update progress bar
+                for future in as_completed(futures):
+                    # Raises the errors of batches which couldn't be processed
+                    future.result()
+                    done += 1
+                    update_progress(lma_progress, task, done, batches)
+
+    print_telemetry_summary(telemetry.records, time.perf_counter() - start)
+
+
+def schedule_batches(
+    batches: list[list[LMADataFile]],
+    schedule: str,
+    out_dir: str,
+    num_workers: Optional[int] = None,
+    dry_run: bool = False,
+) -> list[list[LMADataFile]]:
+    """
+    Orders batches for dispatch. The "time" schedule keeps them in time order,
+    "lpt" dispatches the costliest first (estimated from their input bytes and
+    the output directory's runtime history). A dry run prints the predicted
+    makespan of both schedules.
+    """
+    if schedule == "time" and not dry_run:
+        return batches
+
+    model = RuntimeModel(RuntimeHistory(out_dir).read())
+    costs = estimate_batch_costs(batches, model)
+    order = lpt_order(costs)
+
+    if dry_run:
+        num_workers = num_workers or os.cpu_count()
+        if model.has_history:
+            format_cost = lambda cost: (
+                str(timedelta(seconds=round(cost))) if cost >= 60 else f"{cost:.1f}s"
+            )
+        else:
+            format_cost = lambda cost: f"{cost / 1e6:.1f}MB"
+
+        print(
+            f"{len(batches)} batches, {format_cost(sum(costs))} total, "
+            f"{num_workers} workers"
+        )
+        for name, schedule_costs in [
+            ("time", costs),
+            ("lpt", [costs[i] for i in order]),
+        ]:
+            makespan = predict_makespan(schedule_costs, num_workers)
+            print(f"{name}: predicted makespan {format_cost(makespan)}")
+
+    if schedule == "lpt":
+        return [batches[i] for i in order]
+
+    return batches
 
 
 def create_parser():
@@ -110,7 +462,11 @@ def create_parser():
         description="Quickly process multiple LMA files using lma_analysis",
     )
 
-    parser.add_argument("data_dir")
+    parser.add_argument(
+        "data_dir",
+        nargs="?",
+        help="The directory to search for data files, left out with --file-list.",
+    )
     parser.add_argument("out_dir")
     parser.add_argument(dest="lma_analysis_args", nargs=argparse.REMAINDER, default="")
 
@@ -124,32 +480,265 @@ def create_parser():
         help="The location of the lma_analysis binary",
         default="lma_analysis",
     )
+    parser.add_argument(
+        "-r",
+        "--root",
+        dest="roots",
+        action="append",
+        default=[],
+        help="An additional, lower priority directory to search for data files (ex: a slower archive mount). Files found in several directories are taken from the first.",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULES,
+        default="time",
+        help="The order batches are dispatched in: time order, or longest (estimated from input bytes and past runtimes) first.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        dest="dry_run",
+        help="Print the predicted makespan of the schedules without running lma_analysis.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        help="The number of times to retry a batch whose lma_analysis fails.",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=30.0,
+        dest="retry_backoff",
+        help="The seconds to wait before retrying a batch, doubled after each attempt.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Rerun the batches of out_dir's journal which didn't succeed (pending, interrupted or failed), without discovering data files.",
+    )
+    parser.add_argument(
+        "--max-batch-minutes",
+        type=int,
+        dest="max_batch_minutes",
+        help="Coalesce consecutive windows with the same stations into lma_analysis runs of up to this many minutes.",
+    )
+    parser.add_argument(
+        "--max-batch-mb",
+        type=float,
+        dest="max_batch_mb",
+        help="Coalesce consecutive windows with the same stations into lma_analysis runs of up to this many MB of input.",
+    )
+    parser.add_argument(
+        "--span-args",
+        dest="span_args",
+        default=DEFAULT_SPAN_ARGS,
+        help="The lma_analysis arguments of coalesced runs, {seconds} being replaced by their duration. Defaults to '%(default)s'.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="threads",
+        help="How lma_analysis processes are run: from a thread each, or from a single asyncio event loop draining their output into per-batch log files.",
+    )
+    parser.add_argument(
+        "--log-dir",
+        dest="log_dir",
+        help="The directory of the per-batch logs of the asyncio engine. Defaults to out_dir/logs.",
+    )
+    parser.add_argument(
+        "--echo-rate",
+        type=float,
+        default=20.0,
+        dest="echo_rate",
+        help="The lines per second of lma_analysis output the asyncio engine echoes to the console (0 for all of them).",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Copy the data files of the next N batches to local scratch storage while earlier batches run, removing them once their batch finishes.",
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        dest="scratch_dir",
+        help="The scratch directory batches are prefetched into (ex: a tmpfs like /dev/shm). Defaults to the system's temporary directory.",
+    )
+    parser.add_argument(
+        "--scratch-mb",
+        type=float,
+        dest="scratch_mb",
+        help="The most MB of prefetched data files kept in the scratch directory at once.",
+    )
+    parser.add_argument(
+        "--decompress",
+        action="store_true",
+        help="Decompress gzipped data files as they are prefetched, so lma_analysis doesn't have to.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Run each batch as soon as discovery completes it, rather than after discovering every data file. Batches are run in time order.",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        dest="max_pending",
+        help="With --stream, the most discovered batches waiting for a worker, discovery pausing while there are. Defaults to twice the number of workers.",
+    )
+    parser.add_argument(
+        "--queue",
+        dest="queue_path",
+        help="Coordinator mode: queue the batches in a work queue database on shared storage instead of running them, for lma_worker processes on any host to run.",
+    )
+    add_catalog_args(parser)
+    add_service_args(parser)
+    add_bundle_args(parser)
+    add_filter_stats_args(parser)
+    add_file_list_args(parser)
     return parser
 
 
 def create_cache_filter():
-    cache_browser = FileBrowser(LMAAnalysisDataFile.try_parse)
-    cache_filter = LMAFilters[LMADataFile].create_cache_filter_from_browser(
-        cache_browser,
-        lambda _, file: file.datetime,
-        lambda _, file: file.datetime,
+    cache_filter = LMAFilters[LMADataFile].create_cache_filter_from_manifest(
+        "lma_batch",
+        lambda _, file: batch_manifest_key(file.datetime),
         lambda args: args["out_dir"],
     )
 
     return cache_filter
 
 
+def find_root_data_files(
+    browser: FileBrowser[LMADataFile],
+    data_dir: str,
+    args: argparse.Namespace,
+    lazy_sort: bool = True,
+) -> Iterator[tuple[LMADataFile, str]]:
+    """
+    Lazily discovers the data files of a root directory in time order, from a
+    running lma_catalogd, the persistent catalog, or else by walking it. Without
+    lazy_sort, the walked files are sorted as a whole, for directories which
+    don't sort like their files.
+    """
+    networks = flatten_arg_values(args.network)
+    stations = flatten_arg_values(args.stations)
+    start_date = parse_date_string(args.start_date)
+    end_date = parse_date_string(args.end_date)
+
+    indexed_files = None
+    # Bundles aren't indexed by lma_catalogd or the catalog
+    use_index = not args.bundles
+    if use_index and args.service_socket:
+        indexed_files = query_service(
+            args.service_socket,
+            data_dir,
+            networks,
+            stations,
+            start_date,
+            end_date,
+            browser.name_pattern,
+        )
+
+    if use_index and indexed_files is None and args.use_catalog:
+        lma_browser = LMABrowser(LMACatalog(args.catalog_path))
+        lma_browser.find(data_dir)
+        indexed_files = lma_browser.query(
+            networks, stations, start_date, end_date, browser.name_pattern
+        )
+        lma_browser.catalog.close()
+
+    if indexed_files is None and not lazy_sort:
+        walked_files = browser.ifind2(data_dir, **vars(args))
+        yield from sorted(walked_files, key=lambda item: item[0].sort_key)
+        return
+
+    if indexed_files is None:
+        yield from browser.ifind_sorted(
+            data_dir, attrgetter("sort_key"), archive_dir_sorted, **vars(args)
+        )
+        return
+
+    # Apply the remaining filters (ex: the cache)
+    yield from browser.ifilter(
+        ((data_file, data_file.path) for data_file in indexed_files), **vars(args)
+    )
+
+
+def find_data_files(
+    browser: FileBrowser[LMADataFile],
+    args: argparse.Namespace,
+    lazy_sort: bool = True,
+) -> Iterator[LMADataFile]:
+    """
+    Lazily discovers the data files across data_dir and the additional roots in
+    time order. A station file present in several roots is taken from the first.
+    """
+    streams = [
+        find_root_data_files(browser, data_dir, args, lazy_sort)
+        for data_dir in [args.data_dir, *args.roots]
+    ]
+    for data_file, _ in imerge_sorted(streams, attrgetter("sort_key")):
+        yield data_file
+
+
+def read_data_files(
+    browser: FileBrowser[LMADataFile], args: argparse.Namespace
+) -> Iterator[LMADataFile]:
+    """
+    Lazily reads the data files of a file list, mapped and filtered like those
+    discovered by walking.
+    """
+    yield from browser.ifind_paths(read_file_list(args.file_list), **vars(args))
+
+
+def stream_batches(data_files: Iterable[LMADataFile]) -> Iterator[list[LMADataFile]]:
+    """
+    Groups time ordered data files into batches, emitting each batch once a
+    file of a later time arrives. Raises a ValueError as soon as the files go
+    back in time, before emitting the batch it would have split.
+    """
+    pending: Optional[tuple[datetime, list[LMADataFile]]] = None
+    for batch_datetime, data_batch in itertools.groupby(
+        data_files, attrgetter("datetime")
+    ):
+        if pending is not None:
+            if batch_datetime < pending[0]:
+                raise ValueError(
+                    f"Data files aren't in time order ({batch_datetime} after "
+                    f"{pending[0]}), so --stream can't batch them. Run without "
+                    f"--stream, or sort the file list (ex: as lma_find prints it)."
+                )
+
+            yield pending[1]
+
+        pending = (batch_datetime, list(data_batch))
+
+    if pending is not None:
+        yield pending[1]
+
+
+def journal_batches(
+    batches: Iterable[list[LMADataFile]], journal: BatchJournal
+) -> Iterator[list[LMADataFile]]:
+    for data_batch in batches:
+        journal.add([data_batch])
+        yield data_batch
+
+
 def main():
     parser = create_parser()
 
     date_filter = LMAFilters[LMADataFile].create_date_filter(
-        lambda _, file: file.datetime
+        lambda _, file: file.datetime, archive_dir_span, "datetime"
     )
     network_filter = LMAFilters[LMADataFile].create_network_filter(
-        lambda _, file: file.network
+        lambda _, file: file.network, archive_dir_network, "network"
     )
     station_filter = LMAFilters[LMADataFile].create_station_filter(
-        lambda _, file: file.station_identifier
+        lambda _, file: file.station_identifier, "station_identifier"
     )
     cache_filter = create_cache_filter()
 
@@ -158,21 +747,161 @@ def main():
     LMAFilters.apply_filters_to_argparser(parser, *filters)
     args = parser.parse_args()
 
-    browser = FileBrowser(LMADataFile.try_parse)
-    LMAFilters.add_filters_to_browser(browser, *filters)
-    data_files = browser.find(args.data_dir, **vars(args))
-
     num_workers = args.num_workers
     silent_mode = args.silent_mode
     out_dir = args.out_dir
     lma_analysis_bin = args.lma_analysis_bin
 
-    batches = batch(data_files, lambda file: file.datetime)
+    if args.file_list is not None:
+        for option, is_set in [
+            ("data_dir", args.data_dir is not None),
+            ("--resume", args.resume),
+            ("--root", args.roots),
+            ("--catalog", args.use_catalog),
+        ]:
+            if is_set:
+                parser.error(f"--file-list can't be used with {option}")
+    elif args.data_dir is None and not args.resume:
+        parser.error("data_dir is required without --file-list")
+
+    if args.stream:
+        # These need every batch up front
+        for option, is_set in [
+            ("--resume", args.resume),
+            ("--schedule lpt", args.schedule != "time"),
+            ("--dry-run", args.dry_run),
+            ("--max-batch-minutes", args.max_batch_minutes),
+            ("--max-batch-mb", args.max_batch_mb),
+            ("--prefetch", args.prefetch),
+            ("--queue", args.queue_path),
+        ]:
+            if is_set:
+                parser.error(f"--stream can't be used with {option}")
+
+    if args.resume:
+        if not os.path.isfile(os.path.join(out_dir, BatchJournal.FILE_NAME)):
+            parser.error(f"There is no journal to resume in {out_dir}")
+
+        journal = BatchJournal(out_dir)
+        batches = journal.unfinished()
+    else:
+        browser = FileBrowser(
+            LMADataFile.try_parse,
+            bundles=args.bundles,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            bulk_mapper=map_lma_data_paths,
+        )
+        LMAFilters.add_filters_to_browser(browser, *filters)
+        if args.filter_stats or args.adaptive_filters:
+            browser.enable_filter_stats(args.adaptive_filters)
+
+        if args.file_list is not None:
+            data_files = read_data_files(browser, args)
+        else:
+            data_files = find_data_files(browser, args)
+
+        if args.stream:
+            os.makedirs(out_dir, exist_ok=True)
+            journal = BatchJournal(out_dir)
+            data_batches = stream_batches(data_files)
+            batches = BatchFeed(
+                journal_batches(data_batches, journal),
+                args.max_pending or 2 * (num_workers or os.cpu_count()),
+                lma_shutdown_event,
+            )
+            batches.start()
+        else:
+            try:
+                data_files = list(data_files)
+            except UnsortedFilesError:
+                # Batches need every file, not time order, so walk again sorting
+                # each root's files as a whole
+                data_files = list(find_data_files(browser, args, lazy_sort=False))
+
+            if args.filter_stats:
+                print_filter_stats(browser.filter_stats())
+
+            batches = batch(data_files, lambda file: file.datetime)
+            journal = None
+
+    if args.max_batch_minutes or args.max_batch_mb:
+        batches = coalesce_batches(
+            batches,
+            args.max_batch_minutes * 60 if args.max_batch_minutes else None,
+            int(args.max_batch_mb * 1e6) if args.max_batch_mb else None,
+        )
+
+    batches = schedule_batches(
+        batches, args.schedule, out_dir, num_workers, args.dry_run
+    )
+    if args.dry_run:
+        return
+
     lma_analysis_args = " ".join(args.lma_analysis_args)
+    if args.queue_path:
+        queue = WorkQueue(args.queue_path)
+        queue.enqueue(
+            batches,
+            QueueSettings(
+                os.path.abspath(out_dir),
+                lma_analysis_bin,
+                lma_analysis_args,
+                args.retries,
+                args.retry_backoff,
+                args.span_args,
+            ),
+        )
+        queue.close()
+        print(
+            f"Queued {len(batches)} batches, run them with: "
+            f"lma_worker {args.queue_path}"
+        )
+        return
+
+    if journal is None:
+        os.makedirs(out_dir, exist_ok=True)
+        journal = BatchJournal(out_dir)
+        journal.add(batches)
+
     process_batches(
-        batches, out_dir, lma_analysis_bin, lma_analysis_args, silent_mode, num_workers
+        batches,
+        out_dir,
+        lma_analysis_bin,
+        lma_analysis_args,
+        silent_mode,
+        num_workers,
+        journal,
+        args.retries,
+        args.retry_backoff,
+        args.engine,
+        args.log_dir,
+        args.echo_rate,
+        args.span_args,
+        args.prefetch,
+        args.scratch_dir,
+        int(args.scratch_mb * 1e6) if args.scratch_mb else None,
+        args.decompress,
     )
 
+    if isinstance(batches, BatchFeed):
+        if isinstance(batches.error, ValueError):
+            journal.close()
+            parser.exit(1, f"lma_batch: error: {batches.error}\n")
+        elif batches.error:
+            raise batches.error
+
+        if args.filter_stats:
+            print_filter_stats(browser.filter_stats())
+
+    counts = journal.counts()
+    journal.close()
+    unfinished = counts["pending"] + counts["running"] + counts["failed"]
+    if unfinished:
+        print(
+            f"{counts['failed']} batches failed and {unfinished - counts['failed']} "
+            f"didn't run (or wrote no output), rerun them with --resume"
+        )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,65 @@
+import argparse, signal
+from threading import Thread
+from lma_data.LMA_service import LMACatalogService
+from lma_data.LMA_util import get_lma_data_dir, get_lma_catalog_socket
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog="lma_catalogd",
+        description="Keep an index of LMA data files up to date and serve it to lma_find/lma_batch",
+    )
+
+    parser.add_argument(
+        "data_dir",
+        nargs="?",
+        default=get_lma_data_dir(),
+        help="The directory to watch for LMA data files. Defaults to $LMA_DATA_DIR.",
+    )
+    parser.add_argument(
+        "--socket",
+        dest="socket_path",
+        default=get_lma_catalog_socket(),
+        help="The Unix socket to serve queries on. Defaults to $LMA_CATALOG_SOCKET.",
+    )
+    parser.add_argument(
+        "--poll",
+        dest="poll",
+        action="store_true",
+        help="Poll directory modification times instead of using inotify.",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        dest="poll_interval",
+        type=float,
+        default=30.0,
+        help="Seconds between polls when not using inotify.",
+    )
+
+    return parser
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+
+    service = LMACatalogService(
+        args.data_dir,
+        args.socket_path,
+        use_inotify=not args.poll,
+        poll_interval=args.poll_interval,
+    )
+
+    def on_exit(signum, frame):
+        # shutdown() waits for serve_forever to return, so it can't run on this thread
+        Thread(target=service.shutdown).start()
+
+    signal.signal(signal.SIGINT, on_exit)
+    signal.signal(signal.SIGTERM, on_exit)
+
+    print(f"Serving {args.data_dir} on {args.socket_path}")
+    service.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
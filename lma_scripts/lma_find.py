@@ -1,13 +1,61 @@
-import argparse
-from datetime import datetime
+import argparse, csv, json, os, sys
+from datetime import datetime, timedelta
 from lma_data.LMA_browser import LMABrowser
 from lma_data.LMA_data_file import LMADataFile
-from lma_data.LMA_cli import parse_date_string, flatten_arg_values
-from typing import Optional
+from lma_data.LMA_catalog import LMACatalog
+from lma_data.LMA_cli import (
+    parse_date_string,
+    flatten_arg_values,
+    add_catalog_args,
+    add_service_args,
+    add_bundle_args,
+    add_filter_stats_args,
+    print_filter_stats,
+)
+from lma_data.LMA_service import query_service
+from lma_data.LMA_layout import (
+    archive_dir_network,
+    archive_dir_sorted,
+    archive_dir_span,
+)
+from lma_data.LMA_filters import LMAFilters
+from lma_data.browser.file_browser import (
+    FileBrowser,
+    DEFAULT_CHUNK_SIZE,
+    UnsortedFilesError,
+)
+from lma_data.LMA_bulk_parse import map_lma_data_paths
+from lma_data.browser.federated import imerge_sorted
+from lma_data.browser.bundle import stat_data_path
+from lma_data.LMA_coverage import StationCoverage
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, Optional, TextIO
 from rich.table import Table
 from rich.console import Console
 
 
+DATA_FILE_FIELDS = ["path", "datetime", "network", "station_identifier", "station_name"]
+AGGREGATE_FIELDS = ["group", "key", "files", "bytes"]
+COVERAGE_FIELDS = [
+    "type",
+    "network",
+    "station_identifier",
+    "start",
+    "end",
+    "uptime",
+    "gaps",
+    "stations_seen",
+    "stations_expected",
+    "completeness",
+    "complete_slots",
+]
+AGGREGATE_KEYS: dict[str, Callable[[LMADataFile], str]] = {
+    "network": lambda data_file: data_file.network,
+    "station": lambda data_file: f"{data_file.network}/{data_file.station_identifier}",
+    "day": lambda data_file: data_file.datetime.date().isoformat(),
+}
+
+
 def create_parser():
     parser = argparse.ArgumentParser(
         prog="lma_find", description="Helps locate LMA data files."
@@ -16,6 +64,14 @@ def create_parser():
     parser.add_argument(
         "data_dir", help="The directory to search for LMA data files within."
     )
+    parser.add_argument(
+        "-r",
+        "--root",
+        dest="roots",
+        action="append",
+        default=[],
+        help="An additional, lower priority directory to search (ex: a slower archive mount). Files found in several directories are taken from the first.",
+    )
     parser.add_argument(
         "-sd",
         "--start-date",
@@ -59,30 +115,175 @@ def create_parser():
         help="Display discovered data files in a pretty/human-readable format.",
         default=False,
     )
+    parser.add_argument(
+        "-f",
+        "--format",
+        dest="output_format",
+        choices=["paths", "ndjson", "csv"],
+        default="paths",
+        help="The format data files (or counts) are streamed in as they are found. Ignored with --pretty.",
+    )
+    parser.add_argument(
+        "--count",
+        dest="count",
+        action="store_true",
+        default=False,
+        help="Only output the number of data files found and their total size.",
+    )
+    parser.add_argument(
+        "--count-by",
+        dest="count_by",
+        action="append",
+        choices=list(AGGREGATE_KEYS.keys()),
+        help="Only output the number of data files and their total size per network, station or day. Can be specified multiple times.",
+    )
+    parser.add_argument(
+        "--coverage",
+        dest="coverage",
+        action="store_true",
+        default=False,
+        help="Report each station's uptime and data gaps, and each network's completeness, over fixed time slots.",
+    )
+    parser.add_argument(
+        "--slot-minutes",
+        dest="slot_minutes",
+        type=int,
+        default=10,
+        help="The duration of the coverage time slots, in minutes. Defaults to the 10 minutes spanned by a data file.",
+    )
+    parser.add_argument(
+        "--min-gap",
+        dest="min_gap",
+        type=int,
+        default=1,
+        help="The minimum number of consecutive missing slots reported as a gap.",
+    )
+    add_catalog_args(parser)
+    add_service_args(parser)
+    add_bundle_args(parser)
+    add_filter_stats_args(parser)
 
     return parser
 
 
-def find_files(
+def create_browser(bundles: bool = False) -> FileBrowser[LMADataFile]:
+    browser = FileBrowser(
+        LMADataFile.try_parse,
+        "**/*.dat",
+        bundles=bundles,
+        member_pattern=LMABrowser.BUNDLE_MEMBER_PATTERN,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        bulk_mapper=map_lma_data_paths,
+    )
+    LMAFilters.add_filters_to_browser(
+        browser,
+        LMAFilters[LMADataFile].create_date_filter(
+            lambda _, file: file.datetime, archive_dir_span, "datetime"
+        ),
+        LMAFilters[LMADataFile].create_network_filter(
+            lambda _, file: file.network, archive_dir_network, "network"
+        ),
+        LMAFilters[LMADataFile].create_station_filter(
+            lambda _, file: file.station_identifier, "station_identifier"
+        ),
+    )
+
+    return browser
+
+
+def find_root_files(
     data_dir: str,
     networks: Optional[list[str]],
     stations: Optional[list[str]],
     start_date: Optional[datetime],
     end_date: Optional[datetime],
-) -> list[LMADataFile]:
-    browser = LMABrowser()
-    browser.find(data_dir)
-    data_files = browser.query(
-        network_ids=networks,
-        station_ids=stations,
-        start_date=start_date,
-        end_date=end_date,
+    catalog_path: Optional[str] = None,
+    service_socket: Optional[str] = None,
+    bundles: bool = False,
+    browser: Optional[FileBrowser[LMADataFile]] = None,
+) -> Iterator[tuple[LMADataFile, str]]:
+    """
+    Lazily finds the data files within a root directory in time order. Bundles
+    aren't indexed by lma_catalogd or the catalog, so browsing them always walks
+    the root.
+    """
+    data_files = None
+    browser = browser if browser else create_browser(bundles)
+    if bundles:
+        service_socket = None
+        catalog_path = None
+
+    if service_socket:
+        data_files = query_service(
+            service_socket,
+            data_dir,
+            networks,
+            stations,
+            start_date,
+            end_date,
+            browser.name_pattern,
+        )
+
+    if data_files is None and catalog_path:
+        catalog = LMACatalog(catalog_path)
+        lma_browser = LMABrowser(catalog)
+        lma_browser.find(data_dir)
+        data_files = lma_browser.query(
+            networks, stations, start_date, end_date, browser.name_pattern
+        )
+        catalog.close()
+
+    if data_files is not None:
+        yield from ((data_file, data_file.path) for data_file in data_files)
+        return
+
+    # Walk the root, skipping subtrees outside of the searched networks and dates
+    filter_args = {
+        "start_date": start_date.isoformat(timespec="seconds") if start_date else None,
+        "end_date": end_date.isoformat(timespec="seconds") if end_date else None,
+        "network": networks,
+        "stations": stations,
+    }
+    yield from browser.ifind_sorted(
+        data_dir, attrgetter("sort_key"), archive_dir_sorted, **filter_args
     )
 
-    return data_files
+
+def find_files(
+    data_dirs: list[str],
+    networks: Optional[list[str]],
+    stations: Optional[list[str]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    catalog_path: Optional[str] = None,
+    service_socket: Optional[str] = None,
+    bundles: bool = False,
+    browser: Optional[FileBrowser[LMADataFile]] = None,
+) -> Iterator[LMADataFile]:
+    """
+    Lazily finds the data files across the root directories in time order. Roots
+    are listed by priority, a station file present in several roots is taken from
+    the first one.
+    """
+    streams = [
+        find_root_files(
+            data_dir,
+            networks,
+            stations,
+            start_date,
+            end_date,
+            catalog_path,
+            service_socket,
+            bundles,
+            browser,
+        )
+        for data_dir in data_dirs
+    ]
+    for data_file, _ in imerge_sorted(streams, attrgetter("sort_key")):
+        yield data_file
 
 
-def print_table(data_files: list[LMADataFile], group_files: bool):
+def print_table(data_files: Iterable[LMADataFile], group_files: bool):
     console = Console()
     table = Table(show_header=True, header_style="bold yellow")
     table.add_column("Date")
@@ -111,7 +312,7 @@ def print_table(data_files: list[LMADataFile], group_files: bool):
     console.print(table)
 
 
-def print_paths(data_files: list[LMADataFile], group_files: bool):
+def print_paths(data_files: Iterable[LMADataFile], group_files: bool):
     last_date_time = None
     path_group = []
 
@@ -136,9 +337,209 @@ def print_paths(data_files: list[LMADataFile], group_files: bool):
         print_path_group()
 
 
-def print_results(data_files: list[LMADataFile], group_files: bool, pretty: bool):
+def data_file_record(data_file: LMADataFile) -> dict[str, str]:
+    return {
+        "path": data_file.path,
+        "datetime": data_file.datetime.isoformat(),
+        "network": data_file.network,
+        "station_identifier": data_file.station_identifier,
+        "station_name": data_file.station_name,
+    }
+
+
+def write_ndjson(records: Iterable[dict], out: TextIO = sys.stdout):
+    for record in records:
+        out.write(json.dumps(record))
+        out.write("\n")
+
+
+def write_csv(records: Iterable[dict], fields: list[str], out: TextIO = sys.stdout):
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(records)
+
+
+def aggregate_files(
+    data_files: Iterable[LMADataFile], group_by: list[str]
+) -> tuple[list[int], dict[str, dict[str, list[int]]]]:
+    """
+    Counts data files and totals their sizes in a single pass, overall and per
+    group (network, station or day). Individual data files aren't kept.
+    Returns the [files, bytes] totals and the [files, bytes] of each group key.
+    """
+    totals = [0, 0]
+    groups: dict[str, dict[str, list[int]]] = {group: {} for group in group_by}
+    get_keys = [(groups[group], AGGREGATE_KEYS[group]) for group in group_by]
+
+    for data_file in data_files:
+        try:
+            size = stat_data_path(data_file.path).st_size
+        except OSError:
+            size = 0
+
+        totals[0] += 1
+        totals[1] += size
+        for group_totals, get_key in get_keys:
+            key = get_key(data_file)
+            key_totals = group_totals.get(key)
+            if key_totals is None:
+                key_totals = group_totals[key] = [0, 0]
+
+            key_totals[0] += 1
+            key_totals[1] += size
+
+    return totals, groups
+
+
+def print_aggregates(
+    data_files: Iterable[LMADataFile],
+    group_by: list[str],
+    output_format: str,
+    pretty: bool,
+):
+    totals, groups = aggregate_files(data_files, group_by)
+    records = [{"group": "total", "key": "", "files": totals[0], "bytes": totals[1]}]
+    for group, group_totals in groups.items():
+        records.extend(
+            {"group": group, "key": key, "files": files, "bytes": size}
+            for key, (files, size) in sorted(group_totals.items())
+        )
+
+    if pretty:
+        console = Console()
+        table = Table(show_header=True, header_style="bold yellow")
+        for field in AGGREGATE_FIELDS:
+            table.add_column(field.capitalize())
+        for record in records:
+            table.add_row(*[str(record[field]) for field in AGGREGATE_FIELDS])
+        console.print(table)
+    elif output_format == "ndjson":
+        write_ndjson(records)
+    elif output_format == "csv":
+        write_csv(records, AGGREGATE_FIELDS)
+    else:
+        for record in records:
+            print("\t".join(str(record[field]) for field in AGGREGATE_FIELDS))
+
+
+def coverage_records(coverage: StationCoverage, min_gap: int) -> list[dict]:
+    gaps = coverage.gaps(min_gap)
+    gap_counts: dict[tuple[str, str], int] = {}
+    for gap in gaps:
+        station = (gap.network, gap.station_identifier)
+        gap_counts[station] = gap_counts.get(station, 0) + 1
+
+    end = coverage.slot_time(coverage.slot_count).isoformat()
+    records = [
+        {
+            "type": "station",
+            "network": network,
+            "station_identifier": station_identifier,
+            "start": coverage.start.isoformat(),
+            "end": end,
+            "uptime": round(float(uptime), 4),
+            "gaps": gap_counts.get((network, station_identifier), 0),
+        }
+        for (network, station_identifier), uptime in zip(
+            coverage.stations, coverage.uptime()
+        )
+    ]
+    records.extend(
+        {
+            "type": "network",
+            "network": network.network,
+            "start": coverage.start.isoformat(),
+            "end": end,
+            "stations_seen": network.stations_seen,
+            "stations_expected": network.stations_expected,
+            "completeness": round(network.completeness, 4),
+            "complete_slots": round(network.complete_slots, 4),
+        }
+        for network in coverage.network_completeness()
+    )
+    records.extend(
+        {
+            "type": "gap",
+            "network": gap.network,
+            "station_identifier": gap.station_identifier,
+            "start": gap.start.isoformat(),
+            "end": gap.end.isoformat(),
+        }
+        for gap in gaps
+    )
+
+    return records
+
+
+def print_coverage(
+    coverage: StationCoverage, min_gap: int, output_format: str, pretty: bool
+):
+    records = coverage_records(coverage, min_gap)
+    if output_format == "ndjson" and not pretty:
+        write_ndjson(records)
+        return
+
+    if output_format == "csv" and not pretty:
+        write_csv(records, COVERAGE_FIELDS)
+        return
+
+    console = Console()
+    station_table = Table(show_header=True, header_style="bold yellow")
+    for column in ["Network", "Station Identifier", "Uptime", "Gaps"]:
+        station_table.add_column(column)
+
+    network_table = Table(show_header=True, header_style="bold yellow")
+    for column in ["Network", "Stations", "Completeness", "Complete Slots"]:
+        network_table.add_column(column)
+
+    gap_table = Table(show_header=True, header_style="bold yellow")
+    for column in ["Network", "Station Identifier", "Start", "End"]:
+        gap_table.add_column(column)
+
+    for record in records:
+        if record["type"] == "station":
+            station_table.add_row(
+                record["network"],
+                record["station_identifier"],
+                f"{100 * record['uptime']:.1f}%",
+                str(record["gaps"]),
+            )
+        elif record["type"] == "network":
+            network_table.add_row(
+                record["network"],
+                f"{record['stations_seen']}/{record['stations_expected']}",
+                f"{100 * record['completeness']:.1f}%",
+                f"{100 * record['complete_slots']:.1f}%",
+            )
+        else:
+            gap_table.add_row(
+                record["network"],
+                record["station_identifier"],
+                record["start"],
+                record["end"],
+            )
+
+    console.print(station_table)
+    console.print(network_table)
+    console.print(gap_table)
+
+
+def print_results(
+    data_files: Iterable[LMADataFile],
+    group_files: bool,
+    pretty: bool,
+    output_format: str = "paths",
+):
+    """
+    Prints data files as they are found. Apart from the pretty table, nothing
+    is kept in memory.
+    """
     if pretty:
         print_table(data_files, group_files)
+    elif output_format == "ndjson":
+        write_ndjson(map(data_file_record, data_files))
+    elif output_format == "csv":
+        write_csv(map(data_file_record, data_files), DATA_FILE_FIELDS)
     else:
         print_paths(data_files, group_files)
 
@@ -163,14 +564,43 @@ def main():
 
     group_files = args.group_files
 
+    browser = create_browser(args.bundles)
+    if args.filter_stats or args.adaptive_filters:
+        browser.enable_filter_stats(args.adaptive_filters)
+
     data_files = find_files(
-        data_dir,
+        [data_dir, *args.roots],
         networks=networks,
         stations=stations,
         start_date=start_date,
         end_date=end_date,
+        catalog_path=args.catalog_path if args.use_catalog else None,
+        service_socket=args.service_socket,
+        bundles=args.bundles,
+        browser=browser,
     )
-    print_results(data_files, group_files, pretty)
+    try:
+        if args.coverage:
+            coverage = StationCoverage.from_data_files(
+                data_files, timedelta(minutes=args.slot_minutes), start_date, end_date
+            )
+            print_coverage(coverage, args.min_gap, args.output_format, pretty)
+        elif args.count or args.count_by:
+            print_aggregates(
+                data_files, args.count_by or [], args.output_format, pretty
+            )
+        else:
+            print_results(data_files, group_files, pretty, args.output_format)
+    except BrokenPipeError:
+        # The output was piped to a command which stopped reading (ex: head)
+        sys.stdout = open(os.devnull, "w")
+        sys.exit(1)
+    except UnsortedFilesError as error:
+        # Only raised when an archive's data directory holds unsorted subtrees
+        parser.exit(1, f"lma_find: error: {error}\n")
+
+    if args.filter_stats:
+        print_filter_stats(browser.filter_stats())
 
 
 if __name__ == "__main__":
@@ -18,12 +18,21 @@ import subprocess
 from lmatools.io.LMA import LMADataset
 from lmatools.flashsort.gen_autorun import logger_setup, sort_files
 from lmatools.flashsort.gen_sklearn import DBSCANFlashSorter
-from lma_data.browser.file_browser import FileBrowser
+from lma_data.browser.file_browser import FileBrowser, DEFAULT_CHUNK_SIZE
+from lma_data.LMA_bulk_parse import map_lma_analysis_paths
 from lma_data.LMA_filters import LMAFilters
 from lma_data.lma_analysis_data_file import LMAAnalysisDataFile
-from lma_data.lmatools_file import LMAToolsFile
-from lma_data.browser.filters.non_empty import NonEmptyFileFilter
+from lma_data.LMA_manifest import OutputManifest, manifest_key
+from lma_data.LMA_probe import ProbeCache
 from lma_data.LMA_util import batch
+from lma_data.LMA_cli import (
+    add_bundle_args,
+    add_filter_stats_args,
+    add_file_list_args,
+    print_filter_stats,
+    read_file_list,
+)
+from lma_data.browser.bundle import local_data_paths, member_file_name
 
 from lmatools.grid.make_grids import (
     grid_h5flashfiles,
@@ -90,20 +99,23 @@ def sort_flashes(files, outdir, params):
             print(f"Processing {a_file}...")
             try:
                 # ---------- create filename with .flash extention ----------
-                file_base_name = os.path.split(a_file)[-1].replace(".gz", "")
+                file_base_name = os.path.split(member_file_name(a_file))[-1]
+                file_base_name = file_base_name.replace(".gz", "")
                 outfile = os.path.join(output_path, file_base_name + ".flash")
 
                 # ===========================================================
                 # *********** Create LMADataset and Cluster Data ************
                 # lmadata = LMADataset(a_file,file_mask_length=params['mask_length']) (mask length param doesn't exist anymore)
-                lmadata = LMADataset(a_file)
-                clusterer(lmadata)
+                # Bundle members are staged one at a time, lmatools needs a path
+                with local_data_paths([a_file]) as (local_file,):
+                    lmadata = LMADataset(local_file)
+                    clusterer(lmadata)
 
-                # ----------- create filename with .h5 extention ------------
-                outfile_with_extension = outfile + ".h5"
-                h5_outfiles.append(outfile_with_extension)
+                    # ----------- create filename with .h5 extention ------------
+                    outfile_with_extension = outfile + ".h5"
+                    h5_outfiles.append(outfile_with_extension)
 
-                lmadata.write_h5_output(outfile_with_extension, a_file)
+                    lmadata.write_h5_output(outfile_with_extension, local_file)
             except:
                 logger.error(
                     "Did not successfully sort %s \n Error was: %s"
@@ -202,18 +214,19 @@ def create_parser():
         prog="lma_flash",
         description="Grid LMA data files and process them",
     )
-    parser.add_argument("data_dir")
+    parser.add_argument("data_dir", nargs="?")
     parser.add_argument("out_dir")
+    add_bundle_args(parser)
+    add_filter_stats_args(parser)
+    add_file_list_args(parser)
 
     return parser
 
 
 def create_cache_filter():
-    browser = FileBrowser(LMAToolsFile.try_parse)
-    cache_filter = LMAFilters[LMAAnalysisDataFile].create_cache_filter_from_browser(
-        browser,
-        lambda _, file: file.datetime,
-        lambda _, file: file.datetime,
+    cache_filter = LMAFilters[LMAAnalysisDataFile].create_cache_filter_from_manifest(
+        "lma_flash",
+        lambda _, file: manifest_key(file.network, file.datetime),
         lambda args: args["out_dir"],
     )
 
@@ -223,16 +236,22 @@ def create_cache_filter():
 def main():
     parser = create_parser()
     date_filter = LMAFilters[LMAAnalysisDataFile].create_date_filter(
-        lambda _, file: file.datetime
+        lambda _, file: file.datetime, column="datetime"
     )
     network_filter = LMAFilters[LMAAnalysisDataFile].create_network_filter(
-        lambda _, file: file.network
+        lambda _, file: file.network, column="network"
     )
-    non_empty_filter = NonEmptyFileFilter()
     cache_filter = create_cache_filter()
-    filters = [date_filter, network_filter, non_empty_filter, cache_filter]
+    # Probing files reads them, so only those passing the other filters are
+    probe_cache = ProbeCache()
+    valid_data_filter = LMAFilters[LMAAnalysisDataFile].create_valid_data_filter(
+        probe_cache
+    )
+    filters = [date_filter, network_filter, cache_filter, valid_data_filter]
     LMAFilters.apply_filters_to_argparser(parser, *filters)
     args = parser.parse_args()
+    if (args.data_dir is None) == (args.file_list is None):
+        parser.error("Either data_dir or --file-list is required")
 
     data_dir: str = args.data_dir
     out_dir: str = args.out_dir
@@ -240,10 +259,27 @@ def main():
     # Ensure data out directory exists
     pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
 
-    browser = FileBrowser(LMAAnalysisDataFile.try_parse, "**/*.gz")
+    browser = FileBrowser(
+        LMAAnalysisDataFile.try_parse,
+        "**/*.gz",
+        bundles=args.bundles,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        bulk_mapper=map_lma_analysis_paths,
+    )
     LMAFilters.add_filters_to_browser(browser, *filters)
-    files = browser.find(data_dir, **vars(args))
+    if args.filter_stats or args.adaptive_filters:
+        browser.enable_filter_stats(args.adaptive_filters)
+
+    if args.file_list is not None:
+        files = list(browser.ifind_paths(read_file_list(args.file_list), **vars(args)))
+    else:
+        files = browser.find(data_dir, **vars(args))
+    probe_cache.close()
+    if args.filter_stats:
+        print_filter_stats(browser.filter_stats())
+
     network_batches = batch(files, lambda f: f.network)
+    manifest = OutputManifest(out_dir, "lma_flash")
 
     for network_batch in network_batches:
         network = network_batch[0].network
@@ -286,6 +322,7 @@ def main():
             center_ID=str(network),
             base_date=datetime(2012, 1, 1),
         )
+        manifest.append((f.network, f.datetime, "") for f in network_batch)
 
 
 if __name__ == "__main__":
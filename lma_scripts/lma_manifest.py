@@ -0,0 +1,36 @@
+import argparse
+from lma_data.LMA_manifest import OutputManifest, MANIFEST_STAGES
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog="lma_manifest",
+        description="Rebuild the output manifest of a stage from the outputs present in its output directory",
+    )
+
+    parser.add_argument(
+        "stage",
+        choices=list(MANIFEST_STAGES.keys()),
+        help="The stage which wrote the outputs.",
+    )
+    parser.add_argument("out_dir", help="The output directory of the stage.")
+
+    return parser
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+
+    manifest = OutputManifest(args.out_dir, args.stage)
+    manifest_keys = manifest.keys()
+    num_outputs = manifest.rebuild()
+    rebuilt_keys = manifest.keys()
+
+    print(f"Rebuilt {manifest.path} with {num_outputs} outputs")
+    print(f"{len(rebuilt_keys - manifest_keys)} missing from the previous manifest")
+    print(f"{len(manifest_keys - rebuilt_keys)} no longer present")
+
+
+if __name__ == "__main__":
+    main()
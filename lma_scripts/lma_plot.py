@@ -23,10 +23,19 @@ from cartopy.mpl.geoaxes import GeoAxes
 
 from lma_data.LMA_info import info
 from lma_data.LMA_util import get_lma_shapes_dir, get_lma_out_dir
-from lma_data.browser.file_browser import FileBrowser
+from lma_data.browser.file_browser import FileBrowser, DEFAULT_CHUNK_SIZE
+from lma_data.LMA_bulk_parse import map_lmatools_paths
 from lma_data.lmatools_file import LMAToolsFile
 from lma_data.LMA_filters import LMAFilters
-from lma_data.LMA_cli import vprint, set_verbose
+from lma_data.LMA_manifest import OutputManifest, manifest_key
+from lma_data.LMA_cli import (
+    vprint,
+    set_verbose,
+    add_filter_stats_args,
+    add_file_list_args,
+    print_filter_stats,
+    read_file_list,
+)
 
 GeoAxes._pcolormesh_patched = Axes.pcolormesh
 
@@ -703,19 +712,19 @@ def create_parser():
         description="Create plots of LMA data",
     )
 
-    parser.add_argument("data_dir")
+    parser.add_argument("data_dir", nargs="?")
     parser.add_argument("out_dir")
     parser.add_argument("--verbose", action="store_true")
+    add_filter_stats_args(parser)
+    add_file_list_args(parser)
 
     return parser
 
 
 def create_cache_filter():
-    cache_browser = FileBrowser(LMAToolsFile.try_parse)
-    cache_filter = LMAFilters[LMAToolsFile].create_cache_filter_from_browser(
-        cache_browser,
-        lambda _, file: file.datetime,
-        lambda _, file: file.datetime,
+    cache_filter = LMAFilters[LMAToolsFile].create_cache_filter_from_manifest(
+        "lma_plot",
+        lambda _, file: manifest_key(file.prefix, file.datetime),
         lambda args: args["out_dir"],
     )
 
@@ -725,10 +734,10 @@ def create_cache_filter():
 def main():
     parser = create_parser()
     date_filter = LMAFilters[LMAToolsFile].create_date_filter(
-        lambda _, file: file.datetime
+        lambda _, file: file.datetime, column="datetime"
     )
     network_filter = LMAFilters[LMAToolsFile].create_network_filter(
-        lambda _, file: file.prefix
+        lambda _, file: file.prefix, column="prefix"
     )
     cache_filter = create_cache_filter()
 
@@ -737,6 +746,9 @@ def main():
 
     # ---------- Assign Date Variables from User Input ----------
     args = parser.parse_args()
+    if (args.data_dir is None) == (args.file_list is None):
+        parser.error("Either data_dir or --file-list is required")
+
     data_dir = args.data_dir
     outpath = args.out_dir
     verbose = args.verbose
@@ -748,14 +760,29 @@ def main():
     params = {"lon_index": (0, 800), "lat_index": (0, 800), "alt_index": (0, 20)}  # km
 
     # ------------- Get List of 3D Gridded Files ----------------
-    browser = FileBrowser(LMAToolsFile.try_parse, glob_pathname="**/*source_3d.nc")
+    browser = FileBrowser(
+        LMAToolsFile.try_parse,
+        glob_pathname="**/*source_3d.nc",
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        bulk_mapper=map_lmatools_paths,
+    )
     LMAFilters.add_filters_to_browser(browser, *filters)
+    if args.filter_stats or args.adaptive_filters:
+        browser.enable_filter_stats(args.adaptive_filters)
 
     # -----------------------------------------------------------
     # -------------- Generate and Save the Plots ----------------
     vprint("Cycle through 3D gridded files.....")
 
-    filepaths = browser.find(data_dir, **vars(args))
+    if args.file_list is not None:
+        file_list = read_file_list(args.file_list)
+        filepaths = list(browser.ifind_paths(file_list, **vars(args)))
+    else:
+        filepaths = browser.find(data_dir, **vars(args))
+    manifest = OutputManifest(outpath, "lma_plot")
+    if args.filter_stats:
+        print_filter_stats(browser.filter_stats())
+
     for file in filepaths:
         # ------------ Get Data from Gridded NetCDF Files ------------
         path = file.path
@@ -777,6 +804,7 @@ def main():
             theme="norm",
             image_type="png",
         )
+        manifest.append([(file.prefix, file.datetime, "")])
 
 
 if __name__ == "__main__":
@@ -29,6 +29,7 @@ from lmatools.grid.make_grids import (
 )
 from six.moves import map
 from lma_data.LMA_util import get_lma_data_dir, get_lma_out_dir
+from lma_data.LMA_probe import ProbeCache
 
 import logging, logging.handlers
 
@@ -310,11 +311,13 @@ def main():
     }  # minimum number of points per flash
 
     # ------- Create List of non-empty Data Files -----------
+    # Header-only and corrupt files are skipped by probing their header
+    probe_cache = ProbeCache()
     data_files = []
     for file in filenames:
         fname = os.path.basename(file)
         f_time = int(float((fname.split("_")[2])))
-        if os.stat(file).st_size > 2048:
+        if probe_cache.probe(file).has_data():
             if end_time < start_time:
                 if int(start_time) <= f_time:
                     data_files.append(file)
@@ -342,12 +345,13 @@ def main():
         for file in filenames:
             fname = os.path.basename(file)
             f_time = int(float((fname.split("_")[2])))
-            if os.stat(file).st_size > 2048:
+            if probe_cache.probe(file).has_data():
                 if f_time <= int(end_time):
                     data_files.append(file)
             else:
                 print("No data in data file")
                 continue
+    probe_cache.close()
     # -------------------------------------------------------
     # ----- Cluster Sources into Flashes (HDF5 files) -------
     h5_filenames = sort_flashes(data_files, data_out, params)
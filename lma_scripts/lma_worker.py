@@ -0,0 +1,156 @@
+import argparse, os, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from lma_data.LMA_queue import WorkQueue, default_worker_id
+from lma_data.LMA_manifest import OutputManifest
+from lma_data.LMA_schedule import RuntimeHistory
+from lma_data.LMA_journal import find_batch_outputs
+from lma_data.LMA_telemetry import TelemetryLog, print_telemetry_summary
+from lma_data.LMA_batch_engine import BatchRecorder
+from lma_scripts.lma_batch import (
+    process_batch,
+    setup_signal_catcher,
+    lma_shutdown_event,
+)
+
+
+def run_worker(
+    queue: WorkQueue,
+    worker: str,
+    lma_analysis_bin: Optional[str],
+    silent_mode: bool,
+    lease_seconds: float,
+    poll_interval: float,
+    telemetry: Optional[TelemetryLog] = None,
+) -> int:
+    """
+    Leases batches from the queue and runs lma_analysis on them until every
+    batch is done (or the worker is shut down). Returns the number of batches
+    the worker ran.
+    """
+    settings = queue.settings()
+    out_dir = settings.out_dir
+    lma_analysis_bin = lma_analysis_bin or settings.lma_analysis_bin
+    os.makedirs(out_dir, exist_ok=True)
+    recorder = BatchRecorder(
+        out_dir,
+        OutputManifest(out_dir, "lma_batch"),
+        RuntimeHistory(out_dir),
+        telemetry=telemetry,
+    )
+
+    processed = 0
+    while not lma_shutdown_event.is_set():
+        leased = queue.lease(worker, lease_seconds)
+        if leased is None:
+            if queue.is_drained():
+                break
+
+            # Wait for leases to expire or failed batches to back off
+            lma_shutdown_event.wait(poll_interval)
+            continue
+
+        print(f"[{worker}] {leased.key} (attempt {leased.attempt})")
+        with queue.keep_leased(leased.key, worker, lease_seconds):
+            start = time.perf_counter()
+            exit_code = process_batch(
+                leased.batch,
+                out_dir,
+                lma_analysis_bin,
+                settings.lma_analysis_args,
+                silent_mode,
+                recorder,
+                span_args=settings.span_args,
+                first_attempt=leased.attempt,
+            )
+            seconds = time.perf_counter() - start
+
+        outputs = find_batch_outputs(out_dir, leased.batch) if exit_code == 0 else []
+        queue.complete(leased, worker, exit_code, seconds, outputs)
+        processed += 1
+
+    return processed
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog="lma_worker",
+        description="Run lma_analysis on the batches of a work queue queued by lma_batch --queue. Start workers on as many hosts as the queue's storage is shared with.",
+    )
+
+    parser.add_argument("queue_path", help="The work queue database.")
+    parser.add_argument(
+        "-n",
+        "--num_workers",
+        type=int,
+        dest="num_workers",
+        help="The number of batches to run at once on this host.",
+    )
+    parser.add_argument("--silent", "-s", action="store_true", dest="silent_mode")
+    parser.add_argument(
+        "-b",
+        "--lma-analysis-bin",
+        type=str,
+        dest="lma_analysis_bin",
+        help="The location of the lma_analysis binary on this host. Defaults to the coordinator's.",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=120.0,
+        dest="lease_seconds",
+        help="The seconds a batch stays leased without a heartbeat before other workers may take it over.",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=10.0,
+        dest="poll_interval",
+        help="The seconds to wait for batches when none is available.",
+    )
+
+    return parser
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.queue_path):
+        parser.error(f"There is no work queue at {args.queue_path}")
+
+    num_workers = args.num_workers or os.cpu_count()
+    queue = WorkQueue(args.queue_path)
+    out_dir = queue.settings().out_dir
+    os.makedirs(out_dir, exist_ok=True)
+    telemetry = TelemetryLog(out_dir)
+    setup_signal_catcher()
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(
+                run_worker,
+                queue,
+                f"{default_worker_id()}:{slot}",
+                args.lma_analysis_bin,
+                args.silent_mode,
+                args.lease_seconds,
+                args.poll_interval,
+                telemetry,
+            )
+            for slot in range(num_workers)
+        ]
+        processed = sum(future.result() for future in futures)
+
+    print_telemetry_summary(telemetry.records, time.perf_counter() - start)
+    counts = queue.counts()
+    queue.close()
+    print(
+        f"Ran {processed} batches. Queue: {counts['succeeded']} succeeded, "
+        f"{counts['failed']} failed, {counts['pending'] + counts['leased']} left"
+    )
+
+
+if __name__ == "__main__":
+    main()
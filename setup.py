@@ -12,6 +12,9 @@ setup(
             "lma_storm=lma_scripts.lma_storm:main",
             "lma_batch=lma_scripts.lma_batch:main",
             "lma_find=lma_scripts.lma_find:main",
+            "lma_catalogd=lma_scripts.lma_catalogd:main",
+            "lma_manifest=lma_scripts.lma_manifest:main",
+            "lma_worker=lma_scripts.lma_worker:main",
         ]
     },
     packages=find_packages(),
@@ -0,0 +1,96 @@
+import os
+from lma_data.LMA_batch_engine import AsyncBatchEngine, BatchFeed, BatchRecorder
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_journal import BatchJournal
+
+# Writes more than a pipe holds to stdout, and fails 00:10 once
+FAKE_LMA_ANALYSIS = """#!/bin/sh
+time="$4"
+out_dir="$6"
+if [ "$time" = "001000" ] && [ ! -e "$out_dir/retried" ]; then
+    touch "$out_dir/retried"
+    echo "no sources" >&2
+    exit 3
+fi
+head -c 200000 /dev/zero | tr '\\0' 'x' | fold -w 99
+echo "done" >&2
+touch "$out_dir/LYLOUT_230512_${time}_0600.dat.gz"
+"""
+
+
+def create_batches(tmp_path) -> list[list[LMADataFile]]:
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    batches = []
+    for minute in (0, 10, 20):
+        batch = []
+        for station in "ab":
+            path = data_dir / f"L{station}_DCLMA_n{station}_230512_00{minute:02d}00.dat"
+            path.touch()
+            batch.append(LMADataFile.try_parse(str(path)))
+
+        batches.append(batch)
+
+    return batches
+
+
+def create_engine(tmp_path, **kwargs) -> AsyncBatchEngine:
+    lma_analysis = tmp_path / "lma_analysis"
+    lma_analysis.write_text(FAKE_LMA_ANALYSIS)
+    lma_analysis.chmod(0o755)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir(exist_ok=True)
+
+    return AsyncBatchEngine(str(out_dir), str(lma_analysis), "", 2, **kwargs)
+
+
+def test_async_engine_drains_logs_and_retries(tmp_path, capsys):
+    batches = create_batches(tmp_path)
+    engine = create_engine(tmp_path, retries=1, echo_rate=5.0)
+    journal = BatchJournal(engine.out_dir)
+    journal.add(batches)
+    engine.recorder = BatchRecorder(engine.out_dir, journal=journal)
+    done = []
+
+    assert engine.run(batches, done.append) == [0, 0, 0]
+    assert sorted(done) == [0, 0, 0]
+    assert journal.counts()["succeeded"] == 3
+    journal.close()
+
+    logs = tmp_path / "out" / "logs"
+    assert sorted(os.listdir(logs)) == [
+        "20230512_000000.log",
+        "20230512_001000.log",
+        "20230512_002000.log",
+    ]
+    retried_log = (logs / "20230512_001000.log").read_text()
+    assert retried_log.startswith("# attempt 1: ")
+    assert "no sources" in retried_log and "# attempt 2: " in retried_log
+    # Every line reached the logs, only a few were echoed
+    assert retried_log.count("x" * 99 + "\n") == 200000 // 99
+    assert len(capsys.readouterr().out.splitlines()) < 100
+    assert engine.echo.suppressed > 0
+
+
+def test_async_engine_runs_a_feed(tmp_path):
+    batches = create_batches(tmp_path)
+    engine = create_engine(tmp_path, silent_mode=True)
+    feed = BatchFeed(iter(batches), max_pending=1)
+    feed.start()
+
+    # 00:10 fails, there are no retries
+    assert sorted(engine.run(feed)) == [0, 0, 3]
+    assert feed.exhausted and feed.produced == 3
+
+
+def test_async_engine_records_failed_spawns(tmp_path):
+    batches = create_batches(tmp_path)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    engine = AsyncBatchEngine(
+        str(out_dir), str(tmp_path / "missing"), "", 2, silent_mode=True
+    )
+
+    assert engine.run(batches[:1]) == [127]
+    log = (out_dir / "logs" / "20230512_000000.log").read_text()
+    assert "Couldn't run" in log
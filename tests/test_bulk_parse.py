@@ -0,0 +1,104 @@
+import pytest
+from typing import Callable, Optional
+from lma_data.LMA_bulk_parse import (
+    map_lma_analysis_paths,
+    map_lma_data_paths,
+    map_lmatools_paths,
+)
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.bundle import join_member_path
+from lma_data.lma_analysis_data_file import LMAAnalysisDataFile
+from lma_data.lmatools_file import LMAToolsFile
+
+LMA_DATA_PATHS = [
+    "/data/DCLMA/La_DCLMA_na_230512_000000.dat",
+    "/data/DCLMA/LB_DCLMA_nB_230512_001000.dat.gz",
+    "/data/DCLMA/Lc_OKLMA_Norman_690101_235959.dat",
+    "/data/DCLMA/Lc_OKLMA_Norman_680101_000000.dat",
+    join_member_path("/data/DCLMA_230512.tar", "La_DCLMA_na_230512_002000.dat.gz"),
+    # Not LMA data files, or not valid dates
+    "/data/DCLMA/README.txt",
+    "/data/DCLMA/La_DCLMA_na_230230_000000.dat",
+    "/data/DCLMA/La_DCLMA_na_231301_000000.dat",
+    "/data/DCLMA/La_DCLMA_na_230512_240000.dat",
+]
+
+LMA_ANALYSIS_PATHS = [
+    "/out/LYLOUT_230512_000000_0600.dat.gz",
+    "/out/LYLOUT_230512_001000_0600.dat",
+    "/out/LYLOUT_2305120_0010_0600.dat.gz",
+    "/out/LYLOUT_230229_000000_0600.dat.gz",
+    "/out/LYLOUT.dat.gz",
+]
+
+LMATOOLS_PATHS = [
+    "/grids/LYLOUT_20230512_000000_0600_10src_0.0109deg-dx_flash_extent.nc",
+    "/grids/LYLOUT_20230512_001000_0600_5src_2000.0m-dx_source.nc",
+    "/grids/LYLOUT_2023051_001000_0600_5src_2000.0m-dx_source.nc",
+    "/grids/LYLOUT_20230512_001000_0600.nc",
+]
+
+
+def try_parse_all(try_parse: Callable[[str], Optional[object]], paths: list[str]):
+    parsed = []
+    for path in paths:
+        try:
+            data_file = try_parse(path)
+        except ValueError:
+            continue
+
+        if data_file:
+            parsed.append(data_file)
+
+    return parsed
+
+
+def fields(data_file) -> tuple:
+    if isinstance(data_file, LMADataFile):
+        return (
+            data_file.path,
+            data_file.station_identifier,
+            data_file.network,
+            data_file.station_name,
+            data_file.datetime,
+            data_file.sort_key,
+        )
+
+    return tuple(vars(data_file).values())
+
+
+@pytest.mark.parametrize(
+    "bulk_mapper, try_parse, paths",
+    [
+        (map_lma_data_paths, LMADataFile.try_parse, LMA_DATA_PATHS),
+        (map_lma_analysis_paths, LMAAnalysisDataFile.try_parse, LMA_ANALYSIS_PATHS),
+        (map_lmatools_paths, LMAToolsFile.try_parse, LMATOOLS_PATHS),
+    ],
+)
+def test_bulk_parsers_match_try_parse(bulk_mapper, try_parse, paths):
+    columns, data_files = bulk_mapper(paths)
+    expected = try_parse_all(try_parse, paths)
+
+    assert expected
+    assert [fields(data_file) for data_file in data_files] == [
+        fields(data_file) for data_file in expected
+    ]
+    assert columns.paths == [data_file.path for data_file in expected]
+    assert columns.datetimes() == [data_file.datetime for data_file in expected]
+
+
+def test_bulk_parser_columns_decode_to_the_records():
+    columns, data_files = map_lma_data_paths(LMA_DATA_PATHS * 2)
+
+    # Repeated networks/stations share a code
+    assert columns.vocabularies["network"] == ["dclma", "oklma"]
+    assert columns.column("station_identifier").tolist() == [
+        data_file.station_identifier for data_file in data_files
+    ]
+
+    late = columns.select(columns.column("datetime") >= columns.times[1])
+    assert late.paths == [
+        data_file.path
+        for data_file in data_files
+        if data_file.datetime >= data_files[1].datetime
+    ]
@@ -0,0 +1,133 @@
+from datetime import datetime
+import pytest
+from lma_data.LMA_catalog import LMACatalog
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.file_browser import FileBrowser
+
+
+def create_archive(root) -> None:
+    day_dir = root / "DCLMA" / "data" / "2023" / "05" / "12"
+    day_dir.mkdir(parents=True)
+    for station in "ab":
+        (day_dir / f"L{station}_DCLMA_n{station}_230512_000000.dat").touch()
+        (day_dir / f"L{station}_DCLMA_n{station}_230512_001000.dat.gz").touch()
+
+    (day_dir / "README.txt").touch()
+
+
+@pytest.mark.parametrize("glob_pathname", ["**/*.dat", "**/*.*", "**/*.gz"])
+def test_catalog_finds_the_walked_files(tmp_path, glob_pathname):
+    create_archive(tmp_path / "archive")
+    browser = FileBrowser(LMADataFile.try_parse, glob_pathname)
+    walked = sorted(path for _, path in browser.ifind2(str(tmp_path / "archive")))
+
+    catalog = LMACatalog(str(tmp_path / "catalog.sqlite"))
+    catalog.refresh(str(tmp_path / "archive"))
+    cataloged = catalog.query(file_pattern=browser.name_pattern)
+    catalog.close()
+
+    assert walked
+    assert sorted(data_file.path for data_file in cataloged) == walked
+
+
+def test_catalog_rebuilds_for_another_file_pattern(tmp_path):
+    create_archive(tmp_path / "archive")
+    catalog_path = str(tmp_path / "catalog.sqlite")
+    catalog = LMACatalog(catalog_path, "*.dat")
+    catalog.refresh(str(tmp_path / "archive"))
+    assert len(catalog.query()) == 2
+    catalog.close()
+
+    # The unchanged directories are rescanned for the .dat.gz files
+    catalog = LMACatalog(catalog_path)
+    assert catalog.refresh(str(tmp_path / "archive")) == 6
+    assert len(catalog.query()) == 4
+    catalog.close()
+
+
+def test_catalog_schema_persists_across_connections(tmp_path):
+    create_archive(tmp_path / "archive")
+    catalog_path = str(tmp_path / "catalog.sqlite")
+    catalog = LMACatalog(catalog_path)
+    catalog.refresh(str(tmp_path / "archive"))
+    tables = catalog._connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    catalog.close()
+
+    assert sorted(tables) == [("directories",), ("files",), ("settings",)]
+
+    # Nothing changed, so nothing is rescanned
+    catalog = LMACatalog(catalog_path)
+    assert catalog.refresh(str(tmp_path / "archive")) == 0
+    assert len(catalog.query()) == 4
+    catalog.close()
+
+
+def test_catalog_refresh_rescans_changed_directories(tmp_path):
+    create_archive(tmp_path / "archive")
+    month_dir = tmp_path / "archive" / "DCLMA" / "data" / "2023" / "05"
+    catalog = LMACatalog(str(tmp_path / "catalog.sqlite"))
+    catalog.refresh(str(tmp_path / "archive"))
+
+    new_day_dir = month_dir / "13"
+    new_day_dir.mkdir()
+    (new_day_dir / "La_DCLMA_na_230513_000000.dat").touch()
+    # The month directory and its new day directory
+    assert catalog.refresh(str(tmp_path / "archive")) == 2
+    assert len(catalog.query()) == 5
+
+    for path in (month_dir / "12").iterdir():
+        path.unlink()
+
+    (month_dir / "12").rmdir()
+    catalog.refresh(str(tmp_path / "archive"))
+    assert [data_file.path for data_file in catalog.query()] == [
+        str(new_day_dir / "La_DCLMA_na_230513_000000.dat")
+    ]
+    catalog.close()
+
+
+def test_catalog_query_filters(tmp_path):
+    create_archive(tmp_path / "archive")
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    (other_dir / "Lc_DCLMA_nc_230512_000000.dat").touch()
+    # Shares its name's prefix with "other"
+    (tmp_path / "other2").mkdir()
+    (tmp_path / "other2" / "Ld_DCLMA_nd_230512_000000.dat").touch()
+
+    catalog = LMACatalog(str(tmp_path / "catalog.sqlite"))
+    catalog.refresh(str(tmp_path / "archive"))
+    catalog.refresh(str(other_dir))
+    catalog.refresh(str(tmp_path / "other2"))
+
+    def stations(**kwargs) -> list[tuple[str, str]]:
+        return [
+            (data_file.station_identifier, data_file.datetime.strftime("%H%M"))
+            for data_file in catalog.query(**kwargs)
+        ]
+
+    assert stations() == [
+        ("a", "0000"),
+        ("b", "0000"),
+        ("c", "0000"),
+        ("d", "0000"),
+        ("a", "0010"),
+        ("b", "0010"),
+    ]
+    assert stations(station_ids=["A"]) == [("a", "0000"), ("a", "0010")]
+    assert stations(network_ids=["dclma"], start_date=datetime(2023, 5, 12, 0, 5)) == [
+        ("a", "0010"),
+        ("b", "0010"),
+    ]
+    assert stations(end_date=datetime(2023, 5, 12), root_dirs=[str(other_dir)]) == [
+        ("c", "0000")
+    ]
+
+    batches = catalog.batch(root_dirs=[str(tmp_path / "archive")])
+    catalog.close()
+
+    assert [
+        [data_file.station_identifier for data_file in batch] for batch in batches
+    ] == [["a", "b"], ["a", "b"]]
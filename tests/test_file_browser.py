@@ -0,0 +1,72 @@
+import os, pytest
+from operator import attrgetter
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_layout import archive_dir_sorted
+from lma_data.browser.file_browser import FileBrowser, UnsortedFilesError
+
+
+def create_browser() -> FileBrowser[LMADataFile]:
+    return FileBrowser(LMADataFile.try_parse, "**/*.dat")
+
+
+def test_missing_root_finds_nothing(tmp_path):
+    files = create_browser().ifind_sorted(
+        str(tmp_path / "missing"), attrgetter("sort_key")
+    )
+    assert list(files) == []
+
+
+def create_station_dirs(root) -> list[str]:
+    # Station directories don't sort like the files' times
+    names = []
+    for station in "ab":
+        station_dir = root / "NET" / station
+        station_dir.mkdir(parents=True)
+        for time in ("000000", "001000"):
+            name = f"L{station}_DCLMA_n{station}_230512_{time}.dat"
+            (station_dir / name).touch()
+            names.append(name)
+
+    return names
+
+
+def test_unsorted_directories_are_sorted_whole(tmp_path):
+    names = create_station_dirs(tmp_path)
+    files = create_browser().ifind_sorted(
+        str(tmp_path), attrgetter("sort_key"), archive_dir_sorted
+    )
+
+    assert [os.path.basename(path) for _, path in files] == sorted(
+        names, key=lambda name: (name[-10:], name)
+    )
+
+
+def test_archive_layout_is_sorted_lazily(tmp_path, monkeypatch):
+    for day in ("11", "12"):
+        day_dir = tmp_path / "DCLMA" / "data" / "2023" / "05" / day
+        day_dir.mkdir(parents=True)
+        for station in "ab":
+            (day_dir / f"L{station}_DCLMA_n{station}_2305{day}_000000.dat").touch()
+
+    browser = create_browser()
+    monkeypatch.setattr(
+        browser, "ifind2", lambda *args, **kwargs: pytest.fail("sorted whole")
+    )
+    files = [
+        file
+        for file, _ in browser.ifind_sorted(
+            str(tmp_path), attrgetter("sort_key"), archive_dir_sorted
+        )
+    ]
+
+    assert len(files) == 4
+    assert files == sorted(files, key=attrgetter("sort_key"))
+
+
+def test_unsorted_files_in_sorted_dirs_raise(tmp_path):
+    create_station_dirs(tmp_path)
+    files = create_browser().ifind_sorted(
+        str(tmp_path), attrgetter("sort_key"), lambda dir_path: True
+    )
+    with pytest.raises(UnsortedFilesError):
+        list(files)
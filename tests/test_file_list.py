@@ -0,0 +1,12 @@
+from lma_data.browser.file_browser import FileBrowser
+from lma_data.lmatools_file import LMAToolsFile
+
+GRID_PREFIX = "/grids/LYLOUT_20230512_000000_600_10src_1.0km-dx_"
+
+
+def test_listed_paths_match_the_glob_pattern():
+    browser = FileBrowser(LMAToolsFile.try_parse, glob_pathname="**/*source_3d.nc")
+    paths = [f"{GRID_PREFIX}source_3d.nc", f"{GRID_PREFIX}flash_extent.nc"]
+
+    files = list(browser.ifind_paths(paths))
+    assert [file.path for file in files] == [f"{GRID_PREFIX}source_3d.nc"]
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from lma_data.LMA_bulk_parse import map_lma_data_paths
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_filters import LMAFilters
+from lma_data.browser.chunk import FileChunk
+from lma_data.browser.file_browser import FileBrowser
+from lma_data.browser.filters.compound import CompoundFilter
+from lma_data.browser.filters.non_empty import NonEmptyFileFilter
+from lma_data.browser.filters.regex import PathRegexFilter
+
+ARGS = [
+    {},
+    {"network": ["OKLMA"]},
+    {"network": ["dclma,oklma"], "stations": ["A", "k"]},
+    {"start_date": "2023-05-12T00:10:00"},
+    {"start_date": "2023-05-11T00:00:00", "end_date": "2023-05-12T00:05:00"},
+    {"end_date": "not a date", "stations": ["b"]},
+]
+
+
+def create_files(root) -> list[tuple[str, LMADataFile]]:
+    files = []
+    for network, stations in {"DCLMA": "abc", "OKLMA": "bk"}.items():
+        for station in stations:
+            for date, time in (("230511", "235000"), ("230512", "001000")):
+                path = root / f"L{station}_{network}_n{station}_{date}_{time}.dat"
+                # Every other station's files are too small for NonEmptyFileFilter
+                path.write_bytes(b"\0" * (4096 if station in "ak" else 16))
+                files.append((str(path), LMADataFile.try_parse(str(path))))
+
+    return files
+
+
+def create_filters():
+    # Chunks of bulk mapped files are tested on their columns
+    return [
+        LMAFilters[LMADataFile].create_date_filter(
+            lambda _, file: file.datetime, column="datetime"
+        ),
+        LMAFilters[LMADataFile].create_network_filter(
+            lambda _, file: file.network, column="network"
+        ),
+        LMAFilters[LMADataFile].create_station_filter(
+            lambda _, file: file.station_identifier, "station_identifier"
+        ),
+        PathRegexFilter[LMADataFile](r".*_230512_"),
+        NonEmptyFileFilter[LMADataFile](),
+    ]
+
+
+@pytest.mark.parametrize("args", ARGS)
+def test_bound_filters_match_test(tmp_path, args):
+    files = create_files(tmp_path)
+    filters = create_filters()
+    for browser_filter in [*filters, CompoundFilter(filters)]:
+        predicate = browser_filter.bind(args)
+        for path, file in files:
+            expected = browser_filter.test(path, file, args)
+            # Filters accepting every file aren't bound
+            passed = predicate(path, file, None) if predicate else True
+            assert passed == expected, (browser_filter.name, path)
+
+
+@pytest.mark.parametrize("args", ARGS)
+def test_browser_filter_chain_matches_test(tmp_path, args):
+    files = create_files(tmp_path)
+    filters = create_filters()
+    browser = FileBrowser(LMADataFile.try_parse, "**/*.dat")
+    LMAFilters.add_filters_to_browser(browser, *filters)
+    expected = sorted(
+        path
+        for path, file in files
+        if all(browser_filter.test(path, file, args) for browser_filter in filters)
+    )
+
+    assert sorted(path for _, path in browser.ifind2(str(tmp_path), **args)) == expected
+
+    # Instrumented and reordered chains find the same files
+    browser.enable_filter_stats(adaptive=True)
+    assert sorted(path for _, path in browser.ifind2(str(tmp_path), **args)) == expected
+    assert all(stats.calls >= stats.rejections for stats in browser.filter_stats())
+
+
+@pytest.mark.parametrize("args", ARGS)
+@pytest.mark.parametrize("bulk_mapped", [False, True])
+def test_chunk_filters_match_test(tmp_path, args, bulk_mapped):
+    files = create_files(tmp_path)
+    paths = [path for path, _ in files]
+    if bulk_mapped:
+        columns, data_files = map_lma_data_paths(paths)
+        chunk = FileChunk(paths, data_files, [None] * len(paths), columns)
+    else:
+        chunk = FileChunk(paths, [file for _, file in files], [None] * len(paths))
+
+    filters = create_filters()
+    for browser_filter in [*filters, CompoundFilter(filters)]:
+        predicate = browser_filter.bind_chunk(args)
+        expected = [browser_filter.test(path, file, args) for path, file in files]
+        passed = predicate(chunk) if predicate else np.ones(len(chunk), dtype=bool)
+        assert passed.tolist() == expected, browser_filter.name
+
+
+@pytest.mark.parametrize("args", ARGS)
+def test_chunked_browser_matches_the_unchunked_one(tmp_path, args):
+    create_files(tmp_path)
+    (tmp_path / "README.txt").touch()
+
+    def find(**kwargs) -> list[str]:
+        browser = FileBrowser(LMADataFile.try_parse, "**/*.*", **kwargs)
+        LMAFilters.add_filters_to_browser(browser, *create_filters())
+        return sorted(path for _, path in browser.ifind2(str(tmp_path), **args))
+
+    expected = find()
+    # Chunks smaller than the files found, so filters see several of them
+    assert find(chunk_size=3) == expected
+    assert find(chunk_size=3, bulk_mapper=map_lma_data_paths) == expected
@@ -0,0 +1,99 @@
+import pytest
+from datetime import datetime
+from itertools import groupby
+from operator import attrgetter
+from lma_data.LMA_browser import LMABrowser
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.browser.file_browser import FileBrowser
+
+NETWORKS = {"DCLMA": "abc", "OKLMA": "bk"}
+
+
+def create_archive(root) -> None:
+    for network, stations in NETWORKS.items():
+        for day in ("11", "12"):
+            day_dir = root / network / "data" / "2023" / "05" / day
+            day_dir.mkdir(parents=True)
+            for station in stations:
+                for time in ("000000", "001000", "235000"):
+                    name = f"L{station}_{network}_n{station}_2305{day}_{time}.dat"
+                    (day_dir / name).touch()
+
+
+@pytest.fixture
+def archive(tmp_path) -> tuple[LMABrowser, list[LMADataFile]]:
+    create_archive(tmp_path)
+    browser = LMABrowser()
+    browser.find(str(tmp_path))
+    walked = [
+        data_file
+        for data_file, _ in FileBrowser(LMADataFile.try_parse, "**/*.dat").ifind2(
+            str(tmp_path)
+        )
+    ]
+
+    return browser, sorted(walked, key=attrgetter("sort_key"))
+
+
+@pytest.mark.parametrize(
+    "network_ids, station_ids, start_date, end_date",
+    [
+        (None, None, None, None),
+        (["OKLMA"], None, None, None),
+        (None, ["A", "k"], None, None),
+        (["dclma"], ["b"], datetime(2023, 5, 11, 0, 10), None),
+        (None, None, datetime(2023, 5, 11, 0, 5), datetime(2023, 5, 12, 0, 10)),
+        (None, None, datetime(2023, 5, 13), None),
+        (["ldar"], None, None, None),
+    ],
+)
+def test_index_query_matches_the_walk(
+    archive, network_ids, station_ids, start_date, end_date
+):
+    browser, walked = archive
+    networks = [network_id.lower() for network_id in network_ids or []]
+    stations = [station_id.lower() for station_id in station_ids or []]
+    expected = [
+        data_file.path
+        for data_file in walked
+        if (not networks or data_file.network in networks)
+        and (not stations or data_file.station_identifier in stations)
+        and (not start_date or data_file.datetime >= start_date)
+        and (not end_date or data_file.datetime <= end_date)
+    ]
+
+    data_files = browser.query(network_ids, station_ids, start_date, end_date)
+    assert [data_file.path for data_file in data_files] == expected
+
+
+def test_index_batch_matches_the_walk(archive):
+    browser, walked = archive
+    start_date = datetime(2023, 5, 11, 0, 10)
+    expected = [
+        [data_file.path for data_file in batch]
+        for _, batch in groupby(
+            (data_file for data_file in walked if data_file.datetime >= start_date),
+            attrgetter("datetime"),
+        )
+    ]
+
+    batches = browser.batch(start_date)
+    assert [[data_file.path for data_file in batch] for batch in batches] == expected
+    assert browser.batch(datetime(2023, 5, 13)) == []
+
+
+def test_index_follows_added_and_removed_files(archive, tmp_path):
+    browser, walked = archive
+    assert len(browser.query()) == len(walked)
+
+    # The built index is merged with the added files, not rebuilt
+    added = LMADataFile.try_parse(str(tmp_path / "Lz_WTLMA_nz_230511_001000.dat"))
+    browser.add([added])
+    assert browser.query(station_ids=["z"]) == [added]
+    at_added = browser.query(start_date=added.datetime, end_date=added.datetime)
+    assert at_added[-1] is added
+
+    browser.remove({added.path, walked[0].path})
+    assert [data_file.path for data_file in browser.query()] == [
+        data_file.path for data_file in walked[1:]
+    ]
@@ -0,0 +1,128 @@
+import os, signal, subprocess, sys, time
+from collections import Counter
+from lma_data.LMA_batch_engine import BatchRecorder
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_journal import BatchJournal
+from lma_scripts.lma_batch import process_batch
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Logs each run, hangs on 00:10 until released and fails 00:20 until fixed
+FAKE_LMA_ANALYSIS = """#!/bin/sh
+time="$4"
+out_dir="$6"
+echo "$time" >> "$out_dir/../runs.log"
+if [ "$time" = "001000" ] && [ ! -e "$out_dir/../released" ]; then
+    sleep 60
+fi
+if [ "$time" = "002000" ] && [ ! -e "$out_dir/../fixed" ]; then
+    exit 3
+fi
+touch "$out_dir/LYLOUT_230512_${time}_0600.dat.gz"
+"""
+
+
+def station_batch(data_dir, minute: int) -> list[LMADataFile]:
+    batch = []
+    for station in "ab":
+        name = f"L{station}_DCLMA_n{station}_230512_00{minute:02d}00.dat"
+        (data_dir / name).touch()
+        batch.append(LMADataFile.try_parse(str(data_dir / name)))
+
+    return batch
+
+
+def test_failed_spawn_is_a_failed_attempt(tmp_path):
+    batch = station_batch(tmp_path, 0)
+    out_dir = str(tmp_path / "out")
+    journal = BatchJournal(str(tmp_path))
+    journal.add([batch])
+
+    exit_code = process_batch(
+        batch,
+        out_dir,
+        str(tmp_path / "missing_lma_analysis"),
+        "",
+        True,
+        BatchRecorder(out_dir, journal=journal),
+        retries=1,
+    )
+    attempts = journal._connection.execute("SELECT attempts FROM batches").fetchone()
+
+    assert exit_code == 127
+    assert journal.counts()["failed"] == 1
+    assert attempts == (2,)
+    assert journal.unfinished() == [batch]
+    journal.close()
+
+
+def test_windows_without_outputs_stay_pending(tmp_path):
+    # A coalesced batch of two windows, lma_analysis only wrote the first's output
+    batch = station_batch(tmp_path, 0) + station_batch(tmp_path, 10)
+    journal = BatchJournal(str(tmp_path))
+    journal.add([batch])
+    journal.start(batch)
+    journal.finish(batch, 0, 1.0, [str(tmp_path / "LYLOUT_230512_000000_0600.dat")])
+
+    assert journal.counts()["succeeded"] == 1
+    assert journal.unfinished() == [batch[2:]]
+    journal.close()
+
+
+def run_lma_batch(tmp_path, *args) -> subprocess.Popen:
+    lma_analysis = tmp_path / "lma_analysis"
+    if not lma_analysis.exists():
+        lma_analysis.write_text(FAKE_LMA_ANALYSIS)
+        lma_analysis.chmod(0o755)
+
+    command = [sys.executable, "-m", "lma_scripts.lma_batch", "--no-service", "-s"]
+    command += ["-n", "1", "-b", str(lma_analysis), *args]
+    return subprocess.Popen(
+        command,
+        env=dict(os.environ, PYTHONPATH=REPO_DIR),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def test_resume_after_interrupted_run(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for minute in (0, 10, 20):
+        station_batch(data_dir, minute)
+
+    out_dir = tmp_path / "out"
+    run = run_lma_batch(tmp_path, str(data_dir), str(out_dir))
+    deadline = time.time() + 30
+    # Crash (ex: the node went down) while 00:10 is running
+    while time.time() < deadline:
+        runs_log = tmp_path / "runs.log"
+        if runs_log.exists() and "001000" in runs_log.read_text():
+            break
+
+        time.sleep(0.05)
+
+    os.killpg(run.pid, signal.SIGKILL)
+    run.wait()
+
+    journal = BatchJournal(str(out_dir))
+    assert journal.counts()["running"] == 1
+    journal.close()
+
+    (tmp_path / "released").touch()
+    assert run_lma_batch(tmp_path, "--resume", str(out_dir)).wait(30) == 0
+
+    journal = BatchJournal(str(out_dir))
+    assert journal.counts()["succeeded"] == 2 and journal.counts()["failed"] == 1
+    journal.close()
+
+    # Only the failed batch is rerun
+    (tmp_path / "fixed").touch()
+    assert run_lma_batch(tmp_path, "--resume", str(out_dir)).wait(30) == 0
+
+    journal = BatchJournal(str(out_dir))
+    assert journal.counts()["succeeded"] == 3
+    journal.close()
+    runs = Counter((tmp_path / "runs.log").read_text().split())
+    assert runs["000000"] == 1 and runs["001000"] == 2
@@ -0,0 +1,36 @@
+import os
+from datetime import datetime
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_filters import LMAFilters
+from lma_data.LMA_layout import archive_dir_network, archive_dir_span
+from lma_data.browser.file_browser import FileBrowser
+
+
+def test_archive_dirs_within_layout():
+    assert archive_dir_network("MALMA/data") == "malma"
+    assert archive_dir_span("MALMA/data/2023/05") == (
+        datetime(2023, 5, 1),
+        datetime(2023, 6, 1),
+    )
+
+
+def test_archive_dirs_outside_layout():
+    assert archive_dir_network("MALMA") is None
+    assert archive_dir_network("notes/data/misc") is None
+    assert archive_dir_span("MALMA/data/2023/05/12/extra") is None
+
+
+def test_network_search_below_a_data_dir(tmp_path):
+    # The search root's own "data" component isn't part of the layout
+    day_dir = tmp_path / "data" / "MALMA" / "data" / "2023" / "05" / "12"
+    os.makedirs(day_dir)
+    (day_dir / "La_MALMA_na_230512_000000.dat").touch()
+
+    browser = FileBrowser(LMADataFile.try_parse, "**/*.dat")
+    network_filter = LMAFilters[LMADataFile].create_network_filter(
+        lambda _, file: file.network, archive_dir_network, "network"
+    )
+    LMAFilters.add_filters_to_browser(browser, network_filter)
+
+    files = browser.find(str(tmp_path / "data"), network=["MALMA"])
+    assert [file.network for file in files] == ["malma"]
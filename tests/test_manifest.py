@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_batch_engine import BatchRecorder
+from lma_data.LMA_manifest import OutputManifest
+from lma_scripts.lma_batch import create_cache_filter
+
+WINDOWS = [datetime(2023, 5, 12, 0, 0), datetime(2023, 5, 12, 0, 10)]
+
+
+def write_baseline_outputs(out_dir: str):
+    # lma_analysis outputs, as an output directory cached before manifests
+    for window in WINDOWS:
+        name = f"LYLOUT_{window:%y%m%d}_{window:%H%M%S}_0600.dat.gz"
+        open(os.path.join(out_dir, name), "w").close()
+
+
+def station_file(window: datetime, station: str = "a") -> LMADataFile:
+    name = f"L{station}_DCLMA_n{station}_{window:%y%m%d}_{window:%H%M%S}.dat"
+    return LMADataFile.try_parse(f"/data/DCLMA/data/{name}")
+
+
+def is_run(out_dir: str, data_file: LMADataFile) -> bool:
+    predicate = create_cache_filter().bind({"out_dir": out_dir})
+    return predicate(data_file.path, data_file, None)
+
+
+def test_baseline_cache_still_cached(tmp_path):
+    out_dir = str(tmp_path)
+    write_baseline_outputs(out_dir)
+
+    assert not is_run(out_dir, station_file(WINDOWS[0]))
+    assert not is_run(out_dir, station_file(WINDOWS[1], "b"))
+    assert is_run(out_dir, station_file(datetime(2023, 5, 12, 0, 20)))
+
+
+def test_rebuilt_manifest_still_cached(tmp_path):
+    out_dir = str(tmp_path)
+    write_baseline_outputs(out_dir)
+    manifest = OutputManifest(out_dir, "lma_batch")
+    manifest.append([("dclma", datetime(2023, 5, 12, 0, 20), "")])
+
+    assert manifest.rebuild() == len(WINDOWS)
+    assert not is_run(out_dir, station_file(WINDOWS[0]))
+    assert is_run(out_dir, station_file(datetime(2023, 5, 12, 0, 20)))
+
+
+def test_recorded_batches_cached(tmp_path):
+    out_dir = str(tmp_path)
+    write_baseline_outputs(out_dir)
+    recorder = BatchRecorder(out_dir, OutputManifest(out_dir, "lma_batch"))
+    batch = [station_file(window, station) for window in WINDOWS for station in "ab"]
+    recorder.batch_finished(batch, 0, 0, 1.0)
+
+    assert not is_run(out_dir, station_file(WINDOWS[1]))
+    assert is_run(out_dir, station_file(datetime(2023, 5, 12, 0, 20)))
+
+
+def test_windows_without_outputs_not_cached(tmp_path):
+    out_dir = str(tmp_path)
+    write_baseline_outputs(out_dir)
+    recorder = BatchRecorder(out_dir, OutputManifest(out_dir, "lma_batch"))
+    # A coalesced batch whose last window lma_analysis wrote nothing for
+    skipped_window = datetime(2023, 5, 12, 0, 20)
+    batch = [station_file(window) for window in [*WINDOWS, skipped_window]]
+    recorder.batch_finished(batch, 0, 0, 1.0)
+
+    assert [entry[1] for entry in recorder.manifest.read()] == WINDOWS
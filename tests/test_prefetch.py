@@ -0,0 +1,59 @@
+import gzip, os, tarfile, time
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_prefetch import BatchPrefetcher
+from lma_data.browser.bundle import gzip_data_size, join_member_path
+
+DATA = b"0123456789" * 10000
+
+
+def write_gzip(path) -> str:
+    with gzip.open(path, "wb") as gzip_file:
+        gzip_file.write(DATA)
+
+    return str(path)
+
+
+def test_gzip_data_size_reads_trailer(tmp_path):
+    path = write_gzip(tmp_path / "La_DCLMA_na_230512_000000.dat.gz")
+    assert os.path.getsize(path) < len(DATA)
+    assert gzip_data_size(path) == len(DATA)
+
+    bundle_path = str(tmp_path / "DCLMA_230512.tar")
+    with tarfile.open(bundle_path, "w") as bundle:
+        bundle.add(path, arcname=os.path.basename(path))
+
+    member_path = join_member_path(bundle_path, os.path.basename(path))
+    assert gzip_data_size(member_path) == len(DATA)
+
+
+def test_prefetch_budget_counts_decompressed_size(tmp_path):
+    batches = []
+    for minute in (0, 10, 20):
+        batch = []
+        for station in "abc":
+            name = f"L{station}_DCLMA_n{station}_230512_00{minute:02d}00.dat.gz"
+            batch.append(LMADataFile.try_parse(write_gzip(tmp_path / name)))
+
+        batches.append(batch)
+
+    # Room for every compressed batch, but only one decompressed
+    prefetcher = BatchPrefetcher(
+        batches,
+        str(tmp_path / "scratch"),
+        lookahead=3,
+        budget_bytes=len(DATA) * 4,
+        decompress=True,
+    )
+    prefetcher.start()
+    try:
+        deadline = time.time() + 10
+        while prefetcher.staged_count == 0 and time.time() < deadline:
+            time.sleep(0.01)
+
+        time.sleep(0.2)
+        assert prefetcher.staged_count == 1
+
+        with prefetcher.staged(batches[0]) as data_paths:
+            assert [os.path.getsize(path) for path in data_paths] == [len(DATA)] * 3
+    finally:
+        prefetcher.close()
@@ -0,0 +1,95 @@
+import gzip, os
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_filters import LMAFilters
+from lma_data.LMA_probe import DATA_MARKER, ProbeCache, probe_data_file
+from lma_data.browser.file_browser import FileBrowser
+
+HEADER = "\n".join(
+    [
+        "lma_analysis v10.14.3",
+        "Number of events: 2",
+        "Sta_info: A  Alpha  38.0 -77.0 100.0",
+        "Sta_info: B  Beta  38.1 -77.1 110.0",
+        DATA_MARKER,
+    ]
+)
+SOURCES = "1.0 38.0 -77.0 5000.0 0.5 5 0x3\n2.0 38.0 -77.0 6000.0 0.6 6 0x7\n"
+
+
+def write_output(path, text: str, compress: bool = True) -> str:
+    data = text.encode("latin-1")
+    if compress:
+        data = gzip.compress(data)
+
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_probe_reads_the_header(tmp_path):
+    text = HEADER + "\n" + SOURCES
+    probe = probe_data_file(write_output(tmp_path / "full.dat.gz", text))
+    assert probe.valid and probe.has_data(2) and not probe.has_data(3)
+    assert probe.event_count == 2
+    assert probe.stations == ("A", "B")
+
+    plain = probe_data_file(write_output(tmp_path / "plain.dat", text, False))
+    assert plain == probe
+
+
+def test_probe_rejects_truncated_headers(tmp_path):
+    empty_path = write_output(tmp_path / "empty.dat.gz", HEADER + "\n")
+    header_only = probe_data_file(empty_path)
+    assert header_only.valid and not header_only.has_data()
+
+    # Cut before the data marker, as an interrupted lma_analysis would leave it
+    cut_text = probe_data_file(write_output(tmp_path / "cut.dat.gz", HEADER[:60]))
+    assert cut_text.error == "No data marker"
+    assert cut_text.event_count == 2
+
+    compressed = gzip.compress((HEADER + "\n" + SOURCES).encode("latin-1"))
+    (tmp_path / "cut_gzip.dat.gz").write_bytes(compressed[: len(compressed) // 2])
+    cut_gzip = probe_data_file(str(tmp_path / "cut_gzip.dat.gz"))
+    assert not cut_gzip.valid and not cut_gzip.has_data()
+
+    long_header = probe_data_file(empty_path, header_limit=32)
+    assert long_header.error == "Header too long"
+
+    bad_count = write_output(tmp_path / "bad.dat.gz", "Number of events: many\n")
+    assert not probe_data_file(bad_count).valid
+    assert not probe_data_file(str(tmp_path / "missing.dat.gz")).valid
+
+
+def test_probe_cache_follows_rewritten_files(tmp_path):
+    path = write_output(tmp_path / "out.dat.gz", HEADER + "\n")
+    cache_path = str(tmp_path / "probes.sqlite")
+    cache = ProbeCache(cache_path)
+    assert not cache.probe(path).has_data()
+    cache.close()
+
+    cache = ProbeCache(cache_path)
+    assert cache.get(path, os.stat(path)) is not None
+
+    write_output(tmp_path / "out.dat.gz", HEADER + "\n" + SOURCES)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert cache.get(path, os.stat(path)) is None
+    assert cache.probe(path).has_data()
+    cache.close()
+
+
+def test_valid_data_filter_skips_truncated_outputs(tmp_path):
+    for time, text in (
+        ("000000", HEADER + "\n" + SOURCES),
+        ("001000", HEADER + "\n"),
+        ("002000", HEADER[:60]),
+    ):
+        write_output(tmp_path / f"LYLOUT_230512_{time}_0600.dat.gz", text)
+
+    browser = FileBrowser(glob_pathname="**/*.dat.gz")
+    LMAFilters.add_filters_to_browser(
+        browser,
+        LMAFilters.create_valid_data_filter(ProbeCache(str(tmp_path / "probes"))),
+    )
+
+    assert [os.path.basename(path) for path in browser.find(str(tmp_path))] == [
+        "LYLOUT_230512_000000_0600.dat.gz"
+    ]
@@ -0,0 +1,97 @@
+import os, subprocess, sys, time
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_queue import QueueSettings, WorkQueue
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fails a batch's first attempt at 00:10, and any batch missing a data file
+FAKE_LMA_ANALYSIS = """#!/bin/sh
+time="$4"
+out_dir="$6"
+shift 6
+for path in "$@"; do
+    [ -e "$path" ] || exit 2
+done
+if [ "$time" = "001000" ] && [ ! -e "$out_dir/failed_once" ]; then
+    touch "$out_dir/failed_once"
+    exit 3
+fi
+touch "$out_dir/LYLOUT_230512_${time}_0600.dat.gz"
+"""
+
+
+def queue_batches(tmp_path, minutes: list[int]) -> list[list[LMADataFile]]:
+    data_dir = tmp_path / "DCLMA" / "data"
+    data_dir.mkdir(parents=True)
+    batches = []
+    for minute in minutes:
+        batch = []
+        for station in "abc":
+            name = f"L{station}_DCLMA_n{station}_230512_00{minute:02d}00.dat"
+            (data_dir / name).write_bytes(b"data")
+            batch.append(LMADataFile.try_parse(os.path.join("DCLMA", "data", name)))
+
+        batches.append(batch)
+
+    return batches
+
+
+def test_enqueue_stores_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batches = queue_batches(tmp_path, [0])
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(batches, QueueSettings(str(tmp_path / "out"), "lma_analysis", ""))
+
+    monkeypatch.chdir(tmp_path / "DCLMA")
+    leased = queue.lease("worker", 60)
+    queue.close()
+
+    assert [data_file.path for data_file in leased.batch] == [
+        str(tmp_path / "DCLMA" / "data" / f"L{s}_DCLMA_n{s}_230512_000000.dat")
+        for s in "abc"
+    ]
+
+
+def test_workers_take_over_expired_leases_and_retry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lma_analysis = tmp_path / "lma_analysis"
+    lma_analysis.write_text(FAKE_LMA_ANALYSIS)
+    lma_analysis.chmod(0o755)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    queue_path = str(tmp_path / "queue.db")
+    queue = WorkQueue(queue_path)
+    queue.enqueue(
+        queue_batches(tmp_path, [0, 10, 20, 30]),
+        QueueSettings(str(out_dir), str(lma_analysis), "", retries=1),
+    )
+    # A worker which died while running its batch, and never renews its lease
+    lost = queue.lease("lost-worker", 1.0)
+
+    # The workers don't share the coordinator's directory
+    worker_dir = tmp_path / "worker"
+    worker_dir.mkdir()
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    command = [sys.executable, "-m", "lma_scripts.lma_worker", queue_path, "-n", "1"]
+    command += ["-s", "--lease", "2", "--poll", "0.1"]
+    workers = [
+        subprocess.Popen(command, cwd=worker_dir, env=env, stdout=subprocess.DEVNULL)
+        for _ in range(3)
+    ]
+    deadline = time.time() + 60
+    for worker in workers:
+        worker.wait(timeout=max(1, deadline - time.time()))
+        assert worker.returncode == 0
+
+    # The lost worker's late report doesn't undo its batch's new result
+    queue.complete(lost, "lost-worker", 1, 1.0, [])
+    counts = queue.counts()
+    attempts = dict(queue._connection.execute("SELECT key, attempts FROM batches"))
+    queue.close()
+
+    assert counts["succeeded"] == 4 and counts["failed"] == 0
+    assert attempts[lost.key] == 2
+    assert attempts["2023-05-12T00:10:00"] == 2
+    outputs = [name for name in os.listdir(out_dir) if name.startswith("LYLOUT")]
+    assert len(outputs) == 4
@@ -0,0 +1,105 @@
+from datetime import datetime
+from lma_data.LMA_data_file import LMADataFile
+from lma_data.LMA_schedule import (
+    RuntimeHistory,
+    RuntimeModel,
+    batch_analysis_args,
+    coalesce_batches,
+    estimate_batch_costs,
+    lpt_order,
+    predict_makespan,
+)
+
+
+def window(tmp_path, minute: int, stations: str = "ab", size: int = 100):
+    batch = []
+    time = f"{minute // 60:02d}{minute % 60:02d}00"
+    for station in stations:
+        path = tmp_path / f"L{station}_DCLMA_n{station}_230512_{time}.dat"
+        path.write_bytes(b"\0" * size)
+        batch.append(LMADataFile.try_parse(str(path)))
+
+    return batch
+
+
+def starts(batches) -> list[list[str]]:
+    return [
+        sorted({data_file.datetime.strftime("%H%M") for data_file in batch})
+        for batch in batches
+    ]
+
+
+def test_lpt_order_shortens_the_makespan():
+    # A long batch last in time order leaves a worker idle at the end
+    costs = [1.0, 1.0, 1.0, 1.0, 4.0]
+    order = lpt_order(costs)
+
+    assert order[0] == 4
+    assert predict_makespan(costs, 2) == 6.0
+    assert predict_makespan([costs[i] for i in order], 2) == 4.0
+
+
+def test_runtime_model_estimates_from_history(tmp_path):
+    history = RuntimeHistory(str(tmp_path))
+    history.append("DCLMA", datetime(2023, 5, 12), 1000, 10.0)
+    history.append("oklma", datetime(2023, 5, 12), 1000, 30.0)
+    with open(history.path, "a") as history_file:
+        history_file.write("dclma\t2023-05-12T00:10:00\t10")
+
+    records = list(history.read())
+    assert len(records) == 2
+
+    model = RuntimeModel(iter(records))
+    assert model.estimate("DCLMA", datetime(2023, 5, 12), 1000) == 10.0
+    assert model.estimate("dclma", datetime(2023, 5, 12, 0, 10), 500) == 5.0
+    # Networks without history run at every network's throughput
+    assert model.estimate("wtlma", datetime(2023, 5, 12), 100) == 2.0
+    assert RuntimeModel(iter([])).estimate("dclma", datetime(2023, 5, 12), 1) is None
+
+
+def test_batch_costs_fall_back_to_input_bytes(tmp_path):
+    batches = [window(tmp_path, 0, size=100), window(tmp_path, 10, size=300)]
+    assert estimate_batch_costs(batches) == [200.0, 600.0]
+
+    model = RuntimeModel(iter([("dclma", datetime(2023, 5, 12), 200, 2.0)]))
+    assert estimate_batch_costs(batches, model) == [2.0, 6.0]
+
+
+def test_coalesce_batches_merges_consecutive_windows(tmp_path):
+    batches = [
+        window(tmp_path, 0),
+        window(tmp_path, 10),
+        # Station c joins, then the data skips a window
+        window(tmp_path, 20, "abc"),
+        window(tmp_path, 30),
+        window(tmp_path, 50),
+        window(tmp_path, 60),
+        window(tmp_path, 70),
+    ]
+
+    assert starts(coalesce_batches(batches)) == [
+        ["0000", "0010"],
+        ["0020"],
+        ["0030"],
+        ["0050", "0100", "0110"],
+    ]
+    assert starts(coalesce_batches(batches, max_seconds=1200)) == [
+        ["0000", "0010"],
+        ["0020"],
+        ["0030"],
+        ["0050", "0100"],
+        ["0110"],
+    ]
+    assert starts(coalesce_batches(batches, max_bytes=300)) == [
+        ["0000"],
+        ["0010"],
+        ["0020"],
+        ["0030"],
+        ["0050"],
+        ["0100"],
+        ["0110"],
+    ]
+
+    merged = coalesce_batches(batches)[0]
+    assert batch_analysis_args(merged, "-q", "-s {seconds}") == "-s 1200 -q"
+    assert batch_analysis_args(batches[0], "-q", "-s {seconds}") == "-q"
@@ -0,0 +1,52 @@
+import json, socketserver
+from threading import Thread
+from lma_data.LMA_service import LMACatalogService, query_service
+
+
+def create_archive(root) -> None:
+    day_dir = root / "DCLMA" / "data" / "2023" / "05" / "12"
+    day_dir.mkdir(parents=True)
+    for station in "ab":
+        (day_dir / f"L{station}_DCLMA_n{station}_230512_000000.dat").touch()
+        (day_dir / f"L{station}_DCLMA_n{station}_230512_001000.dat.gz").touch()
+
+
+def test_service_matches_the_file_pattern(tmp_path):
+    create_archive(tmp_path / "archive")
+    data_dir = str(tmp_path / "archive")
+    socket_path = str(tmp_path / "catalog.sock")
+    service = LMACatalogService(data_dir, socket_path, use_inotify=False)
+    server_thread = Thread(target=service.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        for _ in range(100):
+            all_files = query_service(socket_path, data_dir, file_pattern="*.*")
+            if all_files is not None:
+                break
+
+            server_thread.join(0.05)
+
+        dat_files = query_service(socket_path, data_dir, file_pattern="*.dat")
+    finally:
+        service.shutdown()
+        server_thread.join()
+
+    assert len(all_files) == 4
+    assert sorted(data_file.path[-4:] for data_file in dat_files) == [".dat"] * 2
+
+
+def test_service_ignoring_the_file_pattern_is_skipped(tmp_path):
+    # A service predating file patterns answers with its .dat files only
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.rfile.readline()
+            self.wfile.write(json.dumps({"ok": True, "files": []}).encode() + b"\n")
+
+    socket_path = str(tmp_path / "catalog.sock")
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        server_thread = Thread(target=server.handle_request)
+        server_thread.start()
+        files = query_service(socket_path, str(tmp_path), file_pattern="*.*")
+        server_thread.join()
+
+    assert files is None
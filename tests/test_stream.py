@@ -0,0 +1,26 @@
+import pytest
+from datetime import datetime
+from lma_data.LMA_data_file import LMADataFile
+from lma_scripts.lma_batch import stream_batches
+
+
+def station_file(minute: int, station: str) -> LMADataFile:
+    name = f"L{station}_DCLMA_n{station}_230512_00{minute:02d}00.dat"
+    return LMADataFile.try_parse(f"/data/DCLMA/data/{name}")
+
+
+def test_stream_batches_groups_times():
+    data_files = [station_file(minute, s) for minute in (0, 10) for s in "abc"]
+    batches = list(stream_batches(data_files))
+
+    assert [len(batch) for batch in batches] == [3, 3]
+    assert batches[1][0].datetime == datetime(2023, 5, 12, 0, 10)
+
+
+def test_stream_batches_rejects_out_of_order_files():
+    data_files = [station_file(10, "a"), station_file(0, "a"), station_file(10, "b")]
+    batches = stream_batches(data_files)
+
+    # The 00:10 batch would have missed station b, so it's never emitted
+    with pytest.raises(ValueError):
+        next(batches)
@@ -0,0 +1,21 @@
+from lma_data.LMA_telemetry import BatchTelemetry, print_telemetry_summary
+
+
+def attempt(batch: str, exit_code: int, attempt: int) -> BatchTelemetry:
+    return BatchTelemetry(
+        batch, "dclma", 3, 3000, 100, exit_code, 2.0, 1.0, 0.5, 1024, attempt
+    )
+
+
+def test_summary_counts_batches_by_final_attempt(capsys):
+    records = [
+        attempt("2023-05-12T00:00:00", 0, 1),
+        attempt("2023-05-12T00:10:00", 3, 1),
+        attempt("2023-05-12T00:10:00", 0, 2),
+        attempt("2023-05-12T00:20:00", 3, 1),
+        attempt("2023-05-12T00:20:00", 3, 2),
+    ]
+    print_telemetry_summary(records, 10.0)
+
+    summary = capsys.readouterr().out.splitlines()[0]
+    assert summary.startswith("3 batches (1 failed, 2 retries) in 10.0s: 0.90 files/s")